@@ -0,0 +1,105 @@
+import logging
+from collections.abc import Iterable
+from collections.abc import Iterator
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+
+from .LipidQuery import LipidQuery
+from .LipidQuery import QueryScheduler
+
+
+class LipidBatchQuery:
+
+    def __init__(self, input_strings: Iterable[str], requeries: int = 0, selected_APIs: set[str] = None,
+                 method: str = "all", cutoff: int = 0, sql_args: dict = None,
+                 max_workers: int = 1, max_concurrency: dict[str, int] | None = None,
+                 max_shared_results: int = QueryScheduler.MAX_RESULTS):
+        """
+        Query many inputs at once. Identical database queries issued by different inputs are
+        executed only once.
+
+        Parameters
+        ----------
+        input_strings : Iterable[str]
+            The inputs, each of which is interpreted like the input of a single LipidQuery.
+        max_workers : int
+            Number of inputs that are queried concurrently.
+        max_concurrency : dict[str, int] | None
+            Maximum number of concurrent queries to a single API, shared by all inputs.
+        max_shared_results : int
+            Maximum number of finished database queries whose results are kept for other inputs.
+
+        The remaining parameters are passed on to every LipidQuery.
+        """
+        self.max_workers: int = int(max_workers)
+        if self.max_workers < 1:
+            raise ValueError((f"The max_workers = {max_workers} parameter does not contain a number that "
+                              f"represents a valid amount of workers. Please choose a positive integer."))
+
+        self.scheduler: QueryScheduler = QueryScheduler(max_concurrency, max_results=max_shared_results)
+        self.input_strings: list[str] = list(input_strings)
+        self.requeries: int = requeries
+        self.selected_APIs: set[str] | None = selected_APIs
+        self.method: str = method
+        self.cutoff: int = cutoff
+        self.sql_args: dict | None = sql_args
+
+        # Split the workers between the inputs and the APIs of each input, so a batch of one input
+        # still queries its APIs concurrently.
+        self.query_workers: int = max(1, self.max_workers // max(1, min(self.max_workers, len(self.input_strings))))
+
+    def _new_query(self, input_string: str) -> LipidQuery:
+        return LipidQuery(
+            input_string,
+            requeries=self.requeries,
+            selected_APIs=None if self.selected_APIs is None else set(self.selected_APIs),
+            method=self.method,
+            cutoff=self.cutoff,
+            sql_args=self.sql_args,
+            max_workers=self.query_workers,
+            scheduler=self.scheduler
+        )
+
+    def _query(self, input_string: str) -> LipidQuery:
+        lipid_query = self._new_query(input_string)
+        lipid_query.query()
+        return lipid_query
+
+    def query(self) -> Iterator[LipidQuery]:
+        """
+        Execute all queries and yield every LipidQuery as soon as it has finished. If more than one
+        worker is used, the queries are yielded in the order in which they finish, not in input order.
+
+        Every LipidQuery is created when its input is queried and is not referenced by the batch
+        after it has been yielded, so only the queries currently in flight are held in memory.
+
+        Returns
+        -------
+        Iterator[LipidQuery]
+            The finished queries, with their results in LipidQuery.lipids.
+        """
+        logging.info(f"LipidBatchQuery: Querying {len(self.input_strings)} inputs...")
+        if self.max_workers <= 1:
+            for input_string in self.input_strings:
+                yield self._query(input_string)
+        else:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                input_strings = iter(self.input_strings)
+                pending = set()
+                while True:
+                    for input_string in input_strings:
+                        pending.add(executor.submit(self._query, input_string))
+                        if len(pending) >= self.max_workers:
+                            break
+                    if not pending:
+                        break
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    while done:
+                        yield done.pop().result()
+
+        logging.info((f"LipidBatchQuery: Shared {self.scheduler.hits} of "
+                      f"{self.scheduler.hits + self.scheduler.misses} database queries."))
+
+    def __repr__(self):
+        return f"Lipid Batch Query for {len(self.input_strings)} inputs."
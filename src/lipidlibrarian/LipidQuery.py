@@ -1,5 +1,11 @@
 import copy
 import logging
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
 
 from lipidlibrarian.lipid.Synonym import Synonym
 
@@ -8,25 +14,164 @@ from .lipid.Adduct import Adduct
 from .lipid.Lipid import DatabaseIdentifier
 from .lipid.Lipid import Lipid
 from .lipid.Nomenclature import Level
-from .lipid.Source import Source
+from .lipid.Source import intern_source
 from .api import init_APIs
 from .api import supported_APIs
 from .lipid import get_adducts
 from .lipid import get_all_adducts
 
 
+class QueryScheduler:
+    """
+    Executes the API queries of one or more LipidQuery objects.
+
+    Identical database queries are executed only once and every caller receives its own copy of the
+    results, even if the callers ask concurrently. The results of the max_results most recently used
+    finished queries are kept for later callers, older ones are evicted. Additionally, the number of
+    concurrent queries to a single API can be limited. Share one QueryScheduler between multiple
+    LipidQuery objects to share this work between them.
+    """
+    MAX_RESULTS: int = 1024
+
+    def __init__(self, max_concurrency: dict[str, int] | None = None, max_results: int = MAX_RESULTS):
+        self.max_concurrency: dict[str, int] = {}
+        self.max_results: int = int(max_results)
+        self.hits: int = 0
+        self.misses: int = 0
+        self._semaphores: dict[str, threading.Semaphore] = {}
+        # running and finished queries in the order of their last use
+        self._results: OrderedDict[tuple, Future] = OrderedDict()
+        self._lock = threading.Lock()
+
+        if self.max_results < 0:
+            raise ValueError((f"The max_results = {max_results} parameter does not contain a number that "
+                              f"represents a valid amount of results. Please choose a positive integer or 0."))
+
+        if max_concurrency is not None:
+            for api_name, limit in max_concurrency.items():
+                if int(limit) < 1:
+                    raise ValueError((f"The max_concurrency = {max_concurrency} parameter does not contain a "
+                                      f"valid limit for API {api_name}. Please choose a positive integer."))
+                self.max_concurrency[api_name] = int(limit)
+                self._semaphores[api_name] = threading.Semaphore(int(limit))
+
+    def query(self, api: LipidAPI, api_name: str, query_parameters: Lipid | tuple[float, float, list[Adduct]],
+              cutoff: int = 0, deduplicate: bool = True) -> list[Lipid]:
+        """
+        Query an API while respecting the maximum concurrency configured for it.
+
+        Parameters
+        ----------
+        api : LipidAPI
+            The API to query.
+        api_name : str
+            The name of the API, as used in the API registry.
+        query_parameters : Lipid | tuple[float, float, list[Adduct]]
+            The query parameters as passed to LipidAPI.query().
+        cutoff : int
+            Maximum number of results the query returns. Only relevant for mz queries.
+        deduplicate : bool
+            Whether the results may be shared with identical queries. This must be False for APIs
+            that modify the lipid they are queried with.
+
+        Returns
+        -------
+        list[Lipid]
+            The lipids returned by the API.
+        """
+        if not deduplicate:
+            return self._query(api, api_name, query_parameters, cutoff)
+
+        key = (api_name, cutoff, self._request_key(query_parameters))
+        with self._lock:
+            future = self._results.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._results[key] = future
+                self.misses += 1
+            else:
+                self._results.move_to_end(key)
+                self.hits += 1
+
+        if owner:
+            try:
+                results = self._query(api, api_name, query_parameters, cutoff)
+            except BaseException as e:
+                with self._lock:
+                    del self._results[key]
+                future.set_exception(e)
+                raise
+            # the lipids are merged into and modified by the receiving LipidQuery, so the owner keeps
+            # the original results and the other callers copy the shared ones
+            future.set_result(copy.deepcopy(results))
+            with self._lock:
+                self._evict()
+            return results
+
+        logging.debug(f"QueryScheduler: Reusing results of an identical {api_name} query.")
+        return copy.deepcopy(future.result())
+
+    def _evict(self) -> None:
+        # Running queries are never evicted, as concurrent callers are waiting for them.
+        for key in [key for key, future in self._results.items() if future.done()]:
+            if len(self._results) <= self.max_results:
+                break
+            del self._results[key]
+
+    def _query(self, api: LipidAPI, api_name: str, query_parameters: Lipid | tuple[float, float, list[Adduct]],
+               cutoff: int) -> list[Lipid]:
+        if (semaphore := self._semaphores.get(api_name)) is None:
+            return api.query(query_parameters, cutoff=cutoff)
+        with semaphore:
+            return api.query(query_parameters, cutoff=cutoff)
+
+    @staticmethod
+    def _request_key(query_parameters: Lipid | tuple[float, float, list[Adduct]]) -> tuple:
+        if isinstance(query_parameters, Lipid):
+            return (
+                'lipid',
+                query_parameters.nomenclature.get_name(),
+                query_parameters.nomenclature.level,
+                frozenset(
+                    (database_identifier.database, database_identifier.identifier)
+                    for database_identifier in query_parameters.database_identifiers
+                )
+            )
+        mz, tolerance, adducts = query_parameters
+        return 'mz', mz, tolerance, tuple(adduct.name for adduct in adducts)
+
+
 class LipidQuery:
+    # APIs that are queried with the query parameters and on every requery round, in merge order
+    DATABASE_APIS: tuple[str, ...] = ('swisslipids', 'lipidmaps', 'alex123')
+    # APIs that annotate the final lipids in place, in annotation order
+    ANNOTATION_APIS: tuple[str, ...] = ('lipidlibrarian', 'linex', 'lion')
+    API_NAMES: dict[str, str] = {
+        'swisslipids': 'SwissLipids',
+        'lipidmaps': 'LipidMaps',
+        'alex123': 'ALEX123',
+        'lipidlibrarian': 'LipidLibrarian',
+        'linex': 'LINEX',
+        'lion': 'LION',
+    }
 
     def __init__(self, input_string: str, requeries: int = 0, selected_APIs: set[str] = None,
-                 method: str = "all", cutoff: int = 0, sql_args: dict = None):
+                 method: str = "all", cutoff: int = 0, sql_args: dict = None,
+                 max_workers: int = 1, max_concurrency: dict[str, int] | None = None,
+                 scheduler: QueryScheduler | None = None):
         self.input_string: str = input_string
-        self.lipids: list[Lipid] = []
+        self._lipids: list[Lipid] = []
+        # the first lipid of every name, which lipids of the same name are merged into
+        self._lipid_index: dict[str, Lipid] = {}
         self.query_parameters: Lipid | tuple[float, float, list[Adduct]] | None = None
         self.sql_args: dict | None = sql_args
         self.selected_APIs: set[str] = set()
         self.APIs: dict[str, LipidAPI] = {}
         self.requeries: int | None = None
         self.cutoff: int | None = None
+        self.max_workers: int = 1
+        self.scheduler: QueryScheduler | None = scheduler
 
         if selected_APIs is None:
             self.selected_APIs = set()
@@ -51,6 +196,14 @@ class LipidQuery:
             raise ValueError((f"The cutoff = {cutoff} parameter does not contain a number that represents a "
                               f"valid cutoff. Please choose a positive integer."))
 
+        self.max_workers = int(max_workers)
+        if self.max_workers < 1:
+            raise ValueError((f"The max_workers = {max_workers} parameter does not contain a number that "
+                              f"represents a valid amount of workers. Please choose a positive integer."))
+
+        if self.scheduler is None:
+            self.scheduler = QueryScheduler(max_concurrency)
+
         query_input = input_string.strip()
 
         if method == "id":
@@ -100,15 +253,13 @@ class LipidQuery:
 
         logging.info(f"Querying {self.input_string}...")
 
-        if 'swisslipids' in self.selected_APIs:
-            logging.info("Querying SwissLipids...")
-            self.add_lipids(self.APIs['swisslipids'].query(self.query_parameters, cutoff=self.cutoff))
-        if 'lipidmaps' in self.selected_APIs:
-            logging.info("Querying LipidMaps...")
-            self.add_lipids(self.APIs['lipidmaps'].query(self.query_parameters, cutoff=self.cutoff))
-        if 'alex123' in self.selected_APIs:
-            logging.info("Querying ALEX123...")
-            self.add_lipids(self.APIs['alex123'].query(self.query_parameters, cutoff=self.cutoff))
+        database_APIs = [api_name for api_name in self.DATABASE_APIS if api_name in self.selected_APIs]
+        annotation_APIs = [api_name for api_name in self.ANNOTATION_APIS if api_name in self.selected_APIs]
+
+        for results in self._run_concurrently([
+            (self._query_API, (api_name, self.query_parameters)) for api_name in database_APIs
+        ]):
+            self.add_lipids(results)
 
         logging.info("Pre-merge lipid summary: " +
                 ", ".join([f"'{l.nomenclature.get_name()}' lvl={l.nomenclature.level} ids={len(l.database_identifiers)}"
@@ -121,16 +272,10 @@ class LipidQuery:
         for i in range(self.requeries):
             logging.info(f'Executing requery {i}.')
             current_lipids = copy.deepcopy(self.lipids)
-            for lipid in current_lipids:
-                if 'swisslipids' in self.selected_APIs:
-                    logging.info("Requerying SwissLipids...")
-                    self.add_lipids(self.APIs['swisslipids'].query(lipid, cutoff=self.cutoff))
-                if 'lipidmaps' in self.selected_APIs:
-                    logging.info("Requerying LipidMaps...")
-                    self.add_lipids(self.APIs['lipidmaps'].query(lipid, cutoff=self.cutoff))
-                if 'alex123' in self.selected_APIs:
-                    logging.info("Requerying ALEX123...")
-                    self.add_lipids(self.APIs['alex123'].query(lipid, cutoff=self.cutoff))
+            for results in self._run_concurrently([
+                (self._query_API, (api_name, lipid)) for lipid in current_lipids for api_name in database_APIs
+            ]):
+                self.add_lipids(results)
 
             logging.info("Pre-merge lipid summary: " +
                         ", ".join([f"'{l.nomenclature.get_name()}' lvl={l.nomenclature.level} ids={len(l.database_identifiers)}"
@@ -140,27 +285,53 @@ class LipidQuery:
                         ", ".join([f"'{l.nomenclature.get_name()}' lvl={l.nomenclature.level} ids={len(l.database_identifiers)}"
                                     for l in self.lipids[:10]]))
 
-        for lipid in self.lipids:
-            if 'lipidlibrarian' in self.selected_APIs:
-                self.add_lipids(self.APIs['lipidlibrarian'].query(lipid, cutoff=self.cutoff))
-            if 'linex' in self.selected_APIs:
-                logging.info("Querying LINEX...")
-                self.add_lipids(self.APIs['linex'].query(lipid, cutoff=self.cutoff))
-            if 'lion' in self.selected_APIs:
-                logging.info("Querying LION...")
-                self.add_lipids(self.APIs['lion'].query(lipid, cutoff=self.cutoff))
+        # The annotation APIs mutate the lipid they are given, so they run in order for each
+        # lipid, but different lipids are annotated concurrently.
+        lipids = list(self.lipids)
+        for lipid, results in zip(lipids, self._run_concurrently([
+            (self._annotate_lipid, (lipid, annotation_APIs)) for lipid in lipids
+        ])):
+            for result in results:
+                self.add_lipids(result)
             lipid._query = self.input_string
 
         logging.info(f"Querying {self.input_string} done.")
         return self.lipids
 
+    def _query_API(self, api_name: str, query_parameters: Lipid | tuple[float, float, list[Adduct]]) -> list[Lipid]:
+        logging.info(f"Querying {self.API_NAMES.get(api_name, api_name)}...")
+        return self.scheduler.query(
+            self.APIs[api_name],
+            api_name,
+            query_parameters,
+            cutoff=self.cutoff,
+            deduplicate=api_name in self.DATABASE_APIS
+        )
+
+    def _annotate_lipid(self, lipid: Lipid, api_names: list[str]) -> list[list[Lipid]]:
+        return [self._query_API(api_name, lipid) for api_name in api_names]
+
+    def _run_concurrently(self, tasks: list[tuple[Callable, tuple]]) -> list[Any]:
+        """
+        Execute independent tasks on a thread pool of at most max_workers threads.
+
+        The results are returned in the order of the tasks, regardless of the order in which they
+        complete, so merging them afterwards is deterministic.
+        """
+        if self.max_workers <= 1 or len(tasks) <= 1:
+            return [function(*args) for function, args in tasks]
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(tasks))) as executor:
+            futures = [executor.submit(function, *args) for function, args in tasks]
+            return [future.result() for future in futures]
+
     @staticmethod
     def _detect_identifier_query(query_input: str) -> Lipid | None:
         if len(query_input.split(' ')) != 1:
             return None
 
         query_parameter = Lipid()
-        source = Source('', Level.level_unknown, 'lipidlibrarian')
+        source = intern_source('', Level.level_unknown, 'lipidlibrarian')
         if query_input[0:2] == "LM" and 11 < len(query_input) < 15:
             query_parameter.add_database_identifier(DatabaseIdentifier.from_data(
                 'lipidmaps',
@@ -215,7 +386,7 @@ class LipidQuery:
             Synonym.from_data(
                 query_input,
                 "query_input",
-                Source(
+                intern_source(
                     query_input,
                     query_parameter.nomenclature.level,
                     'lipidlibrarian'
@@ -227,12 +398,24 @@ class LipidQuery:
             return None
         return query_parameter
 
+    @property
+    def lipids(self) -> list[Lipid]:
+        return self._lipids
+
+    @lipids.setter
+    def lipids(self, lipids: list[Lipid]) -> None:
+        self._lipids = lipids
+        self._lipid_index = {}
+        for lipid in lipids:
+            self._lipid_index.setdefault(lipid.nomenclature.get_name(), lipid)
+
     def add_lipid(self, lipid: Lipid) -> None:
-        for existing_lipid in self.lipids:
-            existing_lipid: Lipid
-            if existing_lipid.merge(lipid):
-                return
-        self.lipids.append(lipid)
+        # Lipid.merge only merges lipids of the same name, so only the indexed lipid can absorb this one.
+        name = lipid.nomenclature.get_name()
+        if (existing_lipid := self._lipid_index.get(name)) is not None and existing_lipid.merge(lipid):
+            return
+        self._lipids.append(lipid)
+        self._lipid_index[name] = lipid
 
     def add_lipids(self, lipids: list[Lipid]) -> None:
         for lipid in lipids:
@@ -279,25 +462,32 @@ class LipidQuery:
             f"keep={keep_desc}, kept={len(kept)}, dropped={len(dropped)}"
         )
 
-        # Deduplicate/merge within kept
+        # A lipid can absorb every lipid whose name equals its own name on the level of the other
+        # lipid, so each kept lipid is registered under its names on all levels up to its own.
+        # The first registered lipid absorbs, like the first lipid in the list did before.
         new_list: list[Lipid] = []
+        absorbing_lipids: dict[tuple[Level, str], Lipid] = {}
+
+        # Deduplicate/merge within kept
         for l in kept:
-            merged = False
-            for k in new_list:
-                if k.hierarchical_merge(l):
-                    merged = True
-                    break
-            if not merged:
-                new_list.append(l)
+            if (k := absorbing_lipids.get(self._merge_key(l))) is not None and k.hierarchical_merge(l):
+                continue
+            new_list.append(l)
+            for level in Level:
+                if level <= l.nomenclature.level:
+                    absorbing_lipids.setdefault((level, l.nomenclature.get_name(level=level)), l)
 
         # Merge dropped into kept when possible
         for l in dropped:
-            for k in new_list:
-                if k.hierarchical_merge(l):
-                    break
+            if (k := absorbing_lipids.get(self._merge_key(l))) is not None:
+                k.hierarchical_merge(l)
 
         self.lipids = new_list
 
+    @staticmethod
+    def _merge_key(lipid: Lipid) -> tuple[Level, str]:
+        return lipid.nomenclature.level, lipid.nomenclature.get_name()
+
 
     def __repr__(self):
         return f"Lipid Query for '{self.input_string}' with {len(self.lipids)} results."
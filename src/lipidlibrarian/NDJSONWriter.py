@@ -0,0 +1,63 @@
+import gzip
+import logging
+import sys
+from collections.abc import Iterable
+from typing import TextIO
+
+from .lipid.Lipid import Lipid
+
+
+class NDJSONWriter:
+
+    def __init__(self, output: str | TextIO | None = None):
+        """
+        Write lipids as newline delimited JSON, i.e. one JSON record per line, to a single stream,
+        so results can be written and consumed as soon as each query has finished.
+
+        Parameters
+        ----------
+        output : str | TextIO | None
+            Path of the output file, which is gzip compressed if the path ends with '.gz', or an open
+            text stream. The records are written to stdout if None.
+        """
+        self.count: int = 0
+        self._close: bool = isinstance(output, str)
+        if output is None:
+            self._stream: TextIO = sys.stdout
+        elif isinstance(output, str):
+            if output.endswith('.gz'):
+                self._stream = gzip.open(output, 'wt', encoding='utf-8')
+            else:
+                self._stream = open(output, 'w', encoding='utf-8')
+            logging.info(f"NDJSONWriter: Writing lipids to {output}.")
+        else:
+            self._stream = output
+
+    def write(self, lipid: Lipid) -> None:
+        self._stream.write(lipid.to_json())
+        self._stream.write('\n')
+        self.count += 1
+
+    def write_lipids(self, lipids: Iterable[Lipid]) -> None:
+        """
+        Write all lipids and flush the stream, so the records are available to readers right away.
+        """
+        for lipid in lipids:
+            self.write(lipid)
+        self._stream.flush()
+
+    def close(self) -> None:
+        if self._close:
+            self._stream.close()
+        else:
+            self._stream.flush()
+        logging.info(f"NDJSONWriter: Wrote {self.count} lipids.")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def __repr__(self) -> str:
+        return f"NDJSON Writer with {self.count} lipids."
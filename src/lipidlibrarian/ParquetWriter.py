@@ -0,0 +1,125 @@
+import logging
+from collections.abc import Iterable
+from typing import Any
+
+from .lipid.Lipid import Lipid
+from .lipid.Nomenclature import Level
+
+
+class ParquetWriter:
+
+    def __init__(self, path: str, row_group_size: int = 10000):
+        """
+        Write lipids as rows of a Parquet file with one row per lipid, so results can be loaded into
+        columnar tools like DuckDB or Polars. The rows are buffered and written as a row group
+        whenever row_group_size rows have been collected. Requires pyarrow.
+
+        Parameters
+        ----------
+        path : str
+            Path of the Parquet file.
+        row_group_size : int
+            Number of lipids per row group.
+        """
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ModuleNotFoundError as e:
+            raise ModuleNotFoundError((f"ParquetWriter: Writing Parquet files requires pyarrow. "
+                                       f"Please install it, e.g. with 'pip install pyarrow'.")) from e
+
+        self.row_group_size: int = int(row_group_size)
+        if self.row_group_size < 1:
+            raise ValueError((f"The row_group_size = {row_group_size} parameter does not contain a number that "
+                              f"represents a valid amount of rows. Please choose a positive integer."))
+
+        self.count: int = 0
+        self._pa = pa
+        self._schema = pa.schema([
+            ('query', pa.string()),
+            ('name', pa.string()),
+            ('level', pa.string()),
+            ('lipid_category_name', pa.string()),
+            ('lipid_class_name', pa.string()),
+            ('sum_lipid_species_name', pa.string()),
+            ('molecular_lipid_species_name', pa.string()),
+            ('structural_lipid_species_name', pa.string()),
+            ('isomeric_lipid_species_name', pa.string()),
+            ('sum_formula', pa.string()),
+            ('masses', pa.list_(pa.struct([('mass_type', pa.string()), ('value', pa.float64())]))),
+            ('database_identifiers', pa.list_(pa.struct([('database', pa.string()), ('identifier', pa.string())]))),
+            ('adduct_masses', pa.list_(pa.struct([
+                ('adduct', pa.string()),
+                ('mass_type', pa.string()),
+                ('value', pa.float64())
+            ]))),
+            ('ontology_terms', pa.list_(pa.string())),
+            ('sources', pa.list_(pa.string())),
+        ])
+        self._rows: list[dict[str, Any]] = []
+        self._writer = pq.ParquetWriter(path, self._schema)
+        logging.info(f"ParquetWriter: Writing lipids to {path}.")
+
+    @staticmethod
+    def to_row(lipid: Lipid) -> dict[str, Any]:
+        """
+        Flatten a lipid into one row of plain python values.
+        """
+        nomenclature = lipid.nomenclature
+        return {
+            'query': lipid._query,
+            'name': nomenclature.get_name() or None,
+            'level': nomenclature.level.name,
+            'lipid_category_name': nomenclature._lipid_category_name,
+            'lipid_class_name': nomenclature._lipid_class_name,
+            'sum_lipid_species_name': nomenclature.get_name(level=Level.sum_lipid_species) or None,
+            'molecular_lipid_species_name': nomenclature.get_name(level=Level.molecular_lipid_species) or None,
+            'structural_lipid_species_name': nomenclature.get_name(level=Level.structural_lipid_species) or None,
+            'isomeric_lipid_species_name': nomenclature.get_name(level=Level.isomeric_lipid_species) or None,
+            'sum_formula': nomenclature.sum_formula,
+            'masses': [
+                {'mass_type': mass.mass_type, 'value': None if mass.value is None else float(mass.value)}
+                for mass in lipid.masses
+            ],
+            'database_identifiers': [
+                {'database': database_identifier.database, 'identifier': database_identifier.identifier}
+                for database_identifier in lipid.database_identifiers
+            ],
+            'adduct_masses': [
+                {'adduct': adduct.name, 'mass_type': mass.mass_type,
+                 'value': None if mass.value is None else float(mass.value)}
+                for adduct in lipid.adducts for mass in adduct.masses
+            ],
+            'ontology_terms': sorted(lipid.ontology.ontology_terms),
+            'sources': sorted({source.source for source in lipid.sources}),
+        }
+
+    def write(self, lipid: Lipid) -> None:
+        self._rows.append(self.to_row(lipid))
+        self.count += 1
+        if len(self._rows) >= self.row_group_size:
+            self._write_row_group()
+
+    def write_lipids(self, lipids: Iterable[Lipid]) -> None:
+        for lipid in lipids:
+            self.write(lipid)
+
+    def _write_row_group(self) -> None:
+        if not self._rows:
+            return
+        self._writer.write_table(self._pa.Table.from_pylist(self._rows, schema=self._schema))
+        self._rows = []
+
+    def close(self) -> None:
+        self._write_row_group()
+        self._writer.close()
+        logging.info(f"ParquetWriter: Wrote {self.count} lipids.")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def __repr__(self) -> str:
+        return f"Parquet Writer with {self.count} lipids."
@@ -1,14 +1,17 @@
-import copy
+import json
 import logging
+import threading
 from collections.abc import Iterable
 from importlib.resources import files
+from pathlib import Path
 
+import numpy as np
 import pandas as pd
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy import create_engine, text
 
 from .LipidAPI import LipidAPI
-from ..lipid import get_adduct
+from ..lipid import new_adduct
 from ..lipid.Adduct import Adduct
 from ..lipid.Adduct import Fragment
 from ..lipid.Lipid import DatabaseIdentifier
@@ -16,7 +19,7 @@ from ..lipid.Lipid import Lipid
 from ..lipid.Lipid import Mass
 from ..lipid.Nomenclature import Level
 from ..lipid.Nomenclature import Synonym
-from ..lipid.Source import Source
+from ..lipid.Source import intern_source
 
 
 def is_sql_reachable(sql_args: dict) -> bool:
@@ -87,6 +90,26 @@ class Alex123DBConnector():
             "or Alex123DBConnectorHDF instead."
         ))
 
+    def get_molecular_lipid_species_by_mz_batch(
+            self, mzs: np.ndarray, tolerances: np.ndarray, adducts: list[Adduct]
+    ) -> pd.DataFrame:
+        """
+        Look up the molecular lipid species of many m/z values. The result contains the rows of
+        get_molecular_lipid_species_by_mz for every m/z, with the position of the m/z in mzs in the
+        additional query_index column. This implementation runs one query per m/z.
+        """
+        results = []
+        for query_index, (mz, tolerance) in enumerate(zip(mzs, tolerances)):
+            result = self.get_molecular_lipid_species_by_mz(float(mz), float(tolerance), adducts)
+            if result is None or result.empty:
+                continue
+            result = result.reset_index(drop=True)
+            result.insert(0, 'query_index', query_index)
+            results.append(result)
+        if not results:
+            return None
+        return pd.concat(results, ignore_index=True)
+
 
 class Alex123DBConnectorSQL(Alex123DBConnector):
     def __init__(self, sql_args: dict = None):
@@ -510,6 +533,83 @@ class Alex123DBConnectorSQL(Alex123DBConnector):
 
         return result
 
+    def get_molecular_lipid_species_by_mz_batch(
+            self, mzs: np.ndarray, tolerances: np.ndarray, adducts: list[Adduct]
+    ) -> pd.DataFrame:
+        # store the mass window of every mz in a temporary table
+        # join it with sum species where sum species mass is in the window
+        # merge with molecular species
+        # keep molecular species which have a fragment with one of the adducts
+        # merge with class
+        # merge with category
+
+        if len(mzs) == 0 or not adducts:
+            return None
+
+        max_adduct_mass = max([0] + [adduct.adduct_mass for adduct in adducts])
+        adduct_names = [adduct.name for adduct in adducts]
+        windows = [
+            (query_index, float(mz - tolerance), float(mz + max_adduct_mass + tolerance))
+            for query_index, (mz, tolerance) in enumerate(zip(mzs, tolerances))
+        ]
+
+        query = (
+            "SELECT "
+            "    mzq.query_index, "
+            "    mls.molecular_lipid_species_id, "
+            "    mls.molecular_lipid_species_name, "
+            "    sls.sum_lipid_species_id, "
+            "    sls.sum_lipid_species_name, "
+            "    sls.sum_lipid_species_mass, "
+            "    lcl.lipid_class_id, "
+            "    lcl.lipid_class_name, "
+            "    lca.lipid_category_id, "
+            "    lca.lipid_category_name "
+            "FROM mz_query AS mzq "
+            "JOIN sum_lipid_species AS sls "
+            "    ON sls.sum_lipid_species_mass BETWEEN mzq.lower_mass AND mzq.upper_mass "
+            "JOIN molecular_lipid_species AS mls "
+            "    ON mls.sum_lipid_species_id = sls.sum_lipid_species_id "
+            "JOIN lipid_class AS lcl "
+            "    ON sls.lipid_class_id = lcl.lipid_class_id "
+            "JOIN lipid_category AS lca "
+            "    ON lcl.lipid_category_id = lca.lipid_category_id "
+            "WHERE mls.molecular_lipid_species_id IN ( "
+            "    SELECT DISTINCT frg.molecular_lipid_species_id "
+            "    FROM fragment AS frg "
+            "    JOIN adduct AS adt "
+            "        ON adt.adduct_id = frg.adduct_id "
+            "    WHERE adt.adduct_name {0} "  # param: list of adducts
+            ") "
+            "ORDER BY mzq.query_index, mls.molecular_lipid_species_id "
+            "; "
+        )
+        # Prepare query string for parameter insertion
+        # Parameters:
+        #     list(adducts)
+        if self.paramstyle == 'qmark':
+            insert = "INSERT INTO mz_query (query_index, lower_mass, upper_mass) VALUES (?, ?, ?)"
+            query = query.format('IN (' + ','.join('?' * len(adduct_names)) + ')')
+            params = tuple(adduct_names)
+        else:
+            insert = "INSERT INTO mz_query (query_index, lower_mass, upper_mass) VALUES (%s, %s, %s)"
+            query = query.format('IN %(adducts)s')
+            params = {'adducts': tuple(adduct_names)}
+
+        with self.engine.connect() as connection:
+            connection.exec_driver_sql(
+                "CREATE TEMPORARY TABLE mz_query (query_index INTEGER, lower_mass DOUBLE, upper_mass DOUBLE)"
+            )
+            try:
+                connection.exec_driver_sql(insert, windows)
+                result = pd.read_sql(query, connection, params=params)
+            finally:
+                connection.exec_driver_sql("DROP TABLE mz_query")
+                # the connection is returned to the pool, where an uncommitted drop would be rolled back
+                connection.commit()
+
+        return result
+
 
 class Alex123DBConnectorHDF(Alex123DBConnector):
     TABLES = [
@@ -525,6 +625,7 @@ class Alex123DBConnectorHDF(Alex123DBConnector):
         super().__init__()
         self.hdf_path = str(hdf_path)
         self._table_cache: dict[str, pd.DataFrame] = {}
+        self._table_cache_lock = threading.Lock()
         logging.info("Alex123API: Using lazy HDF5 backend.")
 
     def get_table_names(self) -> list[str]:
@@ -552,9 +653,11 @@ class Alex123DBConnectorHDF(Alex123DBConnector):
         WARNING: Loads ONE table fully into RAM.
         """
         if table_name not in self._table_cache:
-            with pd.HDFStore(self.hdf_path, "r") as store:
-                df = store[table_name]
-            self._table_cache[table_name] = df
+            with self._table_cache_lock:
+                if table_name not in self._table_cache:
+                    with pd.HDFStore(self.hdf_path, "r") as store:
+                        df = store[table_name]
+                    self._table_cache[table_name] = df
         return self._table_cache[table_name]
 
     def get_sum_lipid_species_by_name(self, names: set[str]) -> pd.DataFrame:
@@ -679,6 +782,490 @@ class Alex123DBConnectorHDF(Alex123DBConnector):
         return results
 
 
+class Alex123DBConnectorIndexBase(Alex123DBConnector):
+
+    def __init__(self, *args, **kwargs):
+        """
+        Base of the backends that answer queries from indexes instead of scanning tables: sorted
+        mass arrays are searched with binary search and species and fragments are looked up by id
+        and name. Subclasses load the tables and their indexes in _build_index and implement the
+        lookups of rows by position, id and name.
+        """
+        super().__init__(*args, **kwargs)
+        self._index_lock = threading.Lock()
+        self._indexed: bool = False
+
+    def _build_index(self) -> None:
+        raise NotImplementedError(f"{type(self).__name__} does not implement _build_index.")
+
+    def _rows(self, table_name: str, positions: np.ndarray, columns: list[str] | None = None) -> pd.DataFrame:
+        raise NotImplementedError(f"{type(self).__name__} does not implement _rows.")
+
+    def _sum_lipid_species_positions_by_id(self, ids: Iterable) -> np.ndarray:
+        raise NotImplementedError(f"{type(self).__name__} does not implement _sum_lipid_species_positions_by_id.")
+
+    def _sum_lipid_species_positions_by_name(self, names: Iterable[str]) -> np.ndarray:
+        raise NotImplementedError(f"{type(self).__name__} does not implement _sum_lipid_species_positions_by_name.")
+
+    def _species_positions_by_name(self, names: Iterable[str]) -> np.ndarray:
+        raise NotImplementedError(f"{type(self).__name__} does not implement _species_positions_by_name.")
+
+    def _species_positions_by_sum_lipid_species(self, ids: Iterable) -> np.ndarray:
+        raise NotImplementedError(f"{type(self).__name__} does not implement _species_positions_by_sum_lipid_species.")
+
+    def _fragment_positions(self, ids: Iterable) -> np.ndarray:
+        raise NotImplementedError(f"{type(self).__name__} does not implement _fragment_positions.")
+
+    @staticmethod
+    def _mass_window(masses: np.ndarray, order: np.ndarray, lower: float, upper: float) -> np.ndarray:
+        return order[np.searchsorted(masses, lower, side='left'):np.searchsorted(masses, upper, side='right')]
+
+    @staticmethod
+    def _expand_ranges(starts: np.ndarray, ends: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        # returns the index of the range and the value for every value in all ranges [start, end)
+        counts = ends - starts
+        groups = np.repeat(np.arange(len(starts)), counts)
+        values = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(starts, counts)
+        return groups, values
+
+    def _adduct_ids(self, adducts: list[Adduct]) -> np.ndarray:
+        return np.array([
+            adduct_id
+            for adduct in adducts
+            for adduct_id in self._adduct_ids_by_name.get(adduct.name, [])
+        ])
+
+    def _sum_lipid_species_positions_by_mass(self, lower: float, upper: float) -> np.ndarray:
+        return self._mass_window(self._sum_lipid_species_masses, self._sum_lipid_species_mass_order, lower, upper)
+
+    def _fragment_positions_by_mass(self, lower: float, upper: float) -> np.ndarray:
+        return self._mass_window(self._fragment_masses, self._fragment_mass_order, lower, upper)
+
+    def _species_positions_by_mz(self, lower: float, upper: float, adduct_ids: np.ndarray) -> np.ndarray:
+        # molecular species of the sum species in the mass window, which have a fragment of one of the adducts
+        positions = self._species_positions_by_sum_lipid_species(
+            self._sum_lipid_species_ids[self._sum_lipid_species_positions_by_mass(lower, upper)]
+        )
+        ids = self._molecular_lipid_species_ids[positions]
+        fragment_positions = self._fragment_positions(ids)
+        fragment_positions = fragment_positions[np.isin(self._fragment_adduct_ids[fragment_positions], adduct_ids)]
+        return positions[np.isin(ids, self._fragment_molecular_lipid_species_ids[fragment_positions])]
+
+    def _species_positions_by_mz_batch(
+            self, lowers: np.ndarray, uppers: np.ndarray, adduct_ids: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        # sum species in the mass window of every query
+        query_indices, sorted_positions = self._expand_ranges(
+            np.searchsorted(self._sum_lipid_species_masses, lowers, side='left'),
+            np.searchsorted(self._sum_lipid_species_masses, uppers, side='right')
+        )
+        sum_lipid_species_ids = self._sum_lipid_species_ids[self._sum_lipid_species_mass_order[sorted_positions]]
+
+        # their molecular species
+        groups, sorted_positions = self._expand_ranges(
+            np.searchsorted(self._molecular_lipid_species_sum_lipid_species_ids_sorted, sum_lipid_species_ids,
+                            side='left'),
+            np.searchsorted(self._molecular_lipid_species_sum_lipid_species_ids_sorted, sum_lipid_species_ids,
+                            side='right')
+        )
+        query_indices = query_indices[groups]
+        positions = self._molecular_lipid_species_sum_lipid_species_order[sorted_positions]
+
+        # which have a fragment with one of the adducts
+        ids = self._molecular_lipid_species_ids[positions]
+        fragment_positions = self._fragment_positions(ids)
+        fragment_positions = fragment_positions[np.isin(self._fragment_adduct_ids[fragment_positions], adduct_ids)]
+        keep = np.isin(ids, self._fragment_molecular_lipid_species_ids[fragment_positions])
+        query_indices, positions = query_indices[keep], positions[keep]
+
+        # in the order of get_molecular_lipid_species_by_mz for every query
+        pairs = np.unique(np.stack([query_indices, positions], axis=1), axis=0)
+        return pairs[:, 0], pairs[:, 1]
+
+    def get_sum_lipid_species_by_name(self, names: set[str]) -> pd.DataFrame:
+        self._build_index()
+        positions = self._sum_lipid_species_positions_by_name(names)
+        return self._rows('sum_lipid_species', positions)
+
+    def get_molecular_lipid_species_by_name(self, names: set[str]) -> pd.DataFrame:
+        self._build_index()
+        positions = self._species_positions_by_name(names)
+        return self._rows('molecular_lipid_species', positions)
+
+    def get_fragment_by_molecular_lipid_species(self, ids: set[str]) -> pd.DataFrame:
+        self._build_index()
+        positions = self._fragment_positions(ids)
+        return self._rows('fragment', positions)
+
+    def get_molecular_lipid_species_by_mz(self, mz: float, tolerance: float, adducts: list[Adduct]) -> pd.DataFrame:
+        self._build_index()
+        max_adduct_mass = max([0] + [adduct.adduct_mass for adduct in adducts])
+        positions = self._species_positions_by_mz(
+            mz - tolerance,
+            mz + max_adduct_mass + tolerance,
+            self._adduct_ids(adducts)
+        )
+        return self._rows('molecular_lipid_species', positions)
+
+    def get_sum_lipid_species_by_mz(self, mz: float, tolerance: float, adducts: list[Adduct]) -> pd.DataFrame:
+        self._build_index()
+        max_adduct_mass = max([0] + [adduct.adduct_mass for adduct in adducts])
+        positions = self._species_positions_by_mz(
+            mz - max_adduct_mass - tolerance,
+            mz + max_adduct_mass + tolerance,
+            self._adduct_ids(adducts)
+        )
+        positions = self._sum_lipid_species_positions_by_id(self._molecular_lipid_species_sum_lipid_species_ids[positions])
+        return self._rows('sum_lipid_species', positions)
+
+    def get_fragment_by_mz(self, mz: float, tolerance: float, adducts: list[Adduct]) -> pd.DataFrame:
+        self._build_index()
+        positions = self._fragment_positions_by_mass(mz - tolerance, mz + tolerance)
+        positions = np.sort(positions[np.isin(self._fragment_adduct_ids[positions], self._adduct_ids(adducts))])
+        return self._rows('fragment', positions, self._fragment_columns)
+
+    def get_molecular_lipid_species_by_mz_batch(
+            self, mzs: np.ndarray, tolerances: np.ndarray, adducts: list[Adduct]
+    ) -> pd.DataFrame:
+        self._build_index()
+        mzs = np.asarray(mzs, dtype=float)
+        tolerances = np.asarray(tolerances, dtype=float)
+        max_adduct_mass = max([0] + [adduct.adduct_mass for adduct in adducts])
+        query_indices, positions = self._species_positions_by_mz_batch(
+            mzs - tolerances,
+            mzs + max_adduct_mass + tolerances,
+            self._adduct_ids(adducts)
+        )
+        results = self._rows('molecular_lipid_species', positions)
+        results.insert(0, 'query_index', query_indices)
+        return results
+
+
+class Alex123DBConnectorIndexed(Alex123DBConnectorIndexBase, Alex123DBConnectorHDF):
+
+    def __init__(self, hdf_path: str):
+        """
+        HDF5 backend that joins the ALEX123 tables once and answers queries from in-memory indexes:
+        sorted mass arrays are searched with binary search and species and fragments are looked up
+        by id and name in hash indexes, so no query scans a whole table.
+
+        Parameters
+        ----------
+        hdf_path : str
+            Path of the ALEX123 HDF5 database.
+        """
+        super().__init__(hdf_path)
+
+    def _build_index(self) -> None:
+        if self._indexed:
+            return
+        with self._index_lock:
+            if self._indexed:
+                return
+            logging.info("Alex123API: Building in-memory indexes...")
+
+            sum_lipid_species = pd.merge(
+                self.get_database_table('sum_lipid_species'),
+                self.get_database_table('lipid_class'),
+                on='lipid_class_id'
+            )
+            sum_lipid_species = pd.merge(
+                sum_lipid_species,
+                self.get_database_table('lipid_category'),
+                on='lipid_category_id'
+            )
+            molecular_lipid_species = pd.merge(
+                self.get_database_table('molecular_lipid_species'),
+                sum_lipid_species,
+                on='sum_lipid_species_id'
+            )
+            fragment = self.get_database_table('fragment')
+            adduct = self.get_database_table('adduct')
+
+            self._tables: dict[str, pd.DataFrame] = {
+                'sum_lipid_species': sum_lipid_species,
+                'molecular_lipid_species': molecular_lipid_species,
+                'fragment': pd.merge(fragment, adduct, on='adduct_id')
+            }
+            self._sum_lipid_species_ids: np.ndarray = sum_lipid_species.sum_lipid_species_id.to_numpy()
+            self._sum_lipid_species_mass_order: np.ndarray = np.argsort(
+                sum_lipid_species.sum_lipid_species_mass.to_numpy(), kind='stable'
+            )
+            self._sum_lipid_species_masses: np.ndarray = (
+                sum_lipid_species.sum_lipid_species_mass.to_numpy()[self._sum_lipid_species_mass_order]
+            )
+            self._sum_lipid_species_by_id: dict = sum_lipid_species.groupby('sum_lipid_species_id').indices
+            self._sum_lipid_species_by_name: dict = sum_lipid_species.groupby('sum_lipid_species_name').indices
+
+            self._molecular_lipid_species_ids: np.ndarray = (
+                molecular_lipid_species.molecular_lipid_species_id.to_numpy()
+            )
+            self._molecular_lipid_species_by_name: dict = (
+                molecular_lipid_species.groupby('molecular_lipid_species_name').indices
+            )
+            self._molecular_lipid_species_by_sum_lipid_species: dict = (
+                molecular_lipid_species.groupby('sum_lipid_species_id').indices
+            )
+            self._molecular_lipid_species_sum_lipid_species_ids: np.ndarray = (
+                molecular_lipid_species.sum_lipid_species_id.to_numpy()
+            )
+            self._molecular_lipid_species_sum_lipid_species_order: np.ndarray = np.argsort(
+                self._molecular_lipid_species_sum_lipid_species_ids, kind='stable'
+            )
+            self._molecular_lipid_species_sum_lipid_species_ids_sorted: np.ndarray = (
+                self._molecular_lipid_species_sum_lipid_species_ids[self._molecular_lipid_species_sum_lipid_species_order]
+            )
+
+            self._fragment_columns: list[str] = list(fragment.columns)
+            fragment = self._tables['fragment']
+            self._fragment_adduct_ids: np.ndarray = fragment.adduct_id.to_numpy()
+            self._fragment_molecular_lipid_species_ids: np.ndarray = fragment.molecular_lipid_species_id.to_numpy()
+            self._fragment_mass_order: np.ndarray = np.argsort(fragment.fragment_mass.to_numpy(), kind='stable')
+            self._fragment_masses: np.ndarray = fragment.fragment_mass.to_numpy()[self._fragment_mass_order]
+            self._fragment_by_molecular_lipid_species: dict = fragment.groupby('molecular_lipid_species_id').indices
+
+            self._adduct_ids_by_name: dict = adduct.groupby('adduct_name').adduct_id.agg(list).to_dict()
+
+            # The joined tables contain all rows, so the raw tables are not kept twice.
+            self._table_cache.clear()
+            self._indexed = True
+            logging.info((f"Alex123API: Building in-memory indexes for {len(self._molecular_lipid_species_ids)} "
+                          f"molecular lipid species and {len(self._fragment_adduct_ids)} fragments done."))
+
+    @staticmethod
+    def _lookup(index: dict, keys: Iterable) -> np.ndarray:
+        positions = [index[key] for key in set(keys) if key in index]
+        if not positions:
+            return np.empty(0, dtype=np.intp)
+        return np.sort(np.concatenate(positions))
+
+    def _rows(self, table_name: str, positions: np.ndarray, columns: list[str] | None = None) -> pd.DataFrame:
+        results = self._tables[table_name].iloc[positions]
+        if columns is not None:
+            results = results[columns]
+        return results.reset_index(drop=True)
+
+    def _sum_lipid_species_positions_by_id(self, ids: Iterable) -> np.ndarray:
+        return self._lookup(self._sum_lipid_species_by_id, ids)
+
+    def _sum_lipid_species_positions_by_name(self, names: Iterable[str]) -> np.ndarray:
+        return self._lookup(self._sum_lipid_species_by_name, names)
+
+    def _species_positions_by_name(self, names: Iterable[str]) -> np.ndarray:
+        return self._lookup(self._molecular_lipid_species_by_name, names)
+
+    def _species_positions_by_sum_lipid_species(self, ids: Iterable) -> np.ndarray:
+        return self._lookup(self._molecular_lipid_species_by_sum_lipid_species, ids)
+
+    def _fragment_positions(self, ids: Iterable) -> np.ndarray:
+        return self._lookup(self._fragment_by_molecular_lipid_species, ids)
+
+
+class Alex123DBConnectorMmap(Alex123DBConnectorIndexBase):
+    # indexed columns of the joined tables: positions sorted by the column and the sorted column
+    INDEXES = {
+        'sum_lipid_species': ['sum_lipid_species_id', 'sum_lipid_species_name', 'sum_lipid_species_mass'],
+        'molecular_lipid_species': ['molecular_lipid_species_name', 'sum_lipid_species_id'],
+        'fragment': ['molecular_lipid_species_id', 'fragment_mass'],
+        'adduct': [],
+    }
+
+    def __init__(self, mmap_path: str):
+        """
+        Backend that reads the ALEX123 tables from memory-mapped numpy files written by build(). The
+        files are shared through the page cache by all processes which use the same database, and
+        nothing is loaded up front. Strings are stored as integer codes into a sorted dictionary.
+
+        Parameters
+        ----------
+        mmap_path : str
+            Path of the directory written by Alex123DBConnectorMmap.build.
+        """
+        super().__init__()
+        self.mmap_path: str = str(mmap_path)
+        logging.info("Alex123API: Using memory-mapped backend.")
+
+    @classmethod
+    def build(cls, hdf_path: str, mmap_path: str) -> None:
+        """
+        Export the ALEX123 HDF5 database into a directory of memory-mapped numpy files.
+
+        Parameters
+        ----------
+        hdf_path : str
+            Path of the ALEX123 HDF5 database.
+        mmap_path : str
+            Path of the directory the files are written to.
+        """
+        logging.info(f"Alex123API: Exporting {hdf_path} to {mmap_path}...")
+        connector = Alex123DBConnectorIndexed(hdf_path)
+        connector._build_index()
+        tables = dict(connector._tables)
+        tables['adduct'] = connector.get_database_table('adduct')
+
+        metadata = {
+            'source': cls._source_stamp(hdf_path),
+            'tables': {},
+            'fragment_columns': connector._fragment_columns
+        }
+        for table_name, table in tables.items():
+            table_path = Path(mmap_path) / table_name
+            table_path.mkdir(parents=True, exist_ok=True)
+            strings = {}
+            for column in table.columns:
+                values = table[column].to_numpy()
+                if values.dtype == object:
+                    strings[column] = str(table[column].dtype)
+                    missing = pd.isna(values)
+                    dictionary, codes = np.unique(values[~missing].astype(str), return_inverse=True)
+                    values = np.full(len(values), -1, dtype=np.int64)
+                    values[~missing] = codes
+                    np.save(table_path / f'{column}.values.npy', dictionary)
+                np.save(table_path / f'{column}.npy', values)
+                if column in cls.INDEXES[table_name]:
+                    order = np.argsort(values, kind='stable')
+                    np.save(table_path / f'{column}.order.npy', order)
+                    np.save(table_path / f'{column}.sorted.npy', values[order])
+            metadata['tables'][table_name] = {'columns': list(table.columns), 'strings': strings}
+
+        # written last, so an interrupted export is not used
+        with open(Path(mmap_path) / 'metadata.json', 'w') as f:
+            json.dump(metadata, f)
+        logging.info(f"Alex123API: Exporting {hdf_path} to {mmap_path} done.")
+
+    @staticmethod
+    def _source_stamp(hdf_path: str) -> dict:
+        stat = Path(hdf_path).stat()
+        return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    @classmethod
+    def is_up_to_date(cls, mmap_path: str, hdf_path: str) -> bool:
+        """
+        Check whether the export in mmap_path has been built from the current version of the ALEX123
+        HDF5 database, by comparing the size and modification time of the database with the ones
+        recorded by build().
+
+        Parameters
+        ----------
+        mmap_path : str
+            Path of the directory written by Alex123DBConnectorMmap.build.
+        hdf_path : str
+            Path of the ALEX123 HDF5 database.
+
+        Returns
+        -------
+        bool
+            Whether the export is complete and matches the database.
+        """
+        try:
+            with open(Path(mmap_path) / 'metadata.json') as f:
+                metadata = json.load(f)
+        except FileNotFoundError:
+            return False
+        return metadata.get('source') == cls._source_stamp(hdf_path)
+
+    def _load(self, table_name: str, file_name: str) -> np.ndarray:
+        return np.load(Path(self.mmap_path) / table_name / file_name, mmap_mode='r')
+
+    def _build_index(self) -> None:
+        if self._indexed:
+            return
+        with self._index_lock:
+            if self._indexed:
+                return
+            logging.info("Alex123API: Opening memory-mapped tables...")
+            with open(Path(self.mmap_path) / 'metadata.json') as f:
+                metadata = json.load(f)
+
+            self._table_columns: dict[str, list[str]] = {}
+            self._columns: dict[str, dict[str, np.ndarray]] = {}
+            self._dictionaries: dict[str, dict[str, np.ndarray]] = {}
+            self._string_dtypes: dict[str, dict[str, str]] = {}
+            self._indexes: dict[str, dict[str, tuple[np.ndarray, np.ndarray]]] = {}
+            for table_name, table in metadata['tables'].items():
+                self._table_columns[table_name] = table['columns']
+                self._columns[table_name] = {
+                    column: self._load(table_name, f'{column}.npy') for column in table['columns']
+                }
+                self._dictionaries[table_name] = {
+                    column: self._load(table_name, f'{column}.values.npy') for column in table['strings']
+                }
+                self._string_dtypes[table_name] = table['strings']
+                self._indexes[table_name] = {
+                    column: (self._load(table_name, f'{column}.order.npy'),
+                             self._load(table_name, f'{column}.sorted.npy'))
+                    for column in self.INDEXES[table_name]
+                }
+            self._fragment_columns = metadata['fragment_columns']
+
+            self._sum_lipid_species_ids = self._columns['sum_lipid_species']['sum_lipid_species_id']
+            self._sum_lipid_species_mass_order, self._sum_lipid_species_masses = (
+                self._indexes['sum_lipid_species']['sum_lipid_species_mass']
+            )
+            self._molecular_lipid_species_ids = self._columns['molecular_lipid_species']['molecular_lipid_species_id']
+            self._molecular_lipid_species_sum_lipid_species_ids = (
+                self._columns['molecular_lipid_species']['sum_lipid_species_id']
+            )
+            self._molecular_lipid_species_sum_lipid_species_order, \
+                self._molecular_lipid_species_sum_lipid_species_ids_sorted = (
+                    self._indexes['molecular_lipid_species']['sum_lipid_species_id']
+                )
+            self._fragment_adduct_ids = self._columns['fragment']['adduct_id']
+            self._fragment_molecular_lipid_species_ids = self._columns['fragment']['molecular_lipid_species_id']
+            self._fragment_mass_order, self._fragment_masses = self._indexes['fragment']['fragment_mass']
+
+            adduct = self._rows('adduct', np.arange(len(self._columns['adduct']['adduct_id'])))
+            self._adduct_ids_by_name = adduct.groupby('adduct_name').adduct_id.agg(list).to_dict()
+
+            self._indexed = True
+            logging.info((f"Alex123API: Opening memory-mapped tables with {len(self._molecular_lipid_species_ids)} "
+                          f"molecular lipid species and {len(self._fragment_adduct_ids)} fragments done."))
+
+    def _search(self, table_name: str, column: str, keys: Iterable) -> np.ndarray:
+        order, sorted_values = self._indexes[table_name][column]
+        keys = np.unique(np.asarray(list(keys)))
+        if column in self._dictionaries[table_name]:
+            # translate the strings into their codes
+            dictionary = self._dictionaries[table_name][column]
+            keys = keys.astype(str)
+            codes = np.searchsorted(dictionary, keys)
+            found = codes < len(dictionary)
+            found[found] = dictionary[codes[found]] == keys[found]
+            keys = codes[found]
+        _, sorted_positions = self._expand_ranges(
+            np.searchsorted(sorted_values, keys, side='left'),
+            np.searchsorted(sorted_values, keys, side='right')
+        )
+        return np.sort(order[sorted_positions])
+
+    def _rows(self, table_name: str, positions: np.ndarray, columns: list[str] | None = None) -> pd.DataFrame:
+        results = {}
+        for column in (self._table_columns[table_name] if columns is None else columns):
+            values = self._columns[table_name][column][positions]
+            if column in self._dictionaries[table_name]:
+                codes = values
+                values = self._dictionaries[table_name][column][np.maximum(codes, 0)].astype(object)
+                values[codes < 0] = np.nan
+                values = pd.array(values, dtype=self._string_dtypes[table_name][column])
+            results[column] = values
+        return pd.DataFrame(results)
+
+    def _sum_lipid_species_positions_by_id(self, ids: Iterable) -> np.ndarray:
+        return self._search('sum_lipid_species', 'sum_lipid_species_id', ids)
+
+    def _sum_lipid_species_positions_by_name(self, names: Iterable[str]) -> np.ndarray:
+        return self._search('sum_lipid_species', 'sum_lipid_species_name', names)
+
+    def _species_positions_by_name(self, names: Iterable[str]) -> np.ndarray:
+        return self._search('molecular_lipid_species', 'molecular_lipid_species_name', names)
+
+    def _species_positions_by_sum_lipid_species(self, ids: Iterable) -> np.ndarray:
+        return self._search('molecular_lipid_species', 'sum_lipid_species_id', ids)
+
+    def _fragment_positions(self, ids: Iterable) -> np.ndarray:
+        return self._search('fragment', 'molecular_lipid_species_id', ids)
+
+
 class Alex123API(LipidAPI):
 
     def __init__(self, sql_args: dict = None):
@@ -689,22 +1276,41 @@ class Alex123API(LipidAPI):
         if sql_args is not None:
             logging.info(f"Alex123API: Setting Up the SQL API Connector...")
             try:
-                self.database_connector = Alex123DBConnectorSQL(sql_args)
+                with self._timed('sql_connection'):
+                    self.database_connector = Alex123DBConnectorSQL(sql_args)
                 logging.info(f"Alex123API: Setting Up the SQL API Connector done.")
             except SQLAlchemyError as e:
                 logging.info(f"Alex123API: Failed to set up the SQL API connector...")
-                logging.info(f"Alex123API: Setting up the HDF API connector...")
-                hdf_path = str(files('lipidlibrarian')) + '/data/alex123/alex123_db.h5'
-                self.database_connector = Alex123DBConnectorHDF(hdf_path)
-                logging.info(f"Alex123API: Setting up the HDF API connector done.")
+                self.database_connector = self._file_database_connector()
         else:
-            logging.info(f"Alex123API: Setting up the HDF API connector...")
-            hdf_path = str(files('lipidlibrarian')) + '/data/alex123/alex123_db.h5'
-            self.database_connector = Alex123DBConnectorHDF(hdf_path)
-            logging.info(f"Alex123API: Setting up the HDF API connector done.")
+            self.database_connector = self._file_database_connector()
 
         logging.info(f"Alex123API: Initializing ALEX123 API done.")
 
+    def _file_database_connector(self) -> Alex123DBConnector:
+        # the memory-mapped export is preferred, if it has been built with build_alex123_mmap_database
+        # from the current HDF database
+        mmap_path = str(files('lipidlibrarian')) + '/data/alex123/alex123_mmap'
+        hdf_path = str(files('lipidlibrarian')) + '/data/alex123/alex123_db.h5'
+        use_mmap = (Path(mmap_path) / 'metadata.json').exists()
+        if use_mmap and Path(hdf_path).exists() and not Alex123DBConnectorMmap.is_up_to_date(mmap_path, hdf_path):
+            logging.warning((f"Alex123API: The memory-mapped database {mmap_path} was not built from the current "
+                             f"{hdf_path}. Using the HDF database instead; run build_alex123_mmap_database to "
+                             f"update the memory-mapped database."))
+            use_mmap = False
+
+        if use_mmap:
+            logging.info(f"Alex123API: Setting up the memory-mapped API connector...")
+            with self._timed('mmap_database'):
+                database_connector = Alex123DBConnectorMmap(mmap_path)
+            logging.info(f"Alex123API: Setting up the memory-mapped API connector done.")
+        else:
+            logging.info(f"Alex123API: Setting up the HDF API connector...")
+            with self._timed('hdf_database'):
+                database_connector = Alex123DBConnectorIndexed(hdf_path)
+            logging.info(f"Alex123API: Setting up the HDF API connector done.")
+        return database_connector
+
     def query_lipid(self, lipid: Lipid) -> list[Lipid]:
         results = []
 
@@ -737,12 +1343,82 @@ class Alex123API(LipidAPI):
         results_fragments = self.database_connector.get_fragment_by_molecular_lipid_species(
             results.molecular_lipid_species_id
         )
+        lipids = self._convert_results(results, results_fragments)
+
+        logging.debug(f"Alex123API: Found {len(results)} lipids.")
+        return lipids
+
+    def query_mz_batch(
+            self, mzs: Iterable[float], tolerances: float | Iterable[float], adducts: list[Adduct], cutoff: int = 0
+    ) -> list[list[Lipid]]:
+        """
+        Query the lipids of many m/z values, e.g. of a peak list, at once. All mass windows are looked up
+        in one pass over the database and the fragments of all results are fetched with one query.
+
+        Parameters
+        ----------
+        mzs : Iterable[float]
+            The m/z values.
+        tolerances : float | Iterable[float]
+            The tolerance of every m/z value, or one tolerance for all of them.
+        adducts : list[Adduct]
+            The adducts which are considered for all m/z values.
+        cutoff : int
+            Maximum number of lipids per m/z value, chosen randomly. All lipids are returned if 0.
+
+        Returns
+        -------
+        list[list[Lipid]]
+            The lipids found for every m/z value, in the order of mzs.
+        """
+        mzs = np.asarray(list(mzs), dtype=float)
+        if isinstance(tolerances, Iterable):
+            tolerances = list(tolerances)
+        tolerances = np.broadcast_to(np.asarray(tolerances, dtype=float), mzs.shape)
+        lipids = [[] for _ in range(len(mzs))]
+
+        results = self.database_connector.get_molecular_lipid_species_by_mz_batch(mzs, tolerances, adducts)
+
+        if results is None or results.empty:
+            return lipids
+
+        if cutoff > 0:
+            results = results.sample(frac=1).groupby('query_index').head(cutoff)
 
-        for _, result in results.iterrows():
+        results_fragments = self.database_connector.get_fragment_by_molecular_lipid_species(
+            set(results.molecular_lipid_species_id)
+        )
+        for query_index, query_results in results.groupby('query_index'):
+            lipids[query_index] = self._convert_results(query_results, results_fragments)
+
+        logging.debug(f"Alex123API: Found {len(results)} lipids for {len(mzs)} m/z values.")
+        return lipids
+
+    def _convert_results(
+            self, results: pd.DataFrame, results_fragments: pd.DataFrame | None, name: str | None = None
+    ) -> list[Lipid]:
+        """
+        Build a Lipid for every molecular lipid species in results, with the adducts and fragments
+        in results_fragments. The lipids are named after the species, or all after name if it is given.
+        """
+        lipids = []
+
+        if results_fragments is None or results_fragments.empty:
+            fragment_positions = {}
+        else:
+            fragment_positions = results_fragments.groupby('molecular_lipid_species_id').indices
+            fragment_adduct_names = results_fragments.adduct_name.to_numpy()
+            fragment_names = results_fragments.fragment_name.to_numpy()
+            fragment_sum_formulas = results_fragments.fragment_sum_formula.to_numpy()
+            fragment_masses = results_fragments.fragment_mass.to_numpy(dtype=float)
+
+        for result in results.itertuples(index=False):
             lipid = Lipid()
-            name = result.molecular_lipid_species_name
-            lipid.nomenclature.name = name.replace('-', '_')
-            source = Source(
+            if name is None:
+                lipid.nomenclature.name = result.molecular_lipid_species_name.replace('-', '_')
+            else:
+                lipid.nomenclature.name = name
+            source = intern_source(
                 lipid.nomenclature.get_name(nomenclature_flavor='alex123'),
                 lipid.nomenclature.level,
                 'alex123'
@@ -760,28 +1436,27 @@ class Alex123API(LipidAPI):
                 result.molecular_lipid_species_name,
                 source
             ))
+            sum_lipid_species_mass = float(result.sum_lipid_species_mass)
             lipid.add_mass(Mass.from_data(
                 'neutral mass',
-                float(result.sum_lipid_species_mass),
+                sum_lipid_species_mass,
                 source
             ))
 
-            result_fragments = results_fragments[
-                results_fragments.molecular_lipid_species_id == result.molecular_lipid_species_id
-            ]
-            for _, result_fragment in result_fragments.iterrows():
-                adduct = copy.deepcopy(get_adduct(result_fragment.adduct_name))
+            for position in fragment_positions.get(result.molecular_lipid_species_id, ()):
+                if (adduct := new_adduct(fragment_adduct_names[position])) is None:
+                    continue
                 adduct.add_mass(Mass.from_data(
                     'monoisotopic mass',
-                    round(float(result.sum_lipid_species_mass) + float(adduct.adduct_mass), 6),
+                    round(sum_lipid_species_mass + float(adduct.adduct_mass), 6),
                     source
                 ))
                 fragment = Fragment()
-                fragment.name = result_fragment.fragment_name
-                fragment.sum_formula = result_fragment.fragment_sum_formula
+                fragment.name = fragment_names[position]
+                fragment.sum_formula = fragment_sum_formulas[position]
                 fragment.add_mass(Mass.from_data(
                     'monoisotopic mass',
-                    round(float(result_fragment.fragment_mass), 6),
+                    round(float(fragment_masses[position]), 6),
                     source
                 ))
                 adduct.add_fragment(fragment)
@@ -789,7 +1464,6 @@ class Alex123API(LipidAPI):
 
             lipids.append(lipid)
 
-        logging.debug(f"Alex123API: Found {len(results)} lipids.")
         return lipids
 
     def query_name(self, molecular_lipid_species_name: str, sum_lipid_species_name: str, cutoff: int = 0) -> list[Lipid]:
@@ -808,55 +1482,7 @@ class Alex123API(LipidAPI):
             all_fragment_ids
         )
 
-        for _, result in results.iterrows():
-            lipid = Lipid()
-            lipid.nomenclature.name = molecular_lipid_species_name
-            source = Source(
-                lipid.nomenclature.get_name(nomenclature_flavor='alex123'),
-                lipid.nomenclature.level,
-                'alex123'
-            )
-
-            lipid.nomenclature.add_synonym(Synonym.from_data(
-                result.molecular_lipid_species_name,
-                'result',
-                source
-            ))
-            lipid.nomenclature.lipid_category = result.lipid_category_name
-            lipid.nomenclature.lipid_class = result.lipid_class_name
-            lipid.add_database_identifier(DatabaseIdentifier.from_data(
-                'alex123',
-                result.molecular_lipid_species_name,
-                source
-            ))
-            lipid.add_mass(Mass.from_data(
-                'neutral mass',
-                float(result.sum_lipid_species_mass),
-                source
-            ))
-
-            result_fragments = all_results_fragments[
-                all_results_fragments.molecular_lipid_species_id == result.molecular_lipid_species_id
-            ]
-            for _, result_fragment in result_fragments.iterrows():
-                adduct = copy.deepcopy(get_adduct(result_fragment.adduct_name))
-                adduct.add_mass(Mass.from_data(
-                    'monoisotopic mass',
-                    round(float(result.sum_lipid_species_mass) + float(adduct.adduct_mass), 6),
-                    source
-                ))
-                fragment = Fragment()
-                fragment.name = result_fragment.fragment_name
-                fragment.sum_formula = result_fragment.fragment_sum_formula
-                fragment.add_mass(Mass.from_data(
-                    'monoisotopic mass',
-                    round(float(result_fragment.fragment_mass), 6),
-                    source
-                ))
-                adduct.add_fragment(fragment)
-                lipid.add_adduct(adduct)
-
-            lipids.append(lipid)
+        lipids = self._convert_results(results, all_results_fragments, name=molecular_lipid_species_name)
 
         return lipids
 
@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import threading
+from collections.abc import Coroutine
+from typing import Any
+from urllib.parse import urlsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+
+class AsyncHTTPTransport():
+
+    def __init__(self, headers: dict[str, str] | None = None, max_connections: int = 128,
+                 max_connections_per_host: int = 8):
+        """
+        Asyncio based http transport, which keeps many requests in flight on a single event loop
+        instead of one thread per request. The event loop runs in a daemon thread owned by the
+        transport, so fetch can be awaited from any event loop and run drives coroutines from
+        synchronous code. Requires httpx.
+
+        Parameters
+        ----------
+        headers : dict[str, str] | None
+            Headers sent with every request, e.g. the user agent.
+        max_connections : int
+            Maximum number of open connections.
+        max_connections_per_host : int
+            Maximum number of concurrent requests to a single host.
+        """
+        try:
+            import httpx
+        except ModuleNotFoundError as e:
+            raise ModuleNotFoundError((f"AsyncHTTPTransport: Asynchronous queries require httpx. "
+                                       f"Please install it, e.g. with 'pip install httpx'.")) from e
+
+        self._httpx = httpx
+        self.headers: dict[str, str] = dict(headers or {})
+        self.max_connections: int = int(max_connections)
+        self.max_connections_per_host: int = int(max_connections_per_host)
+        self.requests: int = 0
+        # the client and semaphores belong to the event loop and are only used on its thread
+        self._client = None
+        self._host_semaphores: dict[str, asyncio.Semaphore] = {}
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='LipidLibrarian async http', daemon=True)
+        self._thread.start()
+        logging.info(f"AsyncHTTPTransport: Started event loop with at most {self.max_connections} connections.")
+
+    async def fetch(self, url: str, timeout: int = 30) -> requests.Response | None:
+        """
+        Send a GET request and return the response, or None if the request cannot be sent, e.g.
+        because of an invalid url. Raises TimeoutError if the request timed out and ConnectionError
+        if the connection failed or was lost, so it may be retried.
+
+        Parameters
+        ----------
+        url : str
+            The http query to be sent.
+        timeout : int
+            Seconds, after which the request is killed.
+        """
+        if asyncio.get_running_loop() is not self._loop:
+            return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self._fetch(url, timeout), self._loop))
+        return await self._fetch(url, timeout)
+
+    async def _fetch(self, url: str, timeout: int) -> requests.Response | None:
+        if self._client is None:
+            self._client = self._httpx.AsyncClient(
+                headers=self.headers,
+                follow_redirects=True,
+                limits=self._httpx.Limits(max_connections=self.max_connections,
+                                          max_keepalive_connections=self.max_connections)
+            )
+        host = urlsplit(url).netloc.lower()
+        if (semaphore := self._host_semaphores.get(host)) is None:
+            semaphore = asyncio.Semaphore(self.max_connections_per_host)
+            self._host_semaphores[host] = semaphore
+
+        self.requests += 1
+        try:
+            async with semaphore:
+                response = await self._client.get(url, timeout=timeout)
+        except self._httpx.TimeoutException as e:
+            raise TimeoutError(f"AsyncHTTPTransport: Request to {url} timed out.") from e
+        except (self._httpx.NetworkError, self._httpx.RemoteProtocolError) as e:
+            raise ConnectionError(f"AsyncHTTPTransport: Connection of the request to {url} failed.") from e
+        except self._httpx.HTTPError as _:
+            return None
+        return self._to_requests_response(response)
+
+    @staticmethod
+    def _to_requests_response(response) -> requests.Response:
+        """
+        Convert a httpx response into a requests response, so the APIs parse both alike.
+        """
+        converted = requests.Response()
+        converted.status_code = response.status_code
+        converted._content = response.content
+        converted.headers = CaseInsensitiveDict(response.headers)
+        converted.encoding = response.encoding
+        converted.url = str(response.url)
+        return converted
+
+    def run(self, coroutine: Coroutine) -> Any:
+        """
+        Run the coroutine on the event loop of the transport and wait for its result.
+        """
+        if threading.current_thread() is self._thread:
+            raise RuntimeError((f"AsyncHTTPTransport: run() cannot wait for a coroutine on the event loop "
+                                f"of the transport itself. Await the coroutine instead."))
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def close(self) -> None:
+        if self._client is not None:
+            self.run(self._client.aclose())
+            self._client = None
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        logging.info(f"AsyncHTTPTransport: Sent {self.requests} requests.")
+
+    def __repr__(self) -> str:
+        return f"Async HTTP Transport with {self.requests} requests sent."
@@ -0,0 +1,169 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from urllib.parse import parse_qsl
+from urllib.parse import urlencode
+from urllib.parse import urlsplit
+from urllib.parse import urlunsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+
+class HTTPCache():
+
+    def __init__(self, path: str, ttl: float | None = None, max_size: int | None = None, offline: bool = False):
+        """
+        A persistent cache for http responses, stored in a SQLite database, so repeated queries
+        for the same lipids are answered without contacting the upstream servers again.
+
+        Parameters
+        ----------
+        path : str
+            Path of the SQLite database file. It is created if it does not exist.
+        ttl : float | None
+            Seconds after which a cached response expires. Cached responses never expire if None.
+        max_size : int | None
+            Maximum size of all cached response bodies in bytes. If the cache grows larger, the least
+            recently used responses are evicted. The size is unlimited if None.
+        offline : bool
+            If True, only cached responses are returned and no http requests are sent at all.
+        """
+        self.path: str = str(path)
+        self.ttl: float | None = ttl
+        self.max_size: int | None = max_size
+        self.offline: bool = offline
+        self.hits: int = 0
+        self.misses: int = 0
+
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS response ("
+            "    namespace TEXT NOT NULL, "
+            "    url TEXT NOT NULL, "
+            "    status_code INTEGER NOT NULL, "
+            "    headers TEXT NOT NULL, "
+            "    encoding TEXT, "
+            "    content BLOB NOT NULL, "
+            "    size INTEGER NOT NULL, "
+            "    created REAL NOT NULL, "
+            "    accessed REAL NOT NULL, "
+            "    PRIMARY KEY (namespace, url)"
+            ")"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS idx_response_accessed ON response (accessed)")
+        self._size: int = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM response").fetchone()[0]
+        logging.info(f"HTTPCache: Opened response cache {self.path} containing {self._size} bytes.")
+
+    @staticmethod
+    def normalize_url(url: str) -> str:
+        """
+        Normalize a url, so equivalent urls share one cache entry: the scheme and host are lower-cased,
+        the query parameters are sorted and the fragment is removed.
+        """
+        parts = urlsplit(url.strip())
+        query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+        return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, query, ''))
+
+    def get(self, namespace: str, url: str) -> requests.Response | None:
+        """
+        Return the cached response for the url, or None if it is not cached or has expired.
+        """
+        key = self.normalize_url(url)
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT status_code, headers, encoding, content, size, created FROM response "
+                "WHERE namespace = ? AND url = ?",
+                (namespace, key)
+            ).fetchone()
+
+            if row is not None and self.ttl is not None and row[5] + self.ttl < now:
+                self._connection.execute("DELETE FROM response WHERE namespace = ? AND url = ?", (namespace, key))
+                self._size -= row[4]
+                row = None
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            self._connection.execute(
+                "UPDATE response SET accessed = ? WHERE namespace = ? AND url = ?",
+                (now, namespace, key)
+            )
+            self.hits += 1
+
+        status_code, headers, encoding, content, _, _ = row
+        response = requests.Response()
+        response.status_code = status_code
+        response.headers = CaseInsensitiveDict(json.loads(headers))
+        response.encoding = encoding
+        response._content = content
+        response.url = url
+        return response
+
+    def set(self, namespace: str, url: str, response: requests.Response) -> None:
+        """
+        Store a response for the url, replacing an older response for the same url.
+        """
+        key = self.normalize_url(url)
+        content = response.content if response.content is not None else b''
+        now = time.time()
+        with self._lock:
+            if (row := self._connection.execute(
+                "SELECT size FROM response WHERE namespace = ? AND url = ?",
+                (namespace, key)
+            ).fetchone()) is not None:
+                self._size -= row[0]
+            self._connection.execute(
+                "INSERT OR REPLACE INTO response "
+                "(namespace, url, status_code, headers, encoding, content, size, created, accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (namespace, key, response.status_code, json.dumps(dict(response.headers)), response.encoding,
+                 content, len(content), now, now)
+            )
+            self._size += len(content)
+            self._evict()
+
+    def clear(self, namespace: str | None = None) -> None:
+        """
+        Remove all cached responses, or only those of one namespace.
+        """
+        with self._lock:
+            if namespace is None:
+                self._connection.execute("DELETE FROM response")
+            else:
+                self._connection.execute("DELETE FROM response WHERE namespace = ?", (namespace,))
+            self._size = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM response").fetchone()[0]
+
+    def _evict(self) -> None:
+        if self.max_size is None or self._size <= self.max_size:
+            return
+
+        evicted = 0
+        while self._size > self.max_size:
+            rows = self._connection.execute(
+                "SELECT namespace, url, size FROM response ORDER BY accessed ASC LIMIT 64"
+            ).fetchall()
+            if not rows:
+                break
+            for namespace, url, size in rows:
+                if self._size <= self.max_size:
+                    break
+                self._connection.execute("DELETE FROM response WHERE namespace = ? AND url = ?", (namespace, url))
+                self._size -= size
+                evicted += 1
+        logging.debug(f"HTTPCache: Evicted {evicted} least recently used responses.")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM response").fetchone()[0]
+
+    def __repr__(self) -> str:
+        return f'HTTPCache at {self.path} with {self.hits} hits and {self.misses} misses.'
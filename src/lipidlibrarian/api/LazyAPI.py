@@ -0,0 +1,62 @@
+import logging
+import threading
+import time
+from typing import Any
+
+from .LipidAPI import LipidAPI
+
+
+class LazyAPI():
+    _LAZY_ATTRIBUTES = frozenset({'_api_class', '_args', '_kwargs', '_instance', '_lock'})
+
+    def __init__(self, api_class: type[LipidAPI], *args, **kwargs):
+        """
+        Stand-in for an API, which constructs the API on first use, i.e. when any of its attributes
+        is accessed, so data files and database connections of APIs that are never queried are not
+        loaded at all.
+
+        Parameters
+        ----------
+        api_class : type[LipidAPI]
+            The class of the API.
+
+        The remaining parameters are passed on to the constructor of the API.
+        """
+        object.__setattr__(self, '_api_class', api_class)
+        object.__setattr__(self, '_args', args)
+        object.__setattr__(self, '_kwargs', kwargs)
+        object.__setattr__(self, '_instance', None)
+        object.__setattr__(self, '_lock', threading.Lock())
+
+    @property
+    def instance(self) -> LipidAPI:
+        """
+        The API, which is constructed by the first thread accessing it.
+        """
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    start = time.perf_counter()
+                    instance = self._api_class(*self._args, **self._kwargs)
+                    instance.init_timings['total'] = time.perf_counter() - start
+                    logging.info((f"LazyAPI: Initialized {self._api_class.__name__} in "
+                                  f"{instance.init_timings['total']:.3f} seconds."))
+                    object.__setattr__(self, '_instance', instance)
+        return self._instance
+
+    @property
+    def initialized(self) -> bool:
+        return self._instance is not None
+
+    def __getattr__(self, name: str) -> Any:
+        if name in self._LAZY_ATTRIBUTES:
+            raise AttributeError(name)
+        return getattr(self.instance, name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self.instance, name, value)
+
+    def __repr__(self) -> str:
+        if self._instance is None:
+            return f'Uninitialized {self._api_class.__name__}'
+        return repr(self._instance)
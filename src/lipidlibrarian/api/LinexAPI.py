@@ -10,7 +10,7 @@ from ..lipid.Lipid import Lipid
 from ..lipid.Nomenclature import Level
 from ..lipid.Reaction import Reaction
 from ..lipid.DatabaseIdentifier import DatabaseIdentifier
-from ..lipid.Source import Source
+from ..lipid.Source import intern_source
 
 
 def _load_reactions() -> tuple[dict[str, Any], list[Any]]:
@@ -65,20 +65,22 @@ class LinexAPI(LipidAPI):
         linex_data_path = str(files('lipidlibrarian')) + '/data/linex/linex_data.pbz2'
 
         linex_data: tuple[str, dict[str, Any], list[Any]] = ("", {}, [])
-        try:
-            logging.info(f"LinexAPI: Loading cached LINEX reaction data...")
-            linex_data = pickle.load(bz2.BZ2File(linex_data_path, "rb"))
-            logging.info(f"LinexAPI: Loading cached LINEX reaction data done.")
-        except FileNotFoundError as _:
-            pass
+        with self._timed('load_reaction_data'):
+            try:
+                logging.info(f"LinexAPI: Loading cached LINEX reaction data...")
+                linex_data = pickle.load(bz2.BZ2File(linex_data_path, "rb"))
+                logging.info(f"LinexAPI: Loading cached LINEX reaction data done.")
+            except FileNotFoundError as _:
+                pass
 
         current_linex_version = version("linex2")
         if linex_data[0] != current_linex_version:
             logging.info(f"LinexAPI: Generating LINEX reaction data...")
-            reference_lipids, combined_reactions = _load_reactions()
-            linex_data = (current_linex_version, reference_lipids, combined_reactions)
-            with bz2.BZ2File(linex_data_path, "w") as f:
-                pickle.dump(linex_data, f)
+            with self._timed('generate_reaction_data'):
+                reference_lipids, combined_reactions = _load_reactions()
+                linex_data = (current_linex_version, reference_lipids, combined_reactions)
+                with bz2.BZ2File(linex_data_path, "w") as f:
+                    pickle.dump(linex_data, f)
             logging.info(f"LinexAPI: Generating LINEX reaction data done.")
         self.reference_lipids, self.combined_reactions = linex_data[1], linex_data[2]
         logging.info(f"LinexAPI: Initializing LINEX API done.")
@@ -113,7 +115,7 @@ class LinexAPI(LipidAPI):
     @staticmethod
     def _convert_reaction(linex_reaction: Any, lipid_name: str, lipid_level: Level) -> Reaction:
         reaction = Reaction()
-        source = Source(lipid_name, lipid_level, 'linex')
+        source = intern_source(lipid_name, lipid_level, 'linex')
 
         reaction.direction = "="
         for product in linex_reaction.get_products():
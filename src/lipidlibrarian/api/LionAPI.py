@@ -9,7 +9,7 @@ from .LipidAPI import LipidAPI
 from ..lipid.Lipid import DatabaseIdentifier
 from ..lipid.Lipid import Lipid
 from ..lipid.Nomenclature import Level
-from ..lipid.Source import Source
+from ..lipid.Source import intern_source
 
 
 class LionAPI(LipidAPI):
@@ -25,16 +25,18 @@ class LionAPI(LipidAPI):
         lion_association_path = str(files('lipidlibrarian')) + '/data/lion/lion_association_table.tsv'
 
         try:
-            self.lion_graph = obonet.read_obo(
-                lion_graph_path,
-            )
+            with self._timed('lion_graph'):
+                self.lion_graph = obonet.read_obo(
+                    lion_graph_path,
+                )
             logging.info(f"LionAPI: Ontology Graph contains {self.lion_graph.number_of_nodes()} nodes and {self.lion_graph.number_of_edges()} edges.")
-            self.lion_association = pd.read_csv(
-                lion_association_path,
-                sep='\t',
-                header=0,
-                names=['NAME', 'ID']
-            )
+            with self._timed('lion_association'):
+                self.lion_association = pd.read_csv(
+                    lion_association_path,
+                    sep='\t',
+                    header=0,
+                    names=['NAME', 'ID']
+                )
             logging.info(f"LionAPI: Ontology Association contains {len(self.lion_association)} associations.")
             logging.info(f"LionAPI: Initializing LION API done.")
         except FileNotFoundError as _:
@@ -57,7 +59,7 @@ class LionAPI(LipidAPI):
             ontology_terms = self.get_lion_terms(structural_lipid_species_name)
             if len(ontology_terms) > 0:
                 lipid.ontology.ontology_terms.update(ontology_terms)
-                lipid.ontology.add_source(Source(
+                lipid.ontology.add_source(intern_source(
                     structural_lipid_species_name,
                     Level.structural_lipid_species,
                     'lion'
@@ -71,7 +73,7 @@ class LionAPI(LipidAPI):
             ontology_terms = self.get_lion_terms(sum_lipid_species_name)
             if len(ontology_terms) > 0:
                 lipid.ontology.ontology_terms.update(ontology_terms)
-                lipid.ontology.add_source(Source(
+                lipid.ontology.add_source(intern_source(
                     sum_lipid_species_name,
                     Level.sum_lipid_species,
                     'lion'
@@ -83,7 +85,7 @@ class LionAPI(LipidAPI):
             ontology_terms = self.get_lion_terms(lipidmaps_identifier.identifier)
             if len(ontology_terms) > 0:
                 lipid.ontology.ontology_terms.update(ontology_terms)
-                lipid.ontology.add_source(Source(
+                lipid.ontology.add_source(intern_source(
                     list(lipidmaps_identifier.sources)[0].lipid_name,
                     list(lipidmaps_identifier.sources)[0].lipid_level,
                     'lion'
@@ -95,7 +97,7 @@ class LionAPI(LipidAPI):
             ontology_terms = self.get_lion_terms(swisslipids_identifier.identifier)
             if len(ontology_terms) > 0:
                 lipid.ontology.ontology_terms.update(ontology_terms)
-                lipid.ontology.add_source(Source(
+                lipid.ontology.add_source(intern_source(
                     list(swisslipids_identifier.sources)[0].lipid_name,
                     list(swisslipids_identifier.sources)[0].lipid_level,
                     'lion'
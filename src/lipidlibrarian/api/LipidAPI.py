@@ -1,9 +1,23 @@
+import asyncio
 import datetime
+import logging
+import threading
+import time
+from collections.abc import Iterable
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from importlib.metadata import version
+from urllib.parse import urlsplit
 
 import requests
-# from ratelimit import limits, sleep_and_retry
+from requests.adapters import HTTPAdapter
 
+from .AsyncHTTPTransport import AsyncHTTPTransport
+from .HTTPCache import HTTPCache
+from .RateLimiter import RateLimiter
+from .RetryPolicy import RetryPolicy
+from .SingleFlight import SingleFlight
 from ..lipid.Adduct import Adduct
 from ..lipid.Lipid import Lipid
 from ..lipid.Nomenclature import Level
@@ -13,14 +27,33 @@ TIMEOUT_SECONDS = 120
 
 
 class LipidAPI():
-    # RATE_LIMIT_INTERVAL = 1
-    # RATE_LIMIT_MAX_CALLS_PER_INTERVAL = 1000
+    # Persistent cache for http responses shared by all APIs. Each API stores its responses in
+    # its own namespace. Set it with lipidlibrarian.api.set_http_cache().
+    http_cache: HTTPCache | None = None
+    # Rate limiter and retry policy of the http requests of all APIs. Set them with
+    # lipidlibrarian.api.set_rate_limiter() and lipidlibrarian.api.set_retry_policy().
+    rate_limiter: RateLimiter | None = RateLimiter()
+    retry_policy: RetryPolicy | None = RetryPolicy()
+    # Identical http requests of an API, which are in flight at the same time, are sent only once.
+    single_flight: SingleFlight = SingleFlight()
+
+    # Number of threads used by map_http_queries and connections kept alive per host by each API.
+    MAX_HTTP_WORKERS: int = 8
+    # Maximum number of concurrent requests to a single host, shared by all APIs and threads.
+    MAX_CONNECTIONS_PER_HOST: int = 8
+    _host_semaphores: dict[str, threading.BoundedSemaphore] = {}
+    _host_semaphores_lock = threading.Lock()
+    # Transport of the asynchronous queries shared by all APIs. It is created on first use.
+    _async_transport: AsyncHTTPTransport | None = None
+    _async_transport_lock = threading.Lock()
 
     def __init__(self):
         """
         Initializes the API by reading in necessary data files, opening connections to databases
         and setting a user agent and timeout in case the API implements rate limiting.
         """
+        # seconds spent in each phase of the initialization
+        self.init_timings: dict[str, float] = {}
         self.data = []
         self.last_query = datetime.datetime.fromtimestamp(0)
         self.session: requests.Session = requests.Session()
@@ -29,6 +62,24 @@ class LipidAPI():
                            f"Version {version('lipidlibrarian')} <lipidlibrarian@lipitum.de>"),
             'From': 'lipidlibrarian@lipitum.de'
         })
+        # keep enough connections alive, so concurrent requests to a host reuse them
+        adapter = HTTPAdapter(pool_connections=self.MAX_HTTP_WORKERS, pool_maxsize=self.MAX_HTTP_WORKERS)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._http_executor: ThreadPoolExecutor | None = None
+        self._http_executor_lock = threading.Lock()
+
+    @contextmanager
+    def _timed(self, phase: str) -> Iterator[None]:
+        """
+        Measure the duration of an initialization phase and record it in init_timings.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.init_timings[phase] = time.perf_counter() - start
+            logging.debug(f"{type(self).__name__}: Phase '{phase}' took {self.init_timings[phase]:.3f} seconds.")
 
     def query(self, query_parameters: Lipid | tuple[float, float, list[Adduct]], cutoff: int = 0) -> list[Lipid]:
         """
@@ -138,11 +189,79 @@ class LipidAPI():
         """
         return []
 
-    # @sleep_and_retry
-    # @limits(calls=RATE_LIMIT_MAX_CALLS_PER_INTERVAL, period=RATE_LIMIT_INTERVAL)
+    async def query_async(self, query_parameters: Lipid | tuple[float, float, list[Adduct]],
+                          cutoff: int = 0) -> list[Lipid]:
+        """
+        Asynchronous variant of query(). APIs which support it send their http requests through the
+        shared AsyncHTTPTransport, all other APIs run their synchronous queries in a thread.
+        """
+        if isinstance(query_parameters, Lipid):
+            return await self.query_lipid_async(query_parameters)
+        return await self.query_mz_async(*query_parameters, cutoff=cutoff)
+
+    async def query_lipid_async(self, lipid: Lipid) -> list[Lipid]:
+        """
+        Asynchronous variant of query_lipid().
+        """
+        return await asyncio.to_thread(self.query_lipid, lipid)
+
+    async def query_mz_async(self, mz: float, tolerance: float, adducts: list[Adduct], cutoff: int = 0) -> list[Lipid]:
+        """
+        Asynchronous variant of query_mz().
+        """
+        return await asyncio.to_thread(self.query_mz, mz, tolerance, adducts, cutoff)
+
+    async def query_id_async(self, identifier: str) -> list[Lipid]:
+        """
+        Asynchronous variant of query_id().
+        """
+        return await asyncio.to_thread(self.query_id, identifier)
+
+    async def query_name_async(self, name: str, level: Level = None) -> list[Lipid]:
+        """
+        Asynchronous variant of query_name().
+        """
+        return await asyncio.to_thread(self.query_name, name, level)
+
+    def query_all(self, queries: Iterable[Lipid | tuple[float, float, list[Adduct]]],
+                  cutoff: int = 0) -> list[list[Lipid]]:
+        """
+        Run query_async() for all queries concurrently on the event loop of the shared
+        AsyncHTTPTransport and wait for all of them.
+
+        Parameters
+        ----------
+        queries : Iterable[Lipid | tuple[float, float, list[Adduct]]]
+            The query parameters as passed to query().
+        cutoff : int
+            Maximum number of results each query returns. Only relevant for mz queries.
+
+        Returns
+        -------
+        list[list[Lipid]]
+            The results of each query in the order of the queries.
+        """
+        async def gather() -> list[list[Lipid]]:
+            return list(await asyncio.gather(*(self.query_async(query, cutoff) for query in queries)))
+
+        return self.async_transport.run(gather())
+
+    @property
+    def async_transport(self) -> AsyncHTTPTransport:
+        with LipidAPI._async_transport_lock:
+            if LipidAPI._async_transport is None:
+                LipidAPI._async_transport = AsyncHTTPTransport(
+                    headers=dict(self.session.headers),
+                    max_connections_per_host=self.MAX_CONNECTIONS_PER_HOST
+                )
+            return LipidAPI._async_transport
+
     def execute_http_query(self, url: str, timeout: int = 30) -> requests.Response:
         """
-        Query the API via a http request with respect to the rate limiting values set as constants.
+        Query the API via a http request with respect to the rate limiter and retry policy of all APIs.
+        If a http cache is set, cached responses are returned instead and successful responses are cached.
+        Identical queries of the API from multiple threads, which are in flight at the same time, are sent
+        only once and all callers receive the same Response object, which must therefore not be modified.
 
         Parameters
         ----------
@@ -156,17 +275,145 @@ class LipidAPI():
         requests.Response
             The unmodified Response object with status code and result text.
         """
-        try:
-            response = self.session.get(url, timeout=timeout)
-            if response is None:
-                # If there is no connection to the internet lots of APIs have issues (relatable).
+        return self.single_flight.do((self.cache_namespace, url), self._execute_http_query, url, timeout)
+
+    def _execute_http_query(self, url: str, timeout: int) -> requests.Response:
+        if self.http_cache is not None:
+            if (response := self.http_cache.get(self.cache_namespace, url)) is not None:
+                return response
+            if self.http_cache.offline:
+                return self._service_unavailable_response()
+
+        response = self._send_http_query(url, timeout)
+
+        if self.http_cache is not None and response.status_code == 200:
+            self.http_cache.set(self.cache_namespace, url, response)
+        return response
+
+    def map_http_queries(self, urls: Iterable[str]) -> list[requests.Response]:
+        """
+        Query multiple urls concurrently via execute_http_query, using a pool of MAX_HTTP_WORKERS
+        threads per API. The number of concurrent requests to a single host is limited by
+        MAX_CONNECTIONS_PER_HOST.
+
+        Parameters
+        ----------
+        urls : Iterable[str]
+            The http queries to be sent.
+
+        Returns
+        -------
+        list[requests.Response]
+            The responses in the order of the urls.
+        """
+        urls = list(urls)
+        if len(urls) <= 1:
+            return [self.execute_http_query(url) for url in urls]
+
+        with self._http_executor_lock:
+            if self._http_executor is None:
+                self._http_executor = ThreadPoolExecutor(
+                    max_workers=self.MAX_HTTP_WORKERS,
+                    thread_name_prefix=f"{type(self).__name__} http"
+                )
+        return list(self._http_executor.map(self.execute_http_query, urls))
+
+    @classmethod
+    def _host_semaphore(cls, url: str) -> threading.BoundedSemaphore:
+        host = urlsplit(url).netloc.lower()
+        with cls._host_semaphores_lock:
+            if (semaphore := cls._host_semaphores.get(host)) is None:
+                semaphore = threading.BoundedSemaphore(cls.MAX_CONNECTIONS_PER_HOST)
+                cls._host_semaphores[host] = semaphore
+            return semaphore
+
+    async def execute_http_query_async(self, url: str, timeout: int = 30) -> requests.Response:
+        """
+        Asynchronous variant of execute_http_query(), which sends the request through the shared
+        AsyncHTTPTransport. Identical queries are coalesced with the ones of execute_http_query().
+
+        Parameters
+        ----------
+        url : str
+            The http query to be sent.
+        timeout : int
+            Seconds, after which the request is killed.
+
+        Returns
+        -------
+        requests.Response
+            The unmodified Response object with status code and result text.
+        """
+        return await self.single_flight.do_async((self.cache_namespace, url), self._execute_http_query_async, url, timeout)
+
+    async def _execute_http_query_async(self, url: str, timeout: int) -> requests.Response:
+        if self.http_cache is not None:
+            if (response := self.http_cache.get(self.cache_namespace, url)) is not None:
+                return response
+            if self.http_cache.offline:
+                return self._service_unavailable_response()
+
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire_async(url)
+            try:
+                response = await self.async_transport.fetch(url, timeout)
+                if response is None:
+                    # Requests which cannot be sent, e.g. because of an invalid url, are not retried.
+                    response = self._service_unavailable_response()
+                    break
+            except (TimeoutError, ConnectionError) as _:
+                response = None
+
+            if self.retry_policy is None or (delay := self.retry_policy.retry_delay(attempt, response)) is None:
+                break
+            await asyncio.sleep(delay)
+            attempt += 1
+
+        if response is None:
+            response = self._service_unavailable_response()
+
+        if self.http_cache is not None and response.status_code == 200:
+            self.http_cache.set(self.cache_namespace, url, response)
+        return response
+
+    @property
+    def cache_namespace(self) -> str:
+        return type(self).__name__
+
+    def _send_http_query(self, url: str, timeout: int) -> requests.Response:
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(url)
+            try:
+                with self._host_semaphore(url):
+                    response = self.session.get(url, timeout=timeout)
+                if response is None:
+                    # If there is no connection to the internet lots of APIs have issues (relatable).
+                    # Return a dummy response with 'server error' as status code to handle them here.
+                    response = self._service_unavailable_response()
+            except (TimeoutError, requests.Timeout, requests.ConnectionError) as _:
+                # e.g. connections reset under load, which usually succeed on a retry
+                response = None
+            except (requests.RequestException, KeyError, IndexError, TypeError) as _:
+                # Requests which cannot be sent, e.g. because of an invalid url, are not retried.
                 # Return a dummy response with 'server error' as status code to handle them here.
-                response = requests.Response()
-                response.status_code = 503
-            return response
-        except (TimeoutError, requests.RequestException, KeyError, IndexError, TypeError) as _:
-            # If there is no connection to the internet lots of APIs have issues (relatable).
-            # Return a dummy response with 'server error' as status code to handle them here.
-            response = requests.Response()
-            response.status_code = 503
-            return response
+                return self._service_unavailable_response()
+
+            # timeouts, connection errors, 429 and 5xx responses are retried with backoff
+            if self.retry_policy is None or (delay := self.retry_policy.retry_delay(attempt, response)) is None:
+                break
+            time.sleep(delay)
+            attempt += 1
+
+        if response is None:
+            response = self._service_unavailable_response()
+        return response
+
+    @staticmethod
+    def _service_unavailable_response() -> requests.Response:
+        response = requests.Response()
+        response.status_code = 503
+        return response
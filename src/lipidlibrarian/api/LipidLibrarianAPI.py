@@ -12,7 +12,7 @@ from ..lipid import goslin_get_lipid
 from ..lipid.Lipid import Lipid
 from ..lipid.Nomenclature import Level
 from ..lipid.Mass import Mass
-from ..lipid.Source import Source
+from ..lipid.Source import intern_source
 from ..lipid.StructureIdentifier import StructureIdentifier
 
 
@@ -118,7 +118,7 @@ class LipidLibrarianAPI(LipidAPI):
         if goslin_lipid is None:
             return []
 
-        source = Source(
+        source = intern_source(
             lipid_name=lipid.nomenclature.get_name(),
             lipid_level=lipid.nomenclature.level,
             source="goslin",
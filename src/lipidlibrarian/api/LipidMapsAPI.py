@@ -1,15 +1,22 @@
-import copy
+import asyncio
+import gzip
 import json
 import logging
 import pandas as pd
+import random
+import sqlite3
+import threading
 
+from collections.abc import Iterable
+from collections.abc import Iterator
 from importlib.resources import files
 from io import StringIO
+from pathlib import Path
 from requests import Response
 from typing import Any
 
 from .LipidAPI import LipidAPI
-from ..lipid import get_adduct
+from ..lipid import new_adduct
 from ..lipid.Adduct import Adduct
 from ..lipid.DatabaseIdentifier import DatabaseIdentifier
 from ..lipid.Lipid import Lipid
@@ -17,31 +24,241 @@ from ..lipid.Mass import Mass
 from ..lipid.Nomenclature import Level
 from ..lipid.Synonym import Synonym
 from ..lipid.StructureIdentifier import StructureIdentifier
-from ..lipid.Source import Source
+from ..lipid.Source import intern_source
+
+
+class LipidMapsMirror():
+    # fields of the LMSD export and the corresponding keys of the compound REST API
+    FIELDS: dict[str, str] = {
+        'LM_ID': 'lm_id',
+        'NAME': 'name',
+        'COMMON_NAME': 'name',
+        'SYSTEMATIC_NAME': 'sys_name',
+        'ABBREVIATION': 'abbrev',
+        'ABBREV_CHAINS': 'abbrev_chains',
+        'CATEGORY': 'core',
+        'MAIN_CLASS': 'main_class',
+        'SUB_CLASS': 'sub_class',
+        'EXACT_MASS': 'exactmass',
+        'MASS': 'exactmass',
+        'FORMULA': 'formula',
+        'SYNONYMS': 'synonyms',
+        'INCHI_KEY': 'inchi_key',
+        'INCHI': 'inchi',
+        'SMILES': 'smiles',
+        'PUBCHEM_CID': 'pubchem_cid',
+        'PUBCHEM_COMPOUND_ID': 'pubchem_cid',
+        'HMDB_ID': 'hmdb_id',
+        'HMDBID': 'hmdb_id',
+        'CHEBI_ID': 'chebi_id',
+        'KEGG_ID': 'kegg_id',
+    }
+    # keys of the compound REST API, whose values are indexed as names and as cross references
+    NAME_KEYS: list[str] = ['name', 'sys_name', 'abbrev', 'abbrev_chains']
+    XREF_KEYS: list[str] = ['hmdb_id', 'chebi_id', 'pubchem_cid']
+    # number of identifiers bound to a single query, below the variable limit of older SQLite versions
+    MAX_VARIABLES: int = 500
+
+    def __init__(self, mirror_path: str):
+        """
+        Local mirror of the LIPID MAPS Structure Database (LMSD), which answers the compound, search
+        and moverz queries of the REST API from a SQLite database built from the LMSD export by
+        build(). Compounds are stored in the layout of the compound REST API, so they are converted
+        by LipidMapsAPI._convert_compound_rest_api_lipids like downloaded compounds. The exact masses
+        are indexed in sorted order, so m/z windows are answered by a range scan of the index.
+
+        Parameters
+        ----------
+        mirror_path : str
+            Path of the SQLite database written by LipidMapsMirror.build.
+        """
+        self.mirror_path: str = str(mirror_path)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            f"{Path(self.mirror_path).resolve().as_uri()}?mode=ro",
+            uri=True,
+            check_same_thread=False
+        )
+        logging.info(f"LipidMapsAPI: Using local mirror {self.mirror_path}.")
+
+    @classmethod
+    def build(cls, export_path: str, mirror_path: str, chunksize: int = 50000) -> None:
+        """
+        Build the mirror from the LMSD export, i.e. the structures.sdf file or a CSV file with the same
+        fields, which may be gzip compressed.
+
+        Parameters
+        ----------
+        export_path : str
+            Path of the LMSD export.
+        mirror_path : str
+            Path of the SQLite database, which is replaced if it exists.
+        chunksize : int
+            Number of compounds which are written at once.
+        """
+        logging.info(f"LipidMapsAPI: Building local mirror {mirror_path} from {export_path}...")
+        Path(mirror_path).parent.mkdir(parents=True, exist_ok=True)
+        Path(mirror_path).unlink(missing_ok=True)
+        connection = sqlite3.connect(mirror_path)
+        connection.execute("CREATE TABLE compound (lm_id TEXT PRIMARY KEY, exact_mass REAL, entry TEXT)")
+        connection.execute("CREATE TABLE name (name TEXT, lm_id TEXT)")
+        connection.execute("CREATE TABLE xref (database TEXT, identifier TEXT, lm_id TEXT)")
+
+        count = 0
+        compounds, names, xrefs = [], [], []
+        for record in cls._read_records(export_path):
+            entry = cls._entry_from_record(record)
+            if (identifier := entry.get('lm_id')) is None:
+                continue
+            try:
+                exact_mass = float(entry['exactmass'])
+            except (KeyError, ValueError) as _:
+                exact_mass = None
+            compounds.append((identifier, exact_mass, json.dumps(entry)))
+            terms = {entry.get(key) for key in cls.NAME_KEYS}
+            if (synonyms := entry.get('synonyms')) is not None:
+                terms.update(synonyms.split('; '))
+            names.extend((term.lower(), identifier) for term in terms if term)
+            xrefs.extend((key, entry[key], identifier) for key in cls.XREF_KEYS if entry.get(key) is not None)
+
+            if len(compounds) >= chunksize:
+                count += cls._insert(connection, compounds, names, xrefs)
+                compounds, names, xrefs = [], [], []
+        count += cls._insert(connection, compounds, names, xrefs)
+
+        connection.execute("CREATE INDEX idx_exact_mass ON compound (exact_mass)")
+        connection.execute("CREATE INDEX idx_name ON name (name)")
+        connection.execute("CREATE INDEX idx_xref ON xref (database, identifier)")
+        connection.commit()
+        connection.close()
+        logging.info(f"LipidMapsAPI: Building local mirror with {count} compounds done.")
+
+    @staticmethod
+    def _insert(connection: sqlite3.Connection, compounds: list[tuple], names: list[tuple], xrefs: list[tuple]) -> int:
+        connection.executemany("INSERT OR REPLACE INTO compound VALUES (?, ?, ?)", compounds)
+        connection.executemany("INSERT INTO name VALUES (?, ?)", names)
+        connection.executemany("INSERT INTO xref VALUES (?, ?, ?)", xrefs)
+        return len(compounds)
+
+    @staticmethod
+    def _read_records(export_path: str) -> Iterator[dict[str, str]]:
+        open_export = gzip.open if export_path.endswith('.gz') else open
+        if not export_path.removesuffix('.gz').endswith('.sdf'):
+            with open_export(export_path, 'rt', encoding='utf-8', errors='replace') as file:
+                yield from pd.read_csv(file, dtype=str, keep_default_na=False).to_dict('records')
+            return
+
+        with open_export(export_path, 'rt', encoding='utf-8', errors='replace') as file:
+            record: dict[str, str] = {}
+            field: str | None = None
+            for line in file:
+                line = line.rstrip('\r\n')
+                if line == '$$$$':
+                    yield record
+                    record, field = {}, None
+                elif line.startswith('> ') and '<' in line:
+                    field = line[line.index('<') + 1:line.rindex('>')]
+                elif line == '':
+                    field = None
+                elif field is not None:
+                    record[field] = f"{record[field]}\n{line}" if field in record else line
+
+    @classmethod
+    def _entry_from_record(cls, record: dict[str, str]) -> dict[str, str]:
+        entry = {}
+        for field, key in cls.FIELDS.items():
+            if (value := record.get(field, '').strip()) not in ('', '-') and key not in entry:
+                entry[key] = value
+        return entry
+
+    def _select(self, query: str, parameters: list) -> list[tuple]:
+        with self._lock:
+            return self._connection.execute(query, parameters).fetchall()
+
+    def get_entries(self, identifiers: Iterable[str]) -> list[dict[str, str]]:
+        """
+        Return the compounds with the LIPID MAPS identifiers in the layout of the compound REST API.
+        """
+        identifiers = list(dict.fromkeys(identifiers))
+        rows = {}
+        for start in range(0, len(identifiers), self.MAX_VARIABLES):
+            chunk = identifiers[start:start + self.MAX_VARIABLES]
+            rows.update(self._select(
+                f"SELECT lm_id, entry FROM compound WHERE lm_id IN ({', '.join('?' * len(chunk))})",
+                chunk
+            ))
+        return [json.loads(rows[identifier]) for identifier in identifiers if identifier in rows]
+
+    def search(self, name: str) -> list[str]:
+        """
+        Return the LIPID MAPS identifiers of the compounds with the name, abbreviation or synonym.
+        """
+        rows = self._select("SELECT DISTINCT lm_id FROM name WHERE name = ? ORDER BY lm_id", [name.lower()])
+        return [row[0] for row in rows]
+
+    def search_xref(self, identifier: str) -> list[str]:
+        """
+        Return the LIPID MAPS identifiers of the compounds with the HMDB, ChEBI or PubChem identifier.
+        """
+        rows = self._select(
+            f"SELECT DISTINCT lm_id FROM xref WHERE identifier = ? "
+            f"AND database IN ({', '.join('?' * len(self.XREF_KEYS))}) ORDER BY lm_id",
+            [identifier] + self.XREF_KEYS
+        )
+        return [row[0] for row in rows]
+
+    def get_entries_by_mass(self, lower: float, upper: float) -> list[tuple[dict[str, str], float]]:
+        """
+        Return the compounds with an exact mass between lower and upper in the layout of the compound
+        REST API together with their exact masses, sorted by exact mass.
+        """
+        rows = self._select(
+            "SELECT entry, exact_mass FROM compound WHERE exact_mass BETWEEN ? AND ? ORDER BY exact_mass",
+            [lower, upper]
+        )
+        return [(json.loads(entry), exact_mass) for entry, exact_mass in rows]
+
+    def __len__(self) -> int:
+        return self._select("SELECT COUNT(*) FROM compound", [])[0][0]
 
 
 class LipidMapsAPI(LipidAPI):
 
-    def __init__(self):
+    def __init__(self, mirror_path: str | None = None):
+        """
+        Parameters
+        ----------
+        mirror_path : str | None
+            Path of a local LMSD mirror built with build_lipidmaps_mirror, which is used instead of the
+            REST API. Defaults to data/lipidmaps/lipidmaps_mirror.sqlite, if it exists.
+        """
         logging.info(f"LipidMapsAPI: Initializing LIPID MAPS API...")
         super().__init__()
 
         self.goslin_converted_names: pd.DataFrame | None = None
+        self.mirror: LipidMapsMirror | None = None
+
+        if mirror_path is None:
+            mirror_path = str(files('lipidlibrarian')) + '/data/lipidmaps/lipidmaps_mirror.sqlite'
+        if Path(mirror_path).is_file():
+            with self._timed('mirror'):
+                self.mirror = LipidMapsMirror(mirror_path)
 
         goslin_converted_names_path = str(files('lipidlibrarian')) + '/data/lipidmaps/goslin_converted_names.tsv'
 
-        try:
-            self.goslin_converted_names = pd.read_csv(
-                goslin_converted_names_path,
-                sep='\t',
-                header=None,
-                names=['id', 'name', 'goslin_name']
-            )
-            logging.info(f"LipidMapsAPI: Goslin parsed LIPID MAPS lipid name database contains {len(self.goslin_converted_names)} associations.")
+        with self._timed('goslin_converted_names'):
+            try:
+                self.goslin_converted_names = pd.read_csv(
+                    goslin_converted_names_path,
+                    sep='\t',
+                    header=None,
+                    names=['id', 'name', 'goslin_name']
+                )
+                logging.info(f"LipidMapsAPI: Goslin parsed LIPID MAPS lipid name database contains {len(self.goslin_converted_names)} associations.")
             
-        except FileNotFoundError as _:
-            self.goslin_converted_names = None
-            logging.info(f"LipidMapsAPI: Goslin parsed LIPID MAPS lipid name database not found. Disabling...")
+            except FileNotFoundError as _:
+                self.goslin_converted_names = None
+                logging.info(f"LipidMapsAPI: Goslin parsed LIPID MAPS lipid name database not found. Disabling...")
 
         logging.info(f"LipidMapsAPI: Initializing LIPID MAPS API done.")
 
@@ -73,7 +290,10 @@ class LipidMapsAPI(LipidAPI):
         if tolerance < 0:
             return []
 
-        results = self._query_moverz_rest_api(mz, tolerance, adducts, cutoff)
+        if self.mirror is not None:
+            results = self._query_mirror_mz(mz, tolerance, adducts, cutoff)
+        else:
+            results = self._query_moverz_rest_api(mz, tolerance, adducts, cutoff)
 
         logging.debug(f"LipidMapsAPI: query_mz: Found {len(results)} lipid(s).")
         return results
@@ -84,8 +304,12 @@ class LipidMapsAPI(LipidAPI):
             return []
 
         results = []
-        results.extend(self._query_compound_rest_api(identifier, 'lm_id'))
-        results.extend(self._query_lmsd_record_api(identifier))
+        if self.mirror is not None:
+            lipidmaps_identifiers = [identifier] + self.mirror.search_xref(identifier)
+            results.extend(self._convert_compound_rest_api_lipids(self.mirror.get_entries(lipidmaps_identifiers)))
+        else:
+            results.extend(self._query_compound_rest_api(identifier, 'lm_id'))
+            results.extend(self._query_lmsd_record_api(identifier))
 
         logging.debug(f"LipidMapsAPI: query_id: Found {len(results)} lipid(s).")
         return results
@@ -97,6 +321,14 @@ class LipidMapsAPI(LipidAPI):
         
         results: list[Lipid] = []
 
+        if self.mirror is not None:
+            if level in (Level.level_unknown, Level.structural_lipid_species, Level.isomeric_lipid_species):
+                results.extend(self._convert_compound_rest_api_lipids(
+                    self.mirror.get_entries(self.mirror.search(name))
+                ))
+            logging.debug(f"LipidMapsAPI: query_name: Found {len(results)} lipid(s).")
+            return results
+
         if level == Level.level_unknown or level == Level.structural_lipid_species:
             results.extend(self._query_compound_rest_api(name, 'abbrev_chains'))
         if level == Level.level_unknown or level == Level.isomeric_lipid_species:
@@ -106,17 +338,31 @@ class LipidMapsAPI(LipidAPI):
         return results
 
     def _query_lmsd_search_api(self, input_items: list[tuple[str, str]]) -> list[Lipid]:
+        response = self.execute_http_query(self._lmsd_search_url(input_items))
+
+        results: list[Lipid] = []
+        for lipidmaps_identifier in self._parse_lmsd_search_response(response):
+            results.extend(self._query_compound_rest_api(lipidmaps_identifier, 'lm_id'))
+
+        return results
+
+    @staticmethod
+    def _lmsd_search_url(input_items: list[tuple[str, str]]) -> str:
         query_parameters = []
         for input_item in input_items:
             query_parameters.append(f"{input_item[0]}={input_item[1]}")
 
-        query_url = (
+        return (
             f"http://www.lipidmaps.org/data/structure/LMSDSearch.php?"
             f"Mode=ProcessStrSearch&OutputMode=File&OutputType=CSV&OutputColumnHeader=Yes&"
             f"{'&'.join(query_parameters)}"
         )
 
-        response = self.execute_http_query(query_url)
+    @staticmethod
+    def _parse_lmsd_search_response(response: Response) -> list[str]:
+        """
+        Return the LIPID MAPS identifiers of an LMSD search response.
+        """
         if response.status_code != 200:
             return []
 
@@ -129,22 +375,24 @@ class LipidMapsAPI(LipidAPI):
         except ValueError as _:
             return []
 
-        results: list[Lipid] = []
-        for query_result in query_results:
-            results.extend(self._query_compound_rest_api(query_result['LM_ID'], 'lm_id'))
-
-        return results
+        return [query_result['LM_ID'] for query_result in query_results]
 
     def _query_lmsd_record_api(self, lipidmaps_identifier: str) -> list[Lipid]:
-        url = f"https://www.lipidmaps.org/databases/lmsd/{lipidmaps_identifier}?format=csv"
-        response = self.execute_http_query(url)
+        return self._parse_lmsd_record_response(self.execute_http_query(self._lmsd_record_url(lipidmaps_identifier)))
+
+    @staticmethod
+    def _lmsd_record_url(lipidmaps_identifier: str) -> str:
+        return f"https://www.lipidmaps.org/databases/lmsd/{lipidmaps_identifier}?format=csv"
+
+    @classmethod
+    def _parse_lmsd_record_response(cls, response: Response) -> list[Lipid]:
         if response.status_code != 200:
             return []
         try:
             result: dict[str, str] = pd.read_csv(StringIO(response.text)).to_dict(orient='index')[0]
         except ValueError as _:
             return []
-        return self._convert_lmsd_record_lipid(result)
+        return cls._convert_lmsd_record_lipid(result)
 
     @staticmethod
     def _convert_lmsd_record_lipid(data: dict[str, str]) -> list[Lipid]:
@@ -152,7 +400,7 @@ class LipidMapsAPI(LipidAPI):
 
         lipid = Lipid()
         lipid.nomenclature.name = lipid_name
-        source = Source(lipid_name, lipid.nomenclature.level, 'lipidmaps')
+        source = intern_source(lipid_name, lipid.nomenclature.level, 'lipidmaps')
 
         if (common_name := data.get('COMMON_NAME')) is not None:
             lipid.nomenclature.add_synonym(Synonym.from_data(
@@ -226,6 +474,12 @@ class LipidMapsAPI(LipidAPI):
         return [lipid]
 
     def _query_compound_rest_api(self, search_term: str, input_item: str) -> list[Lipid]:
+        return self._parse_compound_rest_api_response(
+            self.execute_http_query(self._compound_rest_api_url(search_term, input_item))
+        )
+
+    @staticmethod
+    def _compound_rest_api_url(search_term: str, input_item: str) -> str:
         if input_item not in ['lm_id', 'formula', 'inchi_key', 'pubchem_cid', 'hmdb_id', 'kegg_id', 'chebi_id',
                               'smiles', 'abbrev', 'abbrev_chains']:
             raise ValueError((
@@ -234,8 +488,10 @@ class LipidMapsAPI(LipidAPI):
                 f"as you are using the context 'compound'"
             ))
 
-        url = f"https://www.lipidmaps.org/rest/compound/{input_item}/{search_term}/all/json"
-        response = self.execute_http_query(url)
+        return f"https://www.lipidmaps.org/rest/compound/{input_item}/{search_term}/all/json"
+
+    @classmethod
+    def _parse_compound_rest_api_response(cls, response: Response) -> list[Lipid]:
         if response.status_code != 200:
             return []
 
@@ -250,7 +506,7 @@ class LipidMapsAPI(LipidAPI):
             result = list(result.values())
         else:
             result = [result]
-        return self._convert_compound_rest_api_lipids(result)
+        return cls._convert_compound_rest_api_lipids(result)
 
     @staticmethod
     def _convert_compound_rest_api_lipids(data: list[dict[str, Any]]) -> list[Lipid]:
@@ -262,7 +518,7 @@ class LipidMapsAPI(LipidAPI):
                 lipid_name = lipid_name.replace(' [iso2]', '')
                 lipid_name = lipid_name.replace(' [iso6]', '')
                 lipid.nomenclature.name = lipid_name
-                source = Source(lipid_name, lipid.nomenclature.level, 'lipidmaps')
+                source = intern_source(lipid_name, lipid.nomenclature.level, 'lipidmaps')
                 lipid.nomenclature.add_synonym(Synonym.from_data(
                     lipid_name,
                     'name',
@@ -271,7 +527,7 @@ class LipidMapsAPI(LipidAPI):
             if (lipid_name := lipid_data.get('sys_name')) is not None:
                 if lipid.nomenclature.level is Level.level_unknown:
                     lipid.nomenclature.name = lipid_name
-                    source = Source(lipid_name, lipid.nomenclature.level, 'lipidmaps')
+                    source = intern_source(lipid_name, lipid.nomenclature.level, 'lipidmaps')
                 lipid.nomenclature.add_synonym(Synonym.from_data(
                     lipid_name,
                     'sys_name',
@@ -280,7 +536,7 @@ class LipidMapsAPI(LipidAPI):
             if (lipid_name := lipid_data.get('abbrev_chains')) is not None:
                 if lipid.nomenclature.level is Level.level_unknown:
                     lipid.nomenclature.name = lipid_name
-                    source = Source(lipid_name, lipid.nomenclature.level, 'lipidmaps')
+                    source = intern_source(lipid_name, lipid.nomenclature.level, 'lipidmaps')
                 lipid.nomenclature.add_synonym(Synonym.from_data(
                     lipid_name,
                     'abbrev_chains',
@@ -289,7 +545,7 @@ class LipidMapsAPI(LipidAPI):
             if (lipid_name := lipid_data.get('abbrev')) is not None:
                 if lipid.nomenclature.level is Level.level_unknown:
                     lipid.nomenclature.name = lipid_name
-                    source = Source(lipid_name, lipid.nomenclature.level, 'lipidmaps')
+                    source = intern_source(lipid_name, lipid.nomenclature.level, 'lipidmaps')
                 lipid.nomenclature.add_synonym(Synonym.from_data(
                     lipid_name,
                     'abbrev',
@@ -376,24 +632,144 @@ class LipidMapsAPI(LipidAPI):
 
     def _query_moverz_rest_api(self, mz: float, tolerance: float, adducts: list[Adduct],
                                cutoff: int = 0) -> list[Lipid]:
-        base_url = 'https://www.lipidmaps.org/rest/moverz/LIPIDS'
+        # the adducts are queried concurrently
+        responses = self.map_http_queries(
+            self._moverz_rest_api_url(mz, tolerance, adduct.lipidmaps_name)
+            for adduct in adducts if adduct.lipidmaps_name is not None
+        )
 
-        query_result = pd.DataFrame()
-        for adduct in adducts:
-            if (adduct_name := adduct.lipidmaps_name) is not None:
-                query_url = f"{base_url}/{mz}/{adduct_name}/{tolerance}/txt"
-                response = self.execute_http_query(query_url)
-                if response.status_code != 200 or response.text.startswith('Internal error:'):
-                    continue
-                query_result = pd.concat([
-                    query_result,
-                    self._parse_moverz_rest_api_result(response)
-                ], ignore_index=True)
+        return self._convert_moverz_rest_api_responses(responses, cutoff)
+
+    @staticmethod
+    def _moverz_rest_api_url(mz: float, tolerance: float, adduct_name: str) -> str:
+        return f"https://www.lipidmaps.org/rest/moverz/LIPIDS/{mz}/{adduct_name}/{tolerance}/txt"
+
+    @classmethod
+    def _convert_moverz_rest_api_responses(cls, responses: list[Response], cutoff: int = 0) -> list[Lipid]:
+        query_results = [
+            cls._parse_moverz_rest_api_result(response)
+            for response in responses
+            if response.status_code == 200 and not response.text.startswith('Internal error:')
+        ]
+        # concatenate once instead of copying the growing result for every adduct
+        query_result = pd.concat(query_results, ignore_index=True) if query_results else pd.DataFrame()
 
         if cutoff > 0:
             query_result = query_result.sample(min(cutoff, len(query_result.index)), replace=False)
 
-        return self._convert_moverz_rest_api_lipids(query_result)
+        return cls._convert_moverz_rest_api_lipids(query_result)
+
+    # The async queries run on the event loop shared by all APIs, so the mirror, pandas and lipid
+    # conversion work is done in threads, and only the http requests are awaited on the loop.
+
+    async def query_lipid_async(self, lipid: Lipid) -> list[Lipid]:
+        if self.mirror is not None:
+            return await super().query_lipid_async(lipid)
+
+        identifiers = [identifier.identifier for identifier in lipid.get_database_identifiers('lipidmaps')]
+        if self.goslin_converted_names is not None:
+            identifiers.extend(await asyncio.to_thread(
+                self._goslin_converted_identifiers, lipid.nomenclature.get_name()
+            ))
+
+        query_results = await asyncio.gather(
+            *(self.query_id_async(identifier) for identifier in identifiers),
+            self.query_name_async(lipid.nomenclature.get_name(nomenclature_flavor='lipidmaps'), lipid.nomenclature.level)
+        )
+        results = [result for query_result in query_results for result in query_result]
+        logging.debug(f"LipidMapsAPI: query_lipid_async: Found {len(results)} lipid(s).")
+        return results
+
+    async def query_mz_async(self, mz: float, tolerance: float, adducts: list[Adduct], cutoff: int = 0) -> list[Lipid]:
+        if self.mirror is not None or mz <= 0 or tolerance < 0:
+            return await super().query_mz_async(mz, tolerance, adducts, cutoff)
+
+        responses = await asyncio.gather(*(
+            self.execute_http_query_async(self._moverz_rest_api_url(mz, tolerance, adduct.lipidmaps_name))
+            for adduct in adducts if adduct.lipidmaps_name is not None
+        ))
+        results = await asyncio.to_thread(self._convert_moverz_rest_api_responses, responses, cutoff)
+        logging.debug(f"LipidMapsAPI: query_mz_async: Found {len(results)} lipid(s).")
+        return results
+
+    async def query_id_async(self, identifier: str) -> list[Lipid]:
+        if self.mirror is not None or identifier is None or identifier == '' or not isinstance(identifier, str):
+            return await super().query_id_async(identifier)
+
+        compound_response, record_response = await asyncio.gather(
+            self.execute_http_query_async(self._compound_rest_api_url(identifier, 'lm_id')),
+            self.execute_http_query_async(self._lmsd_record_url(identifier))
+        )
+        results = await asyncio.to_thread(self._parse_id_responses, compound_response, record_response)
+        logging.debug(f"LipidMapsAPI: query_id_async: Found {len(results)} lipid(s).")
+        return results
+
+    async def query_name_async(self, name: str, level: Level = None) -> list[Lipid]:
+        if self.mirror is not None or name is None or name == '' or not isinstance(name, str):
+            return await super().query_name_async(name, level)
+
+        results: list[Lipid] = []
+        if level == Level.level_unknown or level == Level.structural_lipid_species:
+            results.extend(await asyncio.to_thread(
+                self._parse_compound_rest_api_response,
+                await self.execute_http_query_async(self._compound_rest_api_url(name, 'abbrev_chains'))
+            ))
+        if level == Level.level_unknown or level == Level.isomeric_lipid_species:
+            lipidmaps_identifiers = self._parse_lmsd_search_response(
+                await self.execute_http_query_async(self._lmsd_search_url([('Name', name)]))
+            )
+            responses = await asyncio.gather(*(
+                self.execute_http_query_async(self._compound_rest_api_url(lipidmaps_identifier, 'lm_id'))
+                for lipidmaps_identifier in lipidmaps_identifiers
+            ))
+            for lipids in await asyncio.gather(*(
+                asyncio.to_thread(self._parse_compound_rest_api_response, response) for response in responses
+            )):
+                results.extend(lipids)
+
+        logging.debug(f"LipidMapsAPI: query_name_async: Found {len(results)} lipid(s).")
+        return results
+
+    @classmethod
+    def _parse_id_responses(cls, compound_response: Response, record_response: Response) -> list[Lipid]:
+        results = cls._parse_compound_rest_api_response(compound_response)
+        results.extend(cls._parse_lmsd_record_response(record_response))
+        return results
+
+    def _goslin_converted_identifiers(self, name: str) -> list[str]:
+        return list(self.goslin_converted_names[self.goslin_converted_names['goslin_name'] == name]['id'].values)
+
+    def _query_mirror_mz(self, mz: float, tolerance: float, adducts: list[Adduct], cutoff: int = 0) -> list[Lipid]:
+        results: list[Lipid] = []
+        for adduct in adducts:
+            if adduct.lipidmaps_name is None or adduct.adduct_mass is None or not adduct.charge:
+                continue
+            charge = abs(adduct.charge)
+            # the entries are selected by the mass range itself, so a wide tolerance does not bind one
+            # variable per matching compound
+            matches = self.mirror.get_entries_by_mass(
+                (mz - tolerance) * charge - adduct.adduct_mass,
+                (mz + tolerance) * charge - adduct.adduct_mass
+            )
+            entries = [entry for entry, _ in matches]
+            for lipid, (_, exact_mass) in zip(self._convert_compound_rest_api_lipids(entries), matches):
+                lipid_adduct = new_adduct(adduct.name)
+                lipid_adduct.add_mass(Mass.from_data(
+                    'monoisotopic mass',
+                    (exact_mass + adduct.adduct_mass) / charge,
+                    intern_source(
+                        lipid.nomenclature.get_name(nomenclature_flavor='lipidmaps'),
+                        lipid.nomenclature.level,
+                        'lipidmaps'
+                    )
+                ))
+                lipid.add_adduct(lipid_adduct)
+                results.append(lipid)
+
+        if cutoff > 0 and len(results) > cutoff:
+            results = random.sample(results, cutoff)
+
+        return results
 
     @staticmethod
     def _parse_moverz_rest_api_result(response: Response) -> pd.DataFrame:
@@ -431,7 +807,7 @@ class LipidMapsAPI(LipidAPI):
                 continue
 
             lipid.nomenclature.name = entry[1].get('Name')
-            source = Source(
+            source = intern_source(
                 lipid.nomenclature.get_name(nomenclature_flavor='lipidmaps'),
                 lipid.nomenclature.level,
                 'lipidmaps'
@@ -448,7 +824,7 @@ class LipidMapsAPI(LipidAPI):
                 ))
             else:
                 adduct_name = adduct_name[adduct_name.find('[') + 1:adduct_name.find(']')]
-                adduct = copy.deepcopy(get_adduct(adduct_name))
+                adduct = new_adduct(adduct_name)
                 if adduct is not None:
                     adduct.add_mass(Mass.from_data(
                         'monoisotopic mass',
@@ -461,4 +837,6 @@ class LipidMapsAPI(LipidAPI):
         return results
 
     def __repr__(self) -> str:
+        if self.mirror is not None:
+            return f'LipidMapsAPI with local mirror {self.mirror.mirror_path}.'
         return f'LipidMapsAPI with { 0 if self.goslin_converted_names is None else len(self.goslin_converted_names) } conversions pre-loaded.'
@@ -0,0 +1,74 @@
+import asyncio
+import logging
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+class RateLimiter():
+
+    def __init__(self, requests_per_second: float = 10.0, burst: int = 10,
+                 host_requests_per_second: dict[str, float] | None = None):
+        """
+        Client-side rate limiter with one token bucket per upstream host, shared by all threads and
+        event loops. Every request takes a token; tokens are refilled at the rate of the host up to
+        burst tokens. Requests without an available token wait until one would be refilled.
+
+        Parameters
+        ----------
+        requests_per_second : float
+            Sustained number of requests per second to a single host.
+        burst : int
+            Number of requests to a single host which may be sent at once after a pause.
+        host_requests_per_second : dict[str, float] | None
+            Rates of individual hosts, e.g. {'www.lipidmaps.org': 5.0}, overriding requests_per_second.
+        """
+        if requests_per_second <= 0:
+            raise ValueError((f"The requests_per_second = {requests_per_second} parameter does not contain a "
+                              f"valid rate. Please choose a positive number."))
+        if burst < 1:
+            raise ValueError((f"The burst = {burst} parameter does not contain a number that represents a "
+                              f"valid amount of requests. Please choose a positive integer."))
+
+        self.requests_per_second: float = float(requests_per_second)
+        self.burst: int = int(burst)
+        self.host_requests_per_second: dict[str, float] = {
+            host.lower(): float(rate) for host, rate in (host_requests_per_second or {}).items()
+        }
+        # number of requests which had to wait for a token and the seconds they waited in total
+        self.throttled: int = 0
+        self.throttled_seconds: float = 0.0
+        # available tokens and time of the last refill of each host
+        self._buckets: dict[str, tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def reserve(self, url: str) -> float:
+        """
+        Take a token of the host of the url and return the seconds to wait until it is available.
+        """
+        host = urlsplit(url).netloc.lower()
+        rate = self.host_requests_per_second.get(host, self.requests_per_second)
+        now = time.monotonic()
+        with self._lock:
+            tokens, last_refill = self._buckets.get(host, (float(self.burst), now))
+            tokens = min(float(self.burst), tokens + (now - last_refill) * rate) - 1.0
+            self._buckets[host] = (tokens, now)
+            if tokens >= 0:
+                return 0.0
+            delay = -tokens / rate
+            self.throttled += 1
+            self.throttled_seconds += delay
+        logging.debug(f"RateLimiter: Throttling request to {host} for {delay:.3f} seconds.")
+        return delay
+
+    def acquire(self, url: str) -> None:
+        if (delay := self.reserve(url)) > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self, url: str) -> None:
+        if (delay := self.reserve(url)) > 0:
+            await asyncio.sleep(delay)
+
+    def __repr__(self) -> str:
+        return (f"Rate Limiter with {self.requests_per_second} requests per second per host, "
+                f"{self.throttled} requests throttled.")
@@ -0,0 +1,71 @@
+import logging
+import random
+import threading
+
+import requests
+
+
+class RetryPolicy():
+    # status codes of responses, which are worth retrying
+    RETRY_STATUS_CODES: frozenset[int] = frozenset({429, 500, 502, 503, 504})
+
+    def __init__(self, max_retries: int = 3, backoff: float = 0.5, max_backoff: float = 30.0):
+        """
+        Retry policy for http requests, which retries timeouts, failed connections and responses
+        with the status codes 429 and 5xx using exponential backoff with full jitter. A Retry-After header sent by the
+        server is respected.
+
+        Parameters
+        ----------
+        max_retries : int
+            Maximum number of retries of a single request.
+        backoff : float
+            Seconds of the first backoff, which doubles with every retry.
+        max_backoff : float
+            Maximum number of seconds to wait before a retry.
+        """
+        if max_retries < 0:
+            raise ValueError((f"The max_retries = {max_retries} parameter does not contain a number that "
+                              f"represents a valid amount of retries. Please choose a non-negative integer."))
+
+        self.max_retries: int = int(max_retries)
+        self.backoff: float = float(backoff)
+        self.max_backoff: float = float(max_backoff)
+        # number of retries and of requests which still failed after max_retries retries
+        self.retries: int = 0
+        self.exhausted: int = 0
+        self._lock = threading.Lock()
+
+    def retry_delay(self, attempt: int, response: requests.Response | None) -> float | None:
+        """
+        Return the seconds to wait before retrying a request, or None if it is not retried.
+
+        Parameters
+        ----------
+        attempt : int
+            Number of retries of the request so far.
+        response : requests.Response | None
+            The response of the request, or None if it timed out or its connection failed.
+        """
+        if response is not None and response.status_code not in self.RETRY_STATUS_CODES:
+            return None
+        if attempt >= self.max_retries:
+            with self._lock:
+                self.exhausted += 1
+            return None
+
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        if response is not None and (retry_after := response.headers.get('Retry-After')) is not None:
+            try:
+                delay = min(self.max_backoff, max(delay, float(retry_after)))
+            except ValueError as _:
+                pass
+
+        with self._lock:
+            self.retries += 1
+        status = 'timeout or connection error' if response is None else f"status code {response.status_code}"
+        logging.info(f"RetryPolicy: Retrying request after {status} in {delay:.3f} seconds...")
+        return delay
+
+    def __repr__(self) -> str:
+        return f"Retry Policy with at most {self.max_retries} retries, {self.retries} retries done."
@@ -0,0 +1,77 @@
+import asyncio
+import threading
+from collections.abc import Awaitable
+from collections.abc import Callable
+from collections.abc import Hashable
+from concurrent.futures import Future
+from typing import Any
+
+
+class SingleFlight():
+
+    def __init__(self):
+        """
+        Collapses identical calls, which are in flight at the same time, into a single call. The first
+        caller of a key executes the call, all callers with the same key arriving before it has finished
+        wait for it and receive the same result or exception. Works across threads and event loops.
+        """
+        # number of calls which waited for an identical call instead of being executed
+        self.coalesced: int = 0
+        self._calls: dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def _join(self, key: Hashable) -> tuple[Future, bool]:
+        with self._lock:
+            if (future := self._calls.get(key)) is not None:
+                self.coalesced += 1
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            return future, True
+
+    def _leave(self, key: Hashable) -> None:
+        with self._lock:
+            del self._calls[key]
+
+    def do(self, key: Hashable, function: Callable[..., Any], *args) -> Any:
+        """
+        Return function(*args), or the result of the identical call in flight with the same key.
+        """
+        future, owner = self._join(key)
+        if not owner:
+            return future.result()
+
+        try:
+            result = function(*args)
+        except BaseException as e:
+            self._leave(key)
+            future.set_exception(e)
+            raise
+        self._leave(key)
+        future.set_result(result)
+        return result
+
+    async def do_async(self, key: Hashable, function: Callable[..., Awaitable[Any]], *args) -> Any:
+        """
+        Asynchronous variant of do(), which awaits the coroutine function(*args).
+        """
+        future, owner = self._join(key)
+        if not owner:
+            return await asyncio.wrap_future(future)
+
+        try:
+            result = await function(*args)
+        except BaseException as e:
+            self._leave(key)
+            future.set_exception(e)
+            raise
+        self._leave(key)
+        future.set_result(result)
+        return result
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    def __repr__(self) -> str:
+        return f"Single Flight with {len(self)} calls in flight, {self.coalesced} calls coalesced."
@@ -1,12 +1,16 @@
-import copy
+import asyncio
 import json
 import logging
 import pandas as pd
 import random
 import re
+import sqlite3
+import threading
 
+from collections.abc import Iterable
 from contextlib import suppress
 from importlib.resources import files
+from pathlib import Path
 
 from .LipidAPI import LipidAPI
 from ..lipid.Adduct import Adduct
@@ -17,8 +21,195 @@ from ..lipid.Nomenclature import Level
 from ..lipid.Nomenclature import StructureIdentifier
 from ..lipid.Nomenclature import Synonym
 from ..lipid.Reaction import Reaction
-from ..lipid.Source import Source
-from ..lipid import get_adduct
+from ..lipid.Source import intern_source
+from ..lipid import new_adduct
+
+
+class SwissLipidsMirror():
+    # m/z columns of the SwissLipids export and the corresponding adduct names of the REST API
+    MZ_COLUMNS: dict[str, str] = {
+        'Exact m/z of [M.]+': 'MassM',
+        'Exact m/z of [M+H]+': 'MassMH',
+        'Exact m/z of [M+K]+': 'MassMK',
+        'Exact m/z of [M+Na]+': 'MassMNa',
+        'Exact m/z of [M+Li]+': 'MassMLi',
+        'Exact m/z of [M+NH4]+': 'MassMNH4',
+        'Exact m/z of [M-H]-': 'MassMmH',
+        'Exact m/z of [M+Cl]-': 'MassMCl',
+        'Exact m/z of [M+OAc]-': 'MassMOAc',
+    }
+    XREF_COLUMNS: dict[str, str] = {
+        'CHEBI': 'ChEBI',
+        'LIPID MAPS': 'LipidMaps',
+        'HMDB': 'HMDB',
+        'MetaNetX': 'MetaNetX',
+    }
+    # number of identifiers bound to a single query, below the variable limit of older SQLite versions
+    MAX_VARIABLES: int = 500
+
+    def __init__(self, mirror_path: str):
+        """
+        Local mirror of SwissLipids, which answers the searches and entity lookups of the REST API
+        from a SQLite database built from the SwissLipids lipids.tsv export by build(). Entities are
+        stored in the layout of the REST API, so they are converted by SwissLipidsAPI._convert_lipid
+        like downloaded entities. Searches only match whole names and identifiers, case-insensitively.
+
+        Parameters
+        ----------
+        mirror_path : str
+            Path of the SQLite database written by SwissLipidsMirror.build.
+        """
+        self.mirror_path: str = str(mirror_path)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            f"{Path(self.mirror_path).resolve().as_uri()}?mode=ro",
+            uri=True,
+            check_same_thread=False
+        )
+        logging.info(f"SwissLipidsAPI: Using local mirror {self.mirror_path}.")
+
+    @classmethod
+    def build(cls, tsv_path: str, mirror_path: str, chunksize: int = 50000) -> None:
+        """
+        Build the mirror from the SwissLipids lipids.tsv export, which may be gzip compressed.
+
+        Parameters
+        ----------
+        tsv_path : str
+            Path of the SwissLipids lipids.tsv export.
+        mirror_path : str
+            Path of the SQLite database, which is replaced if it exists.
+        chunksize : int
+            Number of lipids which are read and written at once.
+        """
+        logging.info(f"SwissLipidsAPI: Building local mirror {mirror_path} from {tsv_path}...")
+        Path(mirror_path).parent.mkdir(parents=True, exist_ok=True)
+        Path(mirror_path).unlink(missing_ok=True)
+        connection = sqlite3.connect(mirror_path)
+        connection.execute("CREATE TABLE entity (entity_id TEXT PRIMARY KEY, classification_level TEXT, entry TEXT)")
+        connection.execute("CREATE TABLE search_term (term TEXT, entity_id TEXT)")
+        connection.execute("CREATE TABLE mz (adduct TEXT, mz REAL, entity_id TEXT)")
+
+        count = 0
+        for chunk in pd.read_csv(tsv_path, sep='\t', dtype=str, keep_default_na=False, chunksize=chunksize,
+                                 encoding_errors='replace'):
+            chunk.columns = [column.strip() for column in chunk.columns]
+            entities, search_terms, mzs = [], [], []
+            for row in chunk.to_dict('records'):
+                entry = cls._entry_from_row(row)
+                identifier = entry['entity_id']
+                entities.append((identifier, entry['classification_level'], json.dumps(entry)))
+                terms = {identifier, entry.get('entity_name')}
+                terms.update(synonym['name'] for synonym in entry['synonyms'])
+                terms.update(xref['id'] for xref in entry['xrefs'])
+                search_terms.extend((term.lower(), identifier) for term in terms if term)
+                if (exact_mass := entry['chemical_data']['mz'].get('exact mass')) is not None:
+                    mzs.append(('MassExact', exact_mass, identifier))
+                for column, adduct in cls.MZ_COLUMNS.items():
+                    if (mz := entry['chemical_data']['mz'].get(column[len('Exact m/z of '):])) is not None:
+                        mzs.append((adduct, mz, identifier))
+            connection.executemany("INSERT OR REPLACE INTO entity VALUES (?, ?, ?)", entities)
+            connection.executemany("INSERT INTO search_term VALUES (?, ?)", search_terms)
+            connection.executemany("INSERT INTO mz VALUES (?, ?, ?)", mzs)
+            count += len(entities)
+
+        connection.execute("CREATE INDEX idx_search_term ON search_term (term)")
+        connection.execute("CREATE INDEX idx_mz ON mz (adduct, mz)")
+        connection.commit()
+        connection.close()
+        logging.info(f"SwissLipidsAPI: Building local mirror with {count} lipids done.")
+
+    @classmethod
+    def _entry_from_row(cls, row: dict[str, str]) -> dict:
+        def values(column: str) -> list[str]:
+            return [value.strip() for value in row.get(column, '').split('|') if value.strip() != '']
+
+        def number(column: str) -> float | None:
+            try:
+                return float(row.get(column, ''))
+            except ValueError as _:
+                return None
+
+        mz = {}
+        if (exact_mass := number('Exact Mass (neutral form)')) is not None:
+            mz['exact mass'] = exact_mass
+        for column in cls.MZ_COLUMNS:
+            if (value := number(column)) is not None:
+                mz[column[len('Exact m/z of '):]] = value
+
+        structures = {}
+        for key, column in [('smiles', 'SMILES (pH7.3)'), ('inchi', 'InChI (pH7.3)'), ('inchikey', 'InChI key (pH7.3)')]:
+            if row.get(column, '') != '':
+                structures[key] = row[column]
+
+        return {
+            'entity_id': row['Lipid ID'],
+            'entity_name': row.get('Name') or None,
+            'classification_level': row.get('Level'),
+            'synonyms': (
+                [{'name': name, 'type': 'abbreviation', 'source': 'SwissLipids'} for name in values('Abbreviation*')] +
+                [{'name': name, 'type': 'synonym', 'source': 'SwissLipids'} for name in values('Synonyms*')]
+            ),
+            'structures': structures,
+            'xrefs': [
+                {'source': source, 'id': identifier}
+                for column, source in cls.XREF_COLUMNS.items() for identifier in values(column)
+            ],
+            'chemical_data': {
+                'formula': row.get('Formula (pH7.3)') or None,
+                'mass': number('Mass (pH7.3)'),
+                'mz': mz,
+            },
+        }
+
+    def get_entries(self, identifiers: Iterable[str]) -> dict[str, dict]:
+        """
+        Return the entities with the identifiers in the layout of the REST API, by identifier.
+        """
+        identifiers = list(dict.fromkeys(identifiers))
+        rows = []
+        with self._lock:
+            for start in range(0, len(identifiers), self.MAX_VARIABLES):
+                chunk = identifiers[start:start + self.MAX_VARIABLES]
+                rows.extend(self._connection.execute(
+                    f"SELECT entity_id, entry FROM entity WHERE entity_id IN ({', '.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall())
+        return {identifier: json.loads(entry) for identifier, entry in rows}
+
+    def search(self, term: str, classification_levels: list[str] | None = None) -> set[str]:
+        """
+        Return the identifiers of the entities with the name, synonym or database identifier, optionally
+        only those of the classification levels.
+        """
+        query = "SELECT DISTINCT search_term.entity_id FROM search_term"
+        parameters = [term.lower()]
+        if classification_levels is not None:
+            query += (f" JOIN entity ON entity.entity_id = search_term.entity_id"
+                      f" WHERE term = ? AND classification_level IN ({', '.join('?' * len(classification_levels))})")
+            parameters.extend(classification_levels)
+        else:
+            query += " WHERE term = ?"
+        with self._lock:
+            return {row[0] for row in self._connection.execute(query, parameters)}
+
+    def search_mz(self, mz: float, tolerance: float, adduct: str, classification_levels: list[str]) -> set[str]:
+        """
+        Return the identifiers of the entities of the classification levels, whose m/z of the adduct is
+        within the tolerance of mz.
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT DISTINCT mz.entity_id FROM mz JOIN entity ON entity.entity_id = mz.entity_id "
+                f"WHERE adduct = ? AND mz BETWEEN ? AND ? "
+                f"AND classification_level IN ({', '.join('?' * len(classification_levels))})",
+                [adduct, mz - tolerance, mz + tolerance] + list(classification_levels)
+            )
+            return {row[0] for row in rows}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM entity").fetchone()[0]
 
 
 class SwissLipidsAPI(LipidAPI):
@@ -30,26 +221,41 @@ class SwissLipidsAPI(LipidAPI):
         Level.isomeric_lipid_species: 'Isomeric subspecies'
     }
 
-    def __init__(self):
+    def __init__(self, mirror_path: str | None = None):
+        """
+        Parameters
+        ----------
+        mirror_path : str | None
+            Path of a local mirror built with build_swisslipids_mirror, which is used instead of the
+            REST API. Defaults to data/swisslipids/swisslipids_mirror.sqlite, if it exists.
+        """
         logging.info(f"SwissLipidsAPI: Initializing SwissLipids API...")
         super().__init__()
 
         self.goslin_converted_names: pd.DataFrame | None = None
+        self.mirror: SwissLipidsMirror | None = None
+
+        if mirror_path is None:
+            mirror_path = str(files('lipidlibrarian')) + '/data/swisslipids/swisslipids_mirror.sqlite'
+        if Path(mirror_path).is_file():
+            with self._timed('mirror'):
+                self.mirror = SwissLipidsMirror(mirror_path)
 
         goslin_converted_names_path = str(files('lipidlibrarian')) + '/data/swisslipids/goslin_converted_names.tsv'
 
-        try:
-            self.goslin_converted_names = pd.read_csv(
-                goslin_converted_names_path,
-                sep='\t',
-                header=None,
-                names=['id', 'name', 'level', 'goslin_name']
-            )
-            logging.info(f"SwissLipidsAPI: Goslin parsed SwissLipids lipid name database contains {len(self.goslin_converted_names)} associations.")
+        with self._timed('goslin_converted_names'):
+            try:
+                self.goslin_converted_names = pd.read_csv(
+                    goslin_converted_names_path,
+                    sep='\t',
+                    header=None,
+                    names=['id', 'name', 'level', 'goslin_name']
+                )
+                logging.info(f"SwissLipidsAPI: Goslin parsed SwissLipids lipid name database contains {len(self.goslin_converted_names)} associations.")
             
-        except FileNotFoundError as _:
-            self.goslin_converted_names = None
-            logging.info(f"SwissLipidsAPI: Goslin parsed SwissLipids lipid name database not found. Disabling...")
+            except FileNotFoundError as _:
+                self.goslin_converted_names = None
+                logging.info(f"SwissLipidsAPI: Goslin parsed SwissLipids lipid name database not found. Disabling...")
 
         logging.info(f"SwissLipidsAPI: Initializing SwissLipids API done.")
 
@@ -160,22 +366,18 @@ class SwissLipidsAPI(LipidAPI):
         """
         results = []
 
-        # for all identifiers get the entry
-        for identifier in identifiers:
-            if identifier == "-":
-                continue
-            # use swisslipids entity_id to get even more information for the specific entity
-            response = self.execute_http_query(f"https://www.swisslipids.org/api/index.php/entity/{identifier}")
-            if response.status_code != 200:
-                continue
-
-            # deserialize response to a python object
-            try:
-                lipid = self._convert_lipid(json.loads(response.text))
-            except json.decoder.JSONDecodeError as _:
-                continue
+        if self.mirror is not None:
+            entries = self.mirror.get_entries(identifier for identifier in identifiers if identifier != "-")
+            for identifier in identifiers:
+                if (entry := entries.get(identifier)) is not None:
+                    results.append(self._convert_lipid(entry))
+            return results
 
-            results.append(lipid)
+        # use swisslipids entity_id to get even more information for the specific entity
+        responses = self.map_http_queries(
+            self._entity_url(identifier) for identifier in identifiers if identifier != "-"
+        )
+        results.extend(self._convert_entity_responses(responses))
 
         return results
 
@@ -191,31 +393,12 @@ class SwissLipidsAPI(LipidAPI):
 
         :returns: swisslipids entity_ids
         """
-        response = self.execute_http_query(f"https://www.swisslipids.org/api/index.php/search?term={name}")
-        if response.status_code != 200:
-            return set()
-
-        # deserialize response to a python object
-        try:
-            response_data = json.loads(response.text)
-        except json.decoder.JSONDecodeError as _:
-            return set()
+        hierarchy = self._hierarchy(output_level, children)
 
-        hierarchy = ["Species", "Molecular subspecies",
-                     "Structural subspecies", "Isomeric subspecies"]
-
-        if children:
-            hierarchy = hierarchy[hierarchy.index(output_level):]
-        else:
-            hierarchy = [output_level]
-
-        # get ids for all results with a classification level equal to species
-        identifiers: set[str] = set()
-        for entry in response_data:
-            if entry["classification_level"] in hierarchy:
-                identifiers.add(entry["entity_id"])
+        if self.mirror is not None:
+            return self.mirror.search(name, hierarchy)
 
-        return identifiers
+        return self._parse_search_response(self.execute_http_query(self._search_url(name)), hierarchy)
 
     def _search_by_id(self, identifier: str) -> set[str]:
         """
@@ -225,22 +408,10 @@ class SwissLipidsAPI(LipidAPI):
 
         :returns: swisslipids entity_ids
         """
-        response = self.execute_http_query(f"https://www.swisslipids.org/api/index.php/search?term={identifier}")
-        if response.status_code != 200:
-            return set()
+        if self.mirror is not None:
+            return self.mirror.search(identifier)
 
-        # deserialize response to a python object
-        try:
-            response_data = json.loads(response.text)
-        except json.decoder.JSONDecodeError as _:
-            return set()
-
-        # get the ids of all results
-        identifiers: set[str] = set()
-        for entry in response_data:
-            identifiers.add(entry["entity_id"])
-
-        return identifiers
+        return self._parse_search_response(self.execute_http_query(self._search_url(identifier)))
 
     def _search_by_mz(self, mz: float, tolerance: float, output_level: str, adducts: set[str],
                       children: bool = False, cutoff: int = 0) -> set[str]:
@@ -265,38 +436,161 @@ class SwissLipidsAPI(LipidAPI):
         :returns: ids matching to the mass and tolerance and the provided classification level
         """
         identifiers: set[str] = set()
+        hierarchy = self._hierarchy(output_level, children)
 
         for adduct in adducts:
-            q_http = "https://www.swisslipids.org/api/index.php/"
-            api_term = f"advancedSearch?mz={mz}&adduct={adduct}&massErrorRate={tolerance}"
+            if self.mirror is not None:
+                identifiers.update(self.mirror.search_mz(mz, tolerance, adduct, hierarchy))
+                continue
 
-            response = self.execute_http_query(q_http + api_term)
+            response = self.execute_http_query(self._mz_search_url(mz, tolerance, adduct))
+            identifiers.update(self._parse_search_response(response, hierarchy))
+
+        if cutoff > 0 and len(identifiers) > cutoff:
+            identifiers = set(random.sample(identifiers, min(cutoff, len(identifiers))))
+
+        return identifiers
+
+    # The async queries run on the event loop shared by all APIs, so the mirror, pandas and lipid
+    # conversion work is done in threads, and only the http requests are awaited on the loop.
+
+    async def query_lipid_async(self, lipid: Lipid) -> list[Lipid]:
+        if self.mirror is not None:
+            return await super().query_lipid_async(lipid)
+
+        identifiers = [identifier.identifier for identifier in lipid.get_database_identifiers('swisslipids')]
+        identifiers.extend(identifier.identifier for identifier in lipid.get_database_identifiers('lipidmaps'))
+        if self.goslin_converted_names is not None:
+            identifiers.extend(await asyncio.to_thread(
+                self._goslin_converted_identifiers, lipid.nomenclature.get_name()
+            ))
+
+        query_results = await asyncio.gather(
+            *(self.query_id_async(identifier) for identifier in identifiers),
+            self.query_name_async(lipid.nomenclature.get_name(nomenclature_flavor='swisslipids'), lipid.nomenclature.level)
+        )
+        results = [result for query_result in query_results for result in query_result]
+        logging.debug(f"SwissLipidsAPI: query_lipid_async: Found {len(results)} lipid(s).")
+        return results
+
+    async def query_mz_async(self, mz: float, tolerance: float, adducts: list[Adduct], cutoff: int = 0) -> list[Lipid]:
+        if self.mirror is not None or mz <= 0 or tolerance < 0:
+            return await super().query_mz_async(mz, tolerance, adducts, cutoff)
+
+        hierarchy = self._hierarchy('Species', True)
+        adduct_names = {adduct.swisslipids_abbrev for adduct in adducts if adduct.swisslipids_abbrev is not None}
+        responses = await asyncio.gather(*(
+            self.execute_http_query_async(self._mz_search_url(mz, tolerance, adduct_name))
+            for adduct_name in adduct_names
+        ))
+        identifiers: set[str] = set()
+        for response in responses:
+            identifiers.update(self._parse_search_response(response, hierarchy))
+        if cutoff > 0 and len(identifiers) > cutoff:
+            identifiers = set(random.sample(sorted(identifiers), cutoff))
+
+        results = await self._get_entry_async(identifiers)
+        logging.debug(f"SwissLipidsAPI: query_mz_async: Found {len(results)} lipid(s).")
+        return results
+
+    async def query_id_async(self, identifier: str) -> list[Lipid]:
+        if self.mirror is not None or identifier is None or identifier == "" or not isinstance(identifier, str):
+            return await super().query_id_async(identifier)
+
+        if identifier.startswith("SLM:"):
+            entity_identifiers = {identifier}
+        else:
+            entity_identifiers = self._parse_search_response(
+                await self.execute_http_query_async(self._search_url(identifier))
+            )
+
+        results = await self._get_entry_async(entity_identifiers)
+        logging.debug(f"SwissLipidsAPI: query_id_async: Found {len(results)} lipid(s).")
+        return results
+
+    async def query_name_async(self, name: str, level: Level = None) -> list[Lipid]:
+        if self.mirror is not None or name is None or name == "" or not isinstance(name, str) \
+                or level not in self.lipid_to_swisslipids_level_map:
+            return await super().query_name_async(name, level)
+
+        hierarchy = self._hierarchy(self.lipid_to_swisslipids_level_map[level], False)
+        entity_identifiers = self._parse_search_response(
+            await self.execute_http_query_async(self._search_url(name)),
+            hierarchy
+        )
+
+        results = await self._get_entry_async(entity_identifiers)
+        logging.debug(f"SwissLipidsAPI: query_name_async: Found {len(results)} lipid(s).")
+        return results
+
+    async def _get_entry_async(self, identifiers: Iterable[str]) -> list[Lipid]:
+        responses = await asyncio.gather(*(
+            self.execute_http_query_async(self._entity_url(identifier))
+            for identifier in identifiers if identifier != "-"
+        ))
+        return await asyncio.to_thread(self._convert_entity_responses, responses)
+
+    def _goslin_converted_identifiers(self, name: str) -> list[str]:
+        return list(self.goslin_converted_names[self.goslin_converted_names['goslin_name'] == name]['id'].values)
+
+    @staticmethod
+    def _search_url(term: str) -> str:
+        return f"https://www.swisslipids.org/api/index.php/search?term={term}"
+
+    @staticmethod
+    def _mz_search_url(mz: float, tolerance: float, adduct: str) -> str:
+        return f"https://www.swisslipids.org/api/index.php/advancedSearch?mz={mz}&adduct={adduct}&massErrorRate={tolerance}"
+
+    @staticmethod
+    def _entity_url(identifier: str) -> str:
+        return f"https://www.swisslipids.org/api/index.php/entity/{identifier}"
+
+    @staticmethod
+    def _parse_search_response(response, hierarchy: list[str] | None = None) -> set[str]:
+        """
+        Return the entity_ids of a search response, optionally only those of the classification levels
+        in the hierarchy.
+        """
+        if response.status_code != 200:
+            return set()
+
+        # deserialize response to a python object
+        try:
+            response_data = json.loads(response.text)
+        except json.decoder.JSONDecodeError as _:
+            return set()
+
+        identifiers: set[str] = set()
+        for entry in response_data:
+            if hierarchy is None or entry["classification_level"] in hierarchy:
+                identifiers.add(entry["entity_id"])
+
+        return identifiers
+
+    @classmethod
+    def _convert_entity_responses(cls, responses) -> list[Lipid]:
+        results = []
+        for response in responses:
             if response.status_code != 200:
                 continue
 
             # deserialize response to a python object
             try:
-                resp_object = json.loads(response.text)
+                lipid = cls._convert_lipid(json.loads(response.text))
             except json.decoder.JSONDecodeError as _:
                 continue
 
-            hierarchy = ["Species", "Molecular subspecies",
-                         "Structural subspecies", "Isomeric subspecies"]
-
-            if children:
-                hierarchy = hierarchy[hierarchy.index(output_level):]
-            else:
-                hierarchy = [output_level]
-
-            # get identifiers for all results with the classification level equal to species
-            for entry in resp_object:
-                if entry["classification_level"] in hierarchy:
-                    identifiers.add(entry["entity_id"])
+            results.append(lipid)
+        return results
 
-        if cutoff > 0 and len(identifiers) > cutoff:
-            identifiers = set(random.sample(identifiers, min(cutoff, len(identifiers))))
+    @staticmethod
+    def _hierarchy(output_level: str, children: bool) -> list[str]:
+        hierarchy = ["Species", "Molecular subspecies",
+                     "Structural subspecies", "Isomeric subspecies"]
 
-        return identifiers
+        if children:
+            return hierarchy[hierarchy.index(output_level):]
+        return [output_level]
 
     @staticmethod
     def _convert_lipid(entry: dict):
@@ -314,7 +608,7 @@ class SwissLipidsAPI(LipidAPI):
                 entity_name: str
                 lipid.nomenclature.name = entity_name
 
-        source = Source(
+        source = intern_source(
             lipid.nomenclature.get_name(nomenclature_flavor='swisslipids'),
             lipid.nomenclature.level,
             'swisslipids'
@@ -430,7 +724,7 @@ class SwissLipidsAPI(LipidAPI):
                 # Fill adduct mass values
                 for adduct_name, mass in mz_data.items():
                     if adduct_name != '[M.]+' and adduct_name != 'exact mass':
-                        adduct = copy.deepcopy(get_adduct(adduct_name))
+                        adduct = new_adduct(adduct_name)
                         if adduct is not None:
                             adduct.add_mass(Mass.from_data(
                                 'monoisotopic mass',
@@ -481,4 +775,6 @@ class SwissLipidsAPI(LipidAPI):
         return lipid
 
     def __repr__(self) -> str:
+        if self.mirror is not None:
+            return f'SwissLipidsAPI with local mirror {self.mirror.mirror_path}.'
         return f'SwissLipidsAPI with { 0 if self.goslin_converted_names is None else len(self.goslin_converted_names) } conversions pre-loaded.'
@@ -1,17 +1,25 @@
+import logging
+import threading
+from collections.abc import Iterable
+
 from .Alex123API import Alex123API
+from .HTTPCache import HTTPCache
+from .LazyAPI import LazyAPI
 from .LinexAPI import LinexAPI
 from .LipidAPI import LipidAPI
 from .LipidMapsAPI import LipidMapsAPI
 from .LionAPI import LionAPI
 from .LipidLibrarianAPI import LipidLibrarianAPI
+from .RateLimiter import RateLimiter
+from .RetryPolicy import RetryPolicy
 from .SwissLipidsAPI import SwissLipidsAPI
 
 
-# Initialize all API instances here, so connections to databases,
-# data files and other intense __init__ tasks are executed only once
-# when the package is imported. If you don't want to initialize all
-# APIs you should consider importing the APIs directly and instantiating
-# them yourself.
+# All API instances are shared by the queries of a process, so connections to databases,
+# data files and other intense __init__ tasks are executed only once. They are constructed
+# lazily, when an API is used for the first time, so APIs that are never queried cost nothing.
+# If you don't want to share the APIs you should consider importing the APIs directly and
+# instantiating them yourself.
 
 API_REGISTRY: dict[str, type[LipidAPI]] = {
     'alex123': Alex123API,
@@ -23,23 +31,108 @@ API_REGISTRY: dict[str, type[LipidAPI]] = {
 }
 
 _API_CACHE: dict[str, LipidAPI] = {}
+_API_CACHE_LOCK = threading.Lock()
 
 supported_APIs = frozenset(API_REGISTRY.keys())
 
 
-def init_APIs(which_APIs: set[str] = supported_APIs, sql_args: dict | None = None) -> dict[str, LipidAPI]:
+def init_APIs(which_APIs: set[str] = supported_APIs, sql_args: dict | None = None,
+              warm_up: bool = False) -> dict[str, LipidAPI]:
+    """
+    Return the shared instances of the APIs. Each API is constructed on its first use.
 
+    Parameters
+    ----------
+    which_APIs : set[str]
+        Names of the APIs.
+    sql_args : dict | None
+        Connection arguments of the ALEX123 SQL database.
+    warm_up : bool
+        If True, the APIs are constructed in a background thread right away, so they are ready
+        when they are first used.
+    """
     apis: dict[str, LipidAPI] = {}
 
-    for name in which_APIs:
-        api_cls = API_REGISTRY[name]
+    # multiple queries may initialize the APIs concurrently
+    with _API_CACHE_LOCK:
+        for name in which_APIs:
+            api_cls = API_REGISTRY[name]
+
+            if name not in _API_CACHE:
+                if sql_args is not None and name == 'alex123':
+                    _API_CACHE[name] = LazyAPI(api_cls, sql_args)
+                else:
+                    _API_CACHE[name] = LazyAPI(api_cls)
 
-        if name not in _API_CACHE:
-            if sql_args is not None and name == 'alex123':
-                _API_CACHE[name] = api_cls(sql_args)
-            else:
-                _API_CACHE[name] = api_cls()
+            apis[name] = _API_CACHE[name]
 
-        apis[name] = _API_CACHE[name]
+    if warm_up:
+        warm_up_APIs(apis.values())
 
     return apis
+
+
+def warm_up_APIs(apis: Iterable[LipidAPI]) -> threading.Thread:
+    """
+    Construct lazily initialized APIs in a background thread and return the thread.
+    """
+    apis = [api for api in apis if isinstance(api, LazyAPI)]
+
+    def warm_up() -> None:
+        for api in apis:
+            try:
+                api.instance
+            except Exception as e:
+                logging.warning(f"LazyAPI: Warming up {api!r} failed: {e}")
+
+    thread = threading.Thread(target=warm_up, name='LipidLibrarian API warm-up', daemon=True)
+    thread.start()
+    return thread
+
+
+def init_timings() -> dict[str, dict[str, float]]:
+    """
+    Return the seconds spent in each initialization phase of all APIs constructed so far.
+    """
+    with _API_CACHE_LOCK:
+        return {
+            name: dict(api.init_timings)
+            for name, api in _API_CACHE.items()
+            if not isinstance(api, LazyAPI) or api.initialized
+        }
+
+
+def set_http_cache(http_cache: HTTPCache | None) -> None:
+    """
+    Set the persistent http response cache used by all APIs, or disable it with None.
+    """
+    LipidAPI.http_cache = http_cache
+
+
+def set_rate_limiter(rate_limiter: RateLimiter | None) -> None:
+    """
+    Set the rate limiter of the http requests of all APIs, or disable rate limiting with None.
+    """
+    LipidAPI.rate_limiter = rate_limiter
+
+
+def set_retry_policy(retry_policy: RetryPolicy | None) -> None:
+    """
+    Set the retry policy of the http requests of all APIs, or disable retries with None.
+    """
+    LipidAPI.retry_policy = retry_policy
+
+
+def http_metrics() -> dict[str, int | float]:
+    """
+    Return the number of throttled, retried and coalesced http requests of all APIs so far.
+    """
+    rate_limiter = LipidAPI.rate_limiter
+    retry_policy = LipidAPI.retry_policy
+    return {
+        'throttled': 0 if rate_limiter is None else rate_limiter.throttled,
+        'throttled_seconds': 0.0 if rate_limiter is None else rate_limiter.throttled_seconds,
+        'retries': 0 if retry_policy is None else retry_policy.retries,
+        'retries_exhausted': 0 if retry_policy is None else retry_policy.exhausted,
+        'coalesced': LipidAPI.single_flight.coalesced,
+    }
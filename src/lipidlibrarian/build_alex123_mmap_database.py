@@ -0,0 +1,36 @@
+import argparse
+import logging
+from importlib.resources import files
+from lipidlibrarian.api.Alex123API import Alex123DBConnectorMmap
+
+
+def build_mmap_database(hdf5_path: str, mmap_path: str):
+    """Exports the ALEX123 HDF5 database into memory-mapped numpy files."""
+    print(f"Exporting '{hdf5_path}' to '{mmap_path}'...")
+    Alex123DBConnectorMmap.build(hdf5_path, mmap_path)
+    print("Successfully exported the ALEX123 database.")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=(
+            "Export the ALEX123 HDF5 database into memory-mapped numpy files, "
+            "which are shared by all processes using them."
+        )
+    )
+    parser.add_argument(
+        "--hdf5", default=str(files('lipidlibrarian')) + '/data/alex123/alex123_db.h5',
+        help="Path to the ALEX123 HDF5 database"
+    )
+    parser.add_argument(
+        "--output", default=str(files('lipidlibrarian')) + '/data/alex123/alex123_mmap',
+        help="Directory the memory-mapped database is written to"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    build_mmap_database(args.hdf5, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import argparse
+import logging
+from importlib.resources import files
+from lipidlibrarian.api.LipidMapsAPI import LipidMapsMirror
+
+
+def build_lipidmaps_mirror(export_path: str, mirror_path: str):
+    """Imports the LIPID MAPS LMSD export into a local SQLite mirror."""
+    print(f"Importing '{export_path}' into '{mirror_path}'...")
+    LipidMapsMirror.build(export_path, mirror_path)
+    print("Successfully built the LIPID MAPS mirror.")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=(
+            "Import the LIPID MAPS Structure Database (LMSD) export into a local SQLite mirror, "
+            "which answers LIPID MAPS queries without using the REST API."
+        )
+    )
+    parser.add_argument(
+        "--export", required=True,
+        help="Path to the LMSD structures.sdf or CSV export, which may be gzip compressed"
+    )
+    parser.add_argument(
+        "--output", default=str(files('lipidlibrarian')) + '/data/lipidmaps/lipidmaps_mirror.sqlite',
+        help="Path the SQLite mirror is written to"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    build_lipidmaps_mirror(args.export, args.output)
+
+
+if __name__ == "__main__":
+    main()
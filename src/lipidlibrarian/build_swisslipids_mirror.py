@@ -0,0 +1,36 @@
+import argparse
+import logging
+from importlib.resources import files
+from lipidlibrarian.api.SwissLipidsAPI import SwissLipidsMirror
+
+
+def build_swisslipids_mirror(tsv_path: str, mirror_path: str):
+    """Imports the SwissLipids lipids.tsv export into a local SQLite mirror."""
+    print(f"Importing '{tsv_path}' into '{mirror_path}'...")
+    SwissLipidsMirror.build(tsv_path, mirror_path)
+    print("Successfully built the SwissLipids mirror.")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=(
+            "Import the SwissLipids lipids.tsv export into a local SQLite mirror, "
+            "which answers SwissLipids queries without using the REST API."
+        )
+    )
+    parser.add_argument(
+        "--tsv", required=True,
+        help="Path to the SwissLipids lipids.tsv export, which may be gzip compressed"
+    )
+    parser.add_argument(
+        "--output", default=str(files('lipidlibrarian')) + '/data/swisslipids/swisslipids_mirror.sqlite',
+        help="Path the SQLite mirror is written to"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    build_swisslipids_mirror(args.tsv, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,15 @@ import pathlib
 import sys
 from importlib.metadata import version
 
-from .LipidQuery import LipidQuery
+from .LipidBatchQuery import LipidBatchQuery
+from .NDJSONWriter import NDJSONWriter
+from .ParquetWriter import ParquetWriter
+from .api import set_http_cache
+from .api import set_rate_limiter
+from .api import set_retry_policy
+from .api.HTTPCache import HTTPCache
+from .api.RateLimiter import RateLimiter
+from .api.RetryPolicy import RetryPolicy
 
 
 def main(parser=ap.ArgumentParser()):
@@ -58,9 +66,13 @@ def main(parser=ap.ArgumentParser()):
     parser.add_argument(
         "--output-format",
         type=str,
-        choices=['text', 'json', 'html'],
+        choices=['text', 'json', 'html', 'ndjson', 'parquet'],
         default='json',
-        help="Specify the output format."
+        help=(
+            "Specify the output format. 'ndjson' writes one JSON record per lipid and line to a single "
+            "output stream as soon as each query has finished. 'parquet' writes one row per lipid to a "
+            "Parquet file and requires pyarrow."
+        )
     )
     parser.add_argument(
         "-o",
@@ -69,7 +81,9 @@ def main(parser=ap.ArgumentParser()):
         help=(
             "Specify the output directory. If this option is not set, the results will be printed out "
             "to stdout as one line per lipid. Keep in mind, that if -v is activated simultaneously, both "
-            "the verbose logging information and the results will be printed to stdout."
+            "the verbose logging information and the results will be printed to stdout. For the 'ndjson' "
+            "and 'parquet' output formats, this is the path of the output file instead. NDJSON files are "
+            "gzip compressed if the path ends with '.gz'. The 'parquet' output format requires this option."
         )
     )
     parser.add_argument(
@@ -84,6 +98,60 @@ def main(parser=ap.ArgumentParser()):
         default=0,
         help="Number of times lipid librarian will requery the APIs with the results to enhance them."
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help=(
+            "Number of threads used to query the inputs and APIs concurrently. By default everything is "
+            "queried one after another. With more than one worker, results are printed in order of completion."
+        )
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        type=str,
+        action="append",
+        default=[],
+        metavar="API=N",
+        help=(
+            "Maximum number of concurrent queries to a single API, e.g. 'swisslipids=4'. "
+            "May be given multiple times. Only relevant if --workers is larger than 1."
+        )
+    )
+    parser.add_argument(
+        "--cache",
+        type=str,
+        help="Path of a persistent cache for http responses, so repeated queries do not contact the databases again."
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        default=7 * 24 * 60 * 60,
+        help="Seconds after which cached http responses expire. Defaults to one week, 0 never expires."
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=1024,
+        help="Maximum size of the http response cache in megabytes. The least recently used responses are evicted."
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Only use cached http responses and never contact the databases. Requires --cache."
+    )
+    parser.add_argument(
+        "--requests-per-second",
+        type=float,
+        default=10.0,
+        help="Maximum number of http requests per second to a single database server. 0 disables the limit."
+    )
+    parser.add_argument(
+        "--max-retries",
+        type=int,
+        default=3,
+        help="Number of retries of http requests, which timed out or failed with a 429 or 5xx status code."
+    )
     parser.add_argument(
         'lipids',
         metavar='L',
@@ -128,8 +196,36 @@ def main(parser=ap.ArgumentParser()):
             'database': args.sql_database,
         }
 
+    if args.offline and args.cache is None:
+        parser.error("argument --offline: requires --cache.")
+    if args.cache is not None:
+        set_http_cache(HTTPCache(
+            args.cache,
+            ttl=args.cache_ttl if args.cache_ttl > 0 else None,
+            max_size=args.cache_size * 1024 * 1024,
+            offline=args.offline
+        ))
+
+    if args.max_retries < 0:
+        parser.error("argument --max-retries: must not be negative.")
+    set_rate_limiter(RateLimiter(args.requests_per_second) if args.requests_per_second > 0 else None)
+    set_retry_policy(RetryPolicy(args.max_retries) if args.max_retries > 0 else None)
+
+    max_concurrency: dict[str, int] = {}
+    for limit in args.max_concurrency:
+        try:
+            api_name, api_limit = limit.split('=', 1)
+            max_concurrency[api_name.strip()] = int(api_limit)
+        except ValueError as _:
+            parser.error(f"argument --max-concurrency: invalid value '{limit}', expected API=N.")
+
+    if args.output_format == 'parquet' and args.output is None:
+        parser.error("argument --output-format: parquet requires --output.")
+
     file_extension = ''
-    if args.output is not None:
+    if args.output is not None and args.output_format in ['ndjson', 'parquet']:
+        pathlib.Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    elif args.output is not None:
         logging.info(f"CLI: Creating directory {os.getcwd()}/{args.output}.")
         pathlib.Path(args.output).mkdir(parents=True, exist_ok=True)
         if args.output_format == 'json':
@@ -142,39 +238,38 @@ def main(parser=ap.ArgumentParser()):
     if args.lipids is None:
         exit(0)
     else:
-        # Generate Lipid objects
+        # Collect all inputs, so identical queries of different inputs are only executed once
+        input_strings: list[str] = []
         for val in args.lipids:
-            lipid_file = True
             try:
                 with open(val, 'r') as file:
                     for line in file.readlines():
-                        lipid_query = LipidQuery(
-                            line.rstrip(),
-                            requeries=args.requery,
-                            cutoff=args.cutoff,
-                            sql_args=sql_args
-                        )
-                        lipid_query.query()
-                        for lipid in lipid_query.lipids:
-                            if args.output is not None:
-                                with open(f"{args.output}/{repr(lipid).replace('/', '+')}", 'w') as output_file:
-                                    output_file.write(format(lipid, args.output_format))
-                            else:
-                                print(format(lipid, args.output_format))
+                        input_strings.append(line.rstrip())
             except FileNotFoundError as _:
-                lipid_file = False
-
-            if not lipid_file:
-                lipid_query = LipidQuery(
-                    val.rstrip(),
-                    requeries=args.requery,
-                    cutoff=args.cutoff,
-                    sql_args=sql_args
-                )
-                lipids = lipid_query.query()
-                for lipid in lipids:
-                    if args.output is not None:
-                        with open(f"{args.output}/{repr(lipid).replace('/', '+')}.{file_extension}", 'w') as output_file:
-                            output_file.write(format(lipid, args.output_format))
-                    else:
-                        print(format(lipid, args.output_format))
+                input_strings.append(val.rstrip())
+
+        batch_query = LipidBatchQuery(
+            input_strings,
+            requeries=args.requery,
+            cutoff=args.cutoff,
+            sql_args=sql_args,
+            max_workers=args.workers,
+            max_concurrency=max_concurrency
+        )
+        if args.output_format in ['ndjson', 'parquet']:
+            if args.output_format == 'ndjson':
+                writer = NDJSONWriter(args.output)
+            else:
+                writer = ParquetWriter(args.output)
+            with writer:
+                for lipid_query in batch_query.query():
+                    writer.write_lipids(lipid_query.lipids)
+            return
+
+        for lipid_query in batch_query.query():
+            for lipid in lipid_query.lipids:
+                if args.output is not None:
+                    with open(f"{args.output}/{repr(lipid).replace('/', '+')}.{file_extension}", 'w') as output_file:
+                        output_file.write(format(lipid, args.output_format))
+                else:
+                    print(format(lipid, args.output_format))
@@ -1,6 +1,7 @@
 from typing import Iterable
 
 from .Fragment import Fragment
+from .KeyedList import KeyedList
 from .Mass import Mass
 from .Source import Source
 
@@ -14,33 +15,22 @@ class Adduct():
         self.lipidmaps_name: str | None = None
         self.adduct_mass: float | None = None
         self.charge: int | None = None
-        self.masses: list[Mass] = []
-        self.fragments: list[Fragment] = []
+        self.masses: list[Mass] = KeyedList()
+        self.fragments: list[Fragment] = KeyedList()
 
     @property
     def sources(self) -> set[Source]:
-        sources: set[Source] = set()
-        for fragment in self.fragments:
-            sources.update(fragment.sources)
-        for mass in self.masses:
-            sources.update(mass.sources)
-        return sources
+        return self.fragments.sources | self.masses.sources
 
     def add_mass(self, mass: Mass) -> None:
-        for existing_mass in self.masses:
-            if existing_mass.merge(mass):
-                return
-        self.masses.append(mass)
+        self.masses.add(mass)
 
     def add_masses(self, masses: Iterable[Mass]) -> None:
         for mass in masses:
             self.add_mass(mass)
 
     def add_fragment(self, fragment: Fragment) -> None:
-        for existing_fragment in self.fragments:
-            if existing_fragment.merge(fragment):
-                return
-        self.fragments.append(fragment)
+        self.fragments.add(fragment)
 
     def add_fragments(self, fragments: list[Fragment]) -> None:
         for fragment in fragments:
@@ -60,6 +50,22 @@ class Adduct():
         self.add_masses(other.masses)
         return True
 
+    def merge_keys(self) -> tuple:
+        return (self.name,)
+
+    def to_dict(self) -> dict:
+        return {
+            'adduct_mass': self.adduct_mass,
+            'charge': self.charge,
+            'fragments': [fragment.to_dict() for fragment in self.fragments],
+            'lipidmaps_name': self.lipidmaps_name,
+            'masses': [mass.to_dict() for mass in self.masses],
+            'name': self.name,
+            'sources': [source.to_dict() for source in self.sources],
+            'swisslipids_abbrev': self.swisslipids_abbrev,
+            'swisslipids_name': self.swisslipids_name
+        }
+
     def __eq__(self, other) -> bool:
         if not isinstance(other, self.__class__):
             return False
@@ -1,15 +1,19 @@
 from typing import Iterable
 
 from .Nomenclature import Level
+from .Source import NO_SOURCES
 from .Source import Source
+from .Source import sources_changed
 
 
 class DatabaseIdentifier():
 
+    __slots__ = ('database', 'identifier', 'sources')
+
     def __init__(self) -> None:
         self.database: str | None = None
         self.identifier: str | None = None
-        self.sources: set[Source] = set()
+        self.sources: set[Source] = NO_SOURCES
 
     @classmethod
     def from_data(cls, database: str, identifier: str, source: Source):
@@ -70,7 +74,11 @@ class DatabaseIdentifier():
             return ""
 
     def add_source(self, source: Source) -> None:
+        if not self.sources:
+            # replace the shared NO_SOURCES, also after the object has been copied
+            self.sources = set()
         self.sources.add(source)
+        sources_changed()
 
     def add_sources(self, sources: Iterable[Source]) -> None:
         for source in sources:
@@ -89,10 +97,21 @@ class DatabaseIdentifier():
         self.add_sources(other.sources)
         return True
 
+    def merge_keys(self) -> tuple:
+        return ((self.database, self.identifier),)
+
+    def to_dict(self) -> dict:
+        return {
+            'database': self.database,
+            'identifier': self.identifier,
+            'sources': [source.to_dict() for source in self.sources],
+            'url': self.url
+        }
+
     def __eq__(self, other) -> bool:
         if not isinstance(other, self.__class__):
             return False
-        return self.__dict__ == other.__dict__
+        return (self.database, self.identifier, self.sources) == (other.database, other.identifier, other.sources)
 
     def __ne__(self, other) -> bool:
         return not self.__eq__(other)
@@ -1,28 +1,25 @@
 from typing import Iterable
 
+from .KeyedList import KeyedList
 from .Mass import Mass
 from .Source import Source
 
 
 class Fragment():
 
+    __slots__ = ('name', 'masses', 'sum_formula')
+
     def __init__(self):
         self.name: str | None = None
-        self.masses: list[Mass] = []
+        self.masses: list[Mass] = KeyedList()
         self.sum_formula: str | None = None
 
     @property
     def sources(self) -> set[Source]:
-        sources: set[Source] = set()
-        for mass in self.masses:
-            sources.update(mass.sources)
-        return sources
+        return set(self.masses.sources)
 
     def add_mass(self, mass: Mass) -> None:
-        for existing_mass in self.masses:
-            if existing_mass.merge(mass):
-                return
-        self.masses.append(mass)
+        self.masses.add(mass)
 
     def add_masses(self, masses: Iterable[Mass]) -> None:
         for mass in masses:
@@ -41,10 +38,21 @@ class Fragment():
         self.add_masses(other.masses)
         return True
 
+    def merge_keys(self) -> tuple:
+        return (self.sum_formula,)
+
+    def to_dict(self) -> dict:
+        return {
+            'masses': [mass.to_dict() for mass in self.masses],
+            'name': self.name,
+            'sources': [source.to_dict() for source in self.sources],
+            'sum_formula': self.sum_formula
+        }
+
     def __eq__(self, other) -> bool:
         if not isinstance(other, self.__class__):
             return False
-        return self.__dict__ == other.__dict__
+        return (self.name, self.masses, self.sum_formula) == (other.name, other.masses, other.sum_formula)
 
     def __ne__(self, other) -> bool:
         return not self.__eq__(other)
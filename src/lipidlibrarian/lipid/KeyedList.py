@@ -0,0 +1,85 @@
+from collections.abc import Hashable
+from collections.abc import Iterable
+from typing import Any
+
+from .Source import Source
+from .Source import sources_changed
+from .Source import sources_version
+
+
+class KeyedList(list):
+
+    def __init__(self, elements: Iterable[Any] = ()):
+        """
+        A list of mergeable elements, e.g. masses or synonyms, which indexes its elements by their
+        merge_keys, so an added element is only compared to the elements it might merge with instead
+        of all elements. It also caches the sources of its elements.
+
+        Every element must provide merge(other) -> bool, merge_keys() -> tuple and sources, and two
+        elements which merge must share at least one of their merge keys. The list itself can be
+        used and modified like any other list; changing it by other means than add only rebuilds the
+        index. The cached sources are collected again after any change of sources in the session,
+        which includes elements changed after they have been added.
+        """
+        super().__init__(elements)
+        self._positions: dict[Hashable, list[int]] | None = None
+        self._sources: tuple[int, set[Source]] | None = None  # sources_version, sources
+        sources_changed()
+
+    @property
+    def sources(self) -> set[Source]:
+        """
+        The sources of all elements. The returned set is cached and must not be modified.
+        """
+        version = sources_version()
+        if self._sources is None or self._sources[0] != version:
+            sources: set[Source] = set()
+            for element in self:
+                sources.update(element.sources)
+            self._sources = (version, sources)
+        return self._sources[1]
+
+    def add(self, element: Any) -> None:
+        """
+        Merge the element into the first element it can be merged with, or append it otherwise.
+        """
+        if self._positions is None:
+            self._positions = {}
+            for position, existing_element in enumerate(self):
+                self._register(existing_element, position)
+
+        keys = element.merge_keys()
+        if len(keys) == 1:
+            candidates = self._positions.get(keys[0], ())
+        else:
+            candidates = sorted({position for key in keys for position in self._positions.get(key, ())})
+        for position in candidates:
+            if self[position].merge(element):
+                return
+
+        self._register(element, len(self))
+        super().append(element)
+        sources_changed()
+
+    def _register(self, element: Any, position: int) -> None:
+        for key in element.merge_keys():
+            self._positions.setdefault(key, []).append(position)
+
+
+def _invalidating(name: str):
+    method = getattr(list, name)
+
+    def invalidating_method(self, *args, **kwargs):
+        self._positions = None
+        result = method(self, *args, **kwargs)
+        sources_changed()
+        return result
+
+    invalidating_method.__name__ = name
+    invalidating_method.__doc__ = method.__doc__
+    return invalidating_method
+
+
+for _name in ('append', 'extend', 'insert', 'remove', 'pop', 'clear', 'sort', 'reverse',
+              '__setitem__', '__delitem__', '__iadd__', '__imul__'):
+    setattr(KeyedList, _name, _invalidating(_name))
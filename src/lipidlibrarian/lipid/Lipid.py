@@ -1,16 +1,32 @@
+import json
 import logging
+from typing import Any
 from typing import Iterable
 
 import json2html
-import jsons
+import numpy as np
+
+try:
+    import orjson
+except ModuleNotFoundError as _:
+    orjson = None
 
 from .Mass import Mass
 from .DatabaseIdentifier import DatabaseIdentifier
 from .Ontology import Ontology
 from .Adduct import Adduct
+from .KeyedList import KeyedList
 from .Nomenclature import Nomenclature
 from .Reaction import Reaction
 from .Source import Source
+from .Source import sources_version
+
+
+def _json_default(obj: Any) -> Any:
+    # numpy scalars, e.g. masses read from the ALEX123 database
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable.")
 
 
 class Lipid():
@@ -19,26 +35,30 @@ class Lipid():
         self._query: str | None = None  # query_string for output formatting
         self._log_messages: list[tuple[int, str, str]] = []  # timestamp, action, value
         self.nomenclature: Nomenclature = Nomenclature()
-        self.database_identifiers: list[DatabaseIdentifier] = []
-        self.masses: list[Mass] = []
+        self.database_identifiers: list[DatabaseIdentifier] = KeyedList()
+        self.masses: list[Mass] = KeyedList()
         self.ontology: Ontology = Ontology()
-        self.reactions: list[Reaction] = []
-        self.adducts: list[Adduct] = []
+        self.reactions: list[Reaction] = KeyedList()
+        self.adducts: list[Adduct] = KeyedList()
+        self._sources: tuple[int, set[Source]] | None = None  # sources_version, sources
 
     @property
     def sources(self) -> set[Source]:
-        sources: set[Source] = set()
-        for database_identifier in self.database_identifiers:
-            sources.update(database_identifier.sources)
-        for mass in self.masses:
-            sources.update(mass.sources)
-        for reaction in self.reactions:
-            sources.update(reaction.sources)
-        for adduct in self.adducts:
-            sources.update(adduct.sources)
-        sources.update(self.nomenclature.sources)
-        sources.update(self.ontology.sources)
-        return sources
+        """
+        The sources of the lipid and all of its parts. The returned set is cached until sources
+        change and must not be modified.
+        """
+        version = sources_version()
+        if self._sources is None or self._sources[0] != version:
+            sources: set[Source] = set()
+            sources.update(self.database_identifiers.sources)
+            sources.update(self.masses.sources)
+            sources.update(self.reactions.sources)
+            sources.update(self.adducts.sources)
+            sources.update(self.nomenclature.sources)
+            sources.update(self.ontology.sources)
+            self._sources = (version, sources)
+        return self._sources[1]
 
     def get_database_identifiers(self, database: str) -> list[DatabaseIdentifier]:
         results = []
@@ -48,20 +68,14 @@ class Lipid():
         return results
 
     def add_reaction(self, reaction: Reaction) -> None:
-        for existing_reaction in self.reactions:
-            if existing_reaction.merge(reaction):
-                return
-        self.reactions.append(reaction)
+        self.reactions.add(reaction)
 
     def add_reactions(self, reactions: Iterable[Reaction]) -> None:
         for reaction in reactions:
             self.add_reaction(reaction)
     
     def add_adduct(self, adduct: Adduct) -> None:
-        for existing_adduct in self.adducts:
-            if existing_adduct.merge(adduct):
-                return
-        self.adducts.append(adduct)
+        self.adducts.add(adduct)
 
     def add_adducts(self, adducts: Iterable[Adduct]) -> None:
         for adduct in adducts:
@@ -75,20 +89,14 @@ class Lipid():
             self.add_log_message(log_message)
 
     def add_database_identifier(self, database_identifier: DatabaseIdentifier) -> None:
-        for existing_database_identifier in self.database_identifiers:
-            if existing_database_identifier.merge(database_identifier):
-                return
-        self.database_identifiers.append(database_identifier)
+        self.database_identifiers.add(database_identifier)
 
     def add_database_identifiers(self, database_identifiers: Iterable[DatabaseIdentifier]) -> None:
         for database_identifier in database_identifiers:
             self.add_database_identifier(database_identifier)
 
     def add_mass(self, mass: Mass) -> None:
-        for existing_mass in self.masses:
-            if existing_mass.merge(mass):
-                return
-        self.masses.append(mass)
+        self.masses.add(mass)
 
     def add_masses(self, masses: Iterable[Mass]) -> None:
         for mass in masses:
@@ -147,10 +155,39 @@ class Lipid():
 
         return True
 
+    def to_dict(self) -> dict:
+        """
+        Return the lipid as a dictionary of plain JSON types, with the same layout as its jsons dump.
+        """
+        return {
+            '_log_messages': [list(log_message) for log_message in self._log_messages],
+            '_query': self._query,
+            'adducts': [adduct.to_dict() for adduct in self.adducts],
+            'database_identifiers': [database_identifier.to_dict() for database_identifier in self.database_identifiers],
+            'masses': [mass.to_dict() for mass in self.masses],
+            'nomenclature': self.nomenclature.to_dict(),
+            'ontology': self.ontology.to_dict(),
+            'reactions': [reaction.to_dict() for reaction in self.reactions],
+            'sources': [source.to_dict() for source in self.sources]
+        }
+
+    def to_json(self, indent: bool = False) -> str:
+        """
+        Return the lipid as JSON, using orjson if it is installed and the json module otherwise.
+        """
+        if orjson is not None:
+            option = orjson.OPT_SERIALIZE_NUMPY | (orjson.OPT_INDENT_2 if indent else 0)
+            return orjson.dumps(self.to_dict(), default=_json_default, option=option).decode('utf-8')
+        return json.dumps(self.to_dict(), default=_json_default, indent=2 if indent else None)
+
     def __eq__(self, other) -> bool:
         if not isinstance(other, self.__class__):
             return False
-        return self.__dict__ == other.__dict__
+        # the cached sources only depend on the other attributes
+        return (
+            {key: value for key, value in self.__dict__.items() if key != '_sources'} ==
+            {key: value for key, value in other.__dict__.items() if key != '_sources'}
+        )
 
     def __ne__(self, other) -> bool:
         return not self.__eq__(other)
@@ -163,8 +200,9 @@ class Lipid():
         if name is None or name == "":
             name = self._query
         if format_spec == 'json':
-            return jsons.dumps(self, indent="\t")
+            # same layout as the former jsons output; NDJSON uses the compact to_json instead
+            return json.dumps(self.to_dict(), default=_json_default, indent='\t')
         if format_spec == 'html':
-            return "<h1>" + "Lipid: " + name + "</h1>" + json2html.json2html.convert(json=format(self, 'json'))
+            return "<h1>" + "Lipid: " + name + "</h1>" + json2html.json2html.convert(json=self.to_dict())
         else:
             return str(self.__dict__)
@@ -1,14 +1,18 @@
 from typing import Iterable
 
+from .Source import NO_SOURCES
 from .Source import Source
+from .Source import sources_changed
 
 
 class Mass():
 
+    __slots__ = ('mass_type', 'value', 'sources')
+
     def __init__(self) -> None:
         self.mass_type: str | None = None  # (monisotopic, neutral, average)
         self.value: float | None = None
-        self.sources: set[Source] = set()
+        self.sources: set[Source] = NO_SOURCES
 
     @classmethod
     def from_data(cls, mass_type: str, value: float, source: Source):
@@ -19,7 +23,11 @@ class Mass():
         return obj
 
     def add_source(self, source: Source) -> None:
+        if not self.sources:
+            # replace the shared NO_SOURCES, also after the object has been copied
+            self.sources = set()
         self.sources.add(source)
+        sources_changed()
 
     def add_sources(self, sources: Iterable[Source]) -> None:
         for source in sources:
@@ -38,10 +46,20 @@ class Mass():
         self.add_sources(other.sources)
         return True
 
+    def merge_keys(self) -> tuple:
+        return ((self.mass_type, self.value),)
+
+    def to_dict(self) -> dict:
+        return {
+            'mass_type': self.mass_type,
+            'sources': [source.to_dict() for source in self.sources],
+            'value': self.value
+        }
+
     def __eq__(self, other) -> bool:
         if not isinstance(other, self.__class__):
             return False
-        return self.__dict__ == other.__dict__
+        return (self.mass_type, self.value, self.sources) == (other.mass_type, other.value, other.sources)
 
     def __ne__(self, other) -> bool:
         return not self.__eq__(other)
@@ -9,6 +9,7 @@ from . import goslin_convert
 from . import goslin_get_fatty_acids
 from . import lynx_convert
 from . import lipid_name_conversion_methods
+from .KeyedList import KeyedList
 from .Level import Level
 from .Source import Source
 from .StructureIdentifier import StructureIdentifier
@@ -72,8 +73,8 @@ class Nomenclature():
         self.lipid_category: str | None = None
         self.lipid_class: str | None = None
         self.sum_formula: str | None = None
-        self.synonyms: list[Synonym] = []
-        self.structure_identifiers: list[StructureIdentifier] = []
+        self.synonyms: list[Synonym] = KeyedList()
+        self.structure_identifiers: list[StructureIdentifier] = KeyedList()
 
     @property
     def level(self) -> Level:
@@ -217,28 +218,17 @@ class Nomenclature():
 
     @property
     def sources(self) -> set[Source]:
-        sources: set[Source] = set()
-        for synonym in self.synonyms:
-            sources.update(synonym.sources)
-        for structure_identifier in self.structure_identifiers:
-            sources.update(structure_identifier.sources)
-        return sources
+        return self.synonyms.sources | self.structure_identifiers.sources
 
     def add_synonym(self, synonym: Synonym) -> None:
-        for existing_synonym in self.synonyms:
-            if existing_synonym.merge(synonym):
-                return
-        self.synonyms.append(synonym)
+        self.synonyms.add(synonym)
 
     def add_synonyms(self, synonyms: Iterable[Synonym]) -> None:
         for synonym in synonyms:
             self.add_synonym(synonym)
 
     def add_structure_identifier(self, structure_identifier: StructureIdentifier) -> None:
-        for existing_structure_identifier in self.structure_identifiers:
-            if existing_structure_identifier.merge(structure_identifier):
-                return
-        self.structure_identifiers.append(structure_identifier)
+        self.structure_identifiers.add(structure_identifier)
 
     def add_structure_identifiers(self, structure_identifiers: Iterable[StructureIdentifier]) -> None:
         for structure_identifier in structure_identifiers:
@@ -264,6 +254,27 @@ class Nomenclature():
         self.add_structure_identifiers(other.structure_identifiers)
         return True
 
+    def to_dict(self) -> dict:
+        return {
+            '_isomeric_lipid_species_name': self._isomeric_lipid_species_name,
+            '_lipid_category_name': self._lipid_category_name,
+            '_lipid_class_name': self._lipid_class_name,
+            '_molecular_lipid_species_name': self._molecular_lipid_species_name,
+            '_query_name': self._query_name,
+            '_structural_lipid_species_name': self._structural_lipid_species_name,
+            '_sum_lipid_species_name': self._sum_lipid_species_name,
+            'fatty_acids': self.fatty_acids,
+            'level': self.level.name,
+            'lipid_category': self.lipid_category,
+            'lipid_class': self.lipid_class,
+            'lipid_class_abbreviation': self.lipid_class_abbreviation,
+            'name': self.name,
+            'sources': [source.to_dict() for source in self.sources],
+            'structure_identifiers': [structure_identifier.to_dict() for structure_identifier in self.structure_identifiers],
+            'sum_formula': self.sum_formula,
+            'synonyms': [synonym.to_dict() for synonym in self.synonyms]
+        }
+
     def __eq__(self, other) -> bool:
         if not isinstance(other, self.__class__):
             return False
@@ -1,6 +1,7 @@
 from collections.abc import Iterable
 
 from .Source import Source
+from .Source import sources_changed
 
 
 class Ontology():
@@ -29,6 +30,7 @@ class Ontology():
 
     def add_source(self, source: Source) -> None:
         self.sources.add(source)
+        sources_changed()
 
     def add_sources(self, sources: Iterable[Source]) -> None:
         for source in sources:
@@ -45,5 +47,13 @@ class Ontology():
         self.add_sources(other.sources)
         return True
 
+    def to_dict(self) -> dict:
+        return {
+            'ontology_subgraph': [list(edge) for edge in self.ontology_subgraph],
+            'ontology_subgraph_node_data': self.ontology_subgraph_node_data,
+            'ontology_terms': list(self.ontology_terms),
+            'sources': [source.to_dict() for source in self.sources]
+        }
+
     def __repr__(self) -> str:
         return self.ontology_terms
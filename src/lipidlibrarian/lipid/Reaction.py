@@ -1,6 +1,7 @@
 import logging
 from typing import Iterable
 
+from .KeyedList import KeyedList
 from .Lipid import DatabaseIdentifier
 from .Source import Source
 
@@ -8,7 +9,7 @@ from .Source import Source
 class Reaction():
 
     def __init__(self):
-        self.database_identifiers: list[DatabaseIdentifier] = []
+        self.database_identifiers: list[DatabaseIdentifier] = KeyedList()
 
         # Reaction description
         self.direction: str | None = None
@@ -34,10 +35,7 @@ class Reaction():
 
     @property
     def sources(self) -> set[Source]:
-        sources: set[Source] = set()
-        for database_identifier in self.database_identifiers:
-            sources.update(database_identifier.sources)
-        return sources
+        return set(self.database_identifiers.sources)
 
     def get_database_identifiers(self, database: str) -> list[DatabaseIdentifier]:
         results = []
@@ -47,10 +45,7 @@ class Reaction():
         return results
 
     def add_database_identifier(self, database_identifier: DatabaseIdentifier) -> None:
-        for existing_database_identifier in self.database_identifiers:
-            if existing_database_identifier.merge(database_identifier):
-                return
-        self.database_identifiers.append(database_identifier)
+        self.database_identifiers.add(database_identifier)
 
     def add_database_identifiers(self, database_identifiers: Iterable[DatabaseIdentifier]) -> None:
         for database_identifier in database_identifiers:
@@ -76,6 +71,29 @@ class Reaction():
 
         return True
 
+    def merge_keys(self) -> tuple:
+        # linex reactions merge into linex reactions of the same type and participants,
+        # and into other reactions of the same description
+        if self.linex_reaction_type is not None:
+            return (
+                ('linex', self.linex_reaction_type, frozenset(self.substrates), frozenset(self.products)),
+                ('description', self.description)
+            )
+        return (('description', self.description),)
+
+    def to_dict(self) -> dict:
+        return {
+            'database_identifiers': [database_identifier.to_dict() for database_identifier in self.database_identifiers],
+            'description': self.description,
+            'direction': self.direction,
+            'gene_names': [[gene_name, list(identifiers)] for gene_name, identifiers in self.gene_names],
+            'linex_nl_participants': list(self.linex_nl_participants),
+            'linex_reaction_type': self.linex_reaction_type,
+            'products': list(self.products),
+            'sources': [source.to_dict() for source in self.sources],
+            'substrates': list(self.substrates)
+        }
+
     def __eq__(self, other) -> bool:
         if not isinstance(other, self.__class__):
             return False
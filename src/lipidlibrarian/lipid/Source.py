@@ -1,3 +1,5 @@
+import itertools
+import threading
 from dataclasses import dataclass
 
 from .Level import Level
@@ -9,3 +11,57 @@ class Source():
     lipid_name: str
     lipid_level: Level
     source: str
+
+    def to_dict(self) -> dict:
+        return {
+            'lipid_level': self.lipid_level.name,
+            'lipid_name': self.lipid_name,
+            'source': self.source
+        }
+
+    # sources are immutable, so copies of lipids share their sources with the original
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+# shared by all objects without sources, so they do not allocate an empty set each
+NO_SOURCES: frozenset[Source] = frozenset()
+
+_sources_versions = itertools.count(1)
+_sources_version = 0
+
+_interned_sources: dict[tuple[str, Level, str], Source] = {}
+_interned_sources_lock = threading.Lock()
+
+
+def intern_source(lipid_name: str, lipid_level: Level, source: str) -> Source:
+    """
+    Return the Source with these values, which is shared by all lipids of the session instead of
+    being created for each of them.
+    """
+    key = (lipid_name, lipid_level, source)
+    if (result := _interned_sources.get(key)) is None:
+        with _interned_sources_lock:
+            result = _interned_sources.setdefault(key, Source(lipid_name, lipid_level, source))
+    return result
+
+
+def clear_interned_sources() -> None:
+    with _interned_sources_lock:
+        _interned_sources.clear()
+
+
+def sources_changed() -> None:
+    """
+    Mark the sources of all lipids as changed, so their cached sources are collected again.
+    """
+    global _sources_version
+    # every change gets its own version, so a cache can never see its version again after a change
+    _sources_version = next(_sources_versions)
+
+
+def sources_version() -> int:
+    return _sources_version
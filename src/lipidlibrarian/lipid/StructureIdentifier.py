@@ -1,14 +1,18 @@
 from typing import Iterable
 
+from .Source import NO_SOURCES
 from .Source import Source
+from .Source import sources_changed
 
 
 class StructureIdentifier():
 
+    __slots__ = ('value', 'structure_type', 'sources')
+
     def __init__(self) -> None:
         self.value: str | None = None
         self.structure_type: str | None = None
-        self.sources: set[Source] = set()
+        self.sources: set[Source] = NO_SOURCES
 
     @classmethod
     def from_data(cls, value: str, structure_type: str, source: Source):
@@ -19,7 +23,11 @@ class StructureIdentifier():
         return obj
 
     def add_source(self, source: Source) -> None:
+        if not self.sources:
+            # replace the shared NO_SOURCES, also after the object has been copied
+            self.sources = set()
         self.sources.add(source)
+        sources_changed()
 
     def add_sources(self, sources: Iterable[Source]) -> None:
         for source in sources:
@@ -38,10 +46,20 @@ class StructureIdentifier():
         self.add_sources(other.sources)
         return True
 
+    def merge_keys(self) -> tuple:
+        return (('value', self.value), ('structure_type', self.structure_type))
+
+    def to_dict(self) -> dict:
+        return {
+            'sources': [source.to_dict() for source in self.sources],
+            'structure_type': self.structure_type,
+            'value': self.value
+        }
+
     def __eq__(self, other) -> bool:
         if not isinstance(other, self.__class__):
             return False
-        return self.__dict__ == other.__dict__
+        return (self.value, self.structure_type, self.sources) == (other.value, other.structure_type, other.sources)
 
     def __ne__(self, other) -> bool:
         return not self.__eq__(other)
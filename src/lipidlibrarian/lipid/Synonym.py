@@ -1,14 +1,18 @@
 from typing import Iterable
 
+from .Source import NO_SOURCES
 from .Source import Source
+from .Source import sources_changed
 
 
 class Synonym():
 
+    __slots__ = ('value', 'synonym_type', 'sources')
+
     def __init__(self) -> None:
         self.value: str | None = None
         self.synonym_type: str | None = None
-        self.sources: set[Source] = set()
+        self.sources: set[Source] = NO_SOURCES
 
     @classmethod
     def from_data(cls, value: str, synonym_type: str, source: Source):
@@ -19,7 +23,11 @@ class Synonym():
         return obj
 
     def add_source(self, source: Source) -> None:
+        if not self.sources:
+            # replace the shared NO_SOURCES, also after the object has been copied
+            self.sources = set()
         self.sources.add(source)
+        sources_changed()
 
     def add_sources(self, sources: Iterable[Source]) -> None:
         for source in sources:
@@ -38,10 +46,20 @@ class Synonym():
         self.add_sources(other.sources)
         return True
 
+    def merge_keys(self) -> tuple:
+        return (('value', self.value), ('synonym_type', self.synonym_type))
+
+    def to_dict(self) -> dict:
+        return {
+            'sources': [source.to_dict() for source in self.sources],
+            'synonym_type': self.synonym_type,
+            'value': self.value
+        }
+
     def __eq__(self, other) -> bool:
         if not isinstance(other, self.__class__):
             return False
-        return self.__dict__ == other.__dict__
+        return (self.value, self.synonym_type, self.sources) == (other.value, other.synonym_type, other.sources)
 
     def __ne__(self, other) -> bool:
         return not self.__eq__(other)
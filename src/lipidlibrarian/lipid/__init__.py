@@ -1,11 +1,16 @@
+import ctypes
 import logging
 import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import InvalidStateError
+from functools import lru_cache
 from importlib.resources import files
 from typing import Any
 import numpy as np
 import pandas as pd
-from func_timeout import FunctionTimedOut
-from func_timeout import func_timeout
 from pygoslin.parser.Parser import LipidParser
 from pygoslin.domain.LipidExceptions import LipidException
 from pygoslin.domain.LipidExceptions import LipidParsingException
@@ -17,10 +22,93 @@ from .Adduct import Adduct
 
 
 adducts = None
+adducts_by_name = None
 lynx_converter = None
 goslin_converter = None
 lipid_name_conversion_methods = {'lipidlynxx', 'goslin'}
 TIMEOUT_SECONDS = 30
+# Time a timed out conversion is given to react to being interrupted before its worker is abandoned.
+INTERRUPT_SECONDS = 5
+# Maximum number of lipid names (or name and level pairs) kept by each of the conversion caches.
+CONVERSION_CACHE_SIZE = 2 ** 16
+# The Goslin parser keeps the state of the current parse on the parser instance and LipidLynxX
+# changes the working directory, so neither of them may be used by multiple threads at once.
+goslin_lock = threading.Lock()
+lynx_lock = threading.Lock()
+
+
+class _ConversionInterrupted(BaseException):
+    """
+    Raised inside a conversion worker to stop a conversion that timed out.
+    """
+
+
+class _ConversionWorker:
+    """
+    A long-lived daemon thread that runs conversions with a deadline. Callers hold the lock of
+    the converter while waiting, so the deadline only covers the conversion itself.
+
+    Like func_timeout, a conversion that exceeds its deadline is stopped by raising an exception
+    inside the worker thread. The exception is only delivered while the thread executes Python
+    code, so a conversion that does not return to Python within INTERRUPT_SECONDS cannot be
+    stopped. The worker is marked as stuck then and has to be replaced.
+    """
+
+    def __init__(self, name: str):
+        self.stuck: bool = False
+        self._requests: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                if (request := self._requests.get()) is None:
+                    return
+                future, function, args = request
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    result = function(*args)
+                except BaseException as e:
+                    future.set_exception(e)
+                else:
+                    future.set_result(result)
+            except (_ConversionInterrupted, InvalidStateError):
+                # the interruption arrived after the conversion had already finished
+                continue
+
+    def run(self, function, args: tuple, timeout: float) -> Any:
+        future = Future()
+        self._requests.put((future, function, args))
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            self._interrupt(future)
+            raise
+
+    def _interrupt(self, future: Future) -> None:
+        thread_id = ctypes.c_ulong(self._thread.ident)
+        deadline = time.monotonic() + INTERRUPT_SECONDS
+        while not future.done():
+            if time.monotonic() > deadline:
+                logging.warning(f"{self._thread.name}: The timed out conversion could not be stopped.")
+                self.stuck = True
+                return
+            ctypes.pythonapi.PyThreadState_SetAsyncExc(thread_id, ctypes.py_object(_ConversionInterrupted))
+            try:
+                future.exception(timeout=0.01)
+            except TimeoutError:
+                pass
+        # discard an interruption that has not been delivered before the conversion finished
+        ctypes.pythonapi.PyThreadState_SetAsyncExc(thread_id, None)
+
+    def stop(self) -> None:
+        self._requests.put(None)
+
+
+goslin_worker: _ConversionWorker | None = None
+lynx_worker: _ConversionWorker | None = None
 
 
 def parse_adducts():
@@ -64,19 +152,38 @@ def parse_adducts():
 
 def get_adduct(adduct_name: str) -> Adduct:
     global adducts
+    global adducts_by_name
 
     if adducts is None:
         adducts = parse_adducts()
 
-    for adduct in adducts:
-        if adduct_name.lower() == adduct.name.lower():
-            return adduct
-        if adduct.swisslipids_name is not None and adduct_name.lower() == adduct.swisslipids_name.lower():
-            return adduct
-        if adduct.swisslipids_abbrev is not None and adduct_name.lower() == adduct.swisslipids_abbrev.lower():
-            return adduct
-        if adduct.lipidmaps_name is not None and adduct_name.lower() == adduct.lipidmaps_name.lower():
-            return adduct
+    if adducts_by_name is None:
+        names = {}
+        for adduct in adducts:
+            for name in (adduct.name, adduct.swisslipids_name, adduct.swisslipids_abbrev, adduct.lipidmaps_name):
+                if name is not None:
+                    names.setdefault(name.lower(), adduct)
+        adducts_by_name = names
+
+    return adducts_by_name.get(adduct_name.lower())
+
+
+def new_adduct(adduct_name: str) -> Adduct | None:
+    """
+    Return a new Adduct without masses and fragments for one of the known adducts.
+    This is a cheap replacement for copy.deepcopy(get_adduct(adduct_name)).
+    """
+    if (adduct := get_adduct(adduct_name)) is None:
+        return None
+
+    result = Adduct()
+    result.name = adduct.name
+    result.swisslipids_name = adduct.swisslipids_name
+    result.swisslipids_abbrev = adduct.swisslipids_abbrev
+    result.lipidmaps_name = adduct.lipidmaps_name
+    result.adduct_mass = adduct.adduct_mass
+    result.charge = adduct.charge
+    return result
 
 
 def get_adducts(adduct_names: set[str]) -> list[Adduct]:
@@ -121,32 +228,49 @@ def lynx_init() -> Any | None:
 
 
 def lynx_convert(lipid_name: str, level: str = 'MAX') -> str | None:
-    global lynx_converter
-
     if 'lipidlynxx' not in lipid_name_conversion_methods:
         return None
 
-    if 'lipidlynxx' in lipid_name_conversion_methods and lynx_converter is None:
-        lynx_converter = lynx_init()
-
-    if lynx_converter is None:
-        return None
-    
     if lipid_name is None:
         return None
 
-    current_working_directory = os.getcwd()
-    # changes the working directory
     try:
-        result = func_timeout(TIMEOUT_SECONDS, lynx_converter.convert, args=(lipid_name, level,))
-        result = result.output
-    except FunctionTimedOut:
-        error = ("LipidLynxX for name " + lipid_name + " and level " + level + " timed out after " +
-                 str(TIMEOUT_SECONDS) + " seconds.")
-        logging.error(error)
-        result = None
-    finally:
-        os.chdir(current_working_directory)
+        return _lynx_convert(lipid_name, level)
+    except TimeoutError:
+        # timeouts are not cached, so the name is converted again on the next call
+        return None
+
+
+@lru_cache(maxsize=CONVERSION_CACHE_SIZE)
+def _lynx_convert(lipid_name: str, level: str) -> str | None:
+    global lynx_converter
+    global lynx_worker
+
+    with lynx_lock:
+        # the converter is replaced after a timeout, so it is (re)initialized while holding the lock
+        if lynx_converter is None:
+            lynx_converter = lynx_init()
+        if lynx_converter is None:
+            return None
+        if lynx_worker is None:
+            lynx_worker = _ConversionWorker('LipidLynxX')
+        current_working_directory = os.getcwd()
+        # changes the working directory
+        try:
+            result = lynx_worker.run(lynx_converter.convert, (lipid_name, level,), TIMEOUT_SECONDS)
+            result = result.output
+        except TimeoutError:
+            error = ("LipidLynxX for name " + lipid_name + " and level " + level + " timed out after " +
+                     str(TIMEOUT_SECONDS) + " seconds.")
+            logging.error(error)
+            # The converter may be left in the state of the interrupted conversion, so it is replaced.
+            lynx_converter = None
+            if lynx_worker.stuck:
+                lynx_worker.stop()
+                lynx_worker = None
+            raise
+        finally:
+            os.chdir(current_working_directory)
 
     if result == "":
         result = None
@@ -162,28 +286,58 @@ def goslin_init() -> Any | None:
     return converter
 
 
-def goslin_convert(lipid_name: str, level: Any = None) -> str | None:
+@lru_cache(maxsize=CONVERSION_CACHE_SIZE)
+def _goslin_parse(lipid_name: str) -> LipidAdduct | None:
+    """
+    Parse a lipid name with Goslin. The parsed lipid is shared by all callers
+    and all level conversions of the name, so it must not be modified.
+    Raises a TimeoutError, which is not cached, if the parse times out.
+    """
     global goslin_converter
+    global goslin_worker
 
+    with goslin_lock:
+        if goslin_converter is None:
+            goslin_converter = goslin_init()
+        if goslin_worker is None:
+            goslin_worker = _ConversionWorker('Goslin')
+
+        try:
+            return goslin_worker.run(goslin_converter.parse, (lipid_name,), TIMEOUT_SECONDS)
+        except TimeoutError:
+            error = ("Goslin: Conversion for name " + lipid_name + " timed out after " + str(TIMEOUT_SECONDS) + " seconds.")
+            logging.error(error)
+            # The parser may be left in the state of the interrupted parse, so it is replaced.
+            goslin_converter = None
+            if goslin_worker.stuck:
+                goslin_worker.stop()
+                goslin_worker = None
+            raise
+        except Exception or LipidException or LipidParsingException as _:
+            return None
+
+
+def goslin_convert(lipid_name: str, level: Any = None) -> str | None:
     if lipid_name is None:
         return None
 
-    if goslin_converter is None:
-        goslin_converter = goslin_init()
-
     try:
-        result = func_timeout(TIMEOUT_SECONDS, goslin_converter.parse, args=(lipid_name,))
-        if level is not None and level is not LipidLevel.UNDEFINED:
-            result = result.get_lipid_string(level=level)
-        else:
-            result = result.get_lipid_string()
-    except FunctionTimedOut:
-        error = ("Goslin: Conversion for name " + lipid_name + " timed out after " + str(TIMEOUT_SECONDS) + " seconds.")
-        logging.error(error)
-        result = None
-    except Exception or LipidException or LipidParsingException as _:
-        # Conversions with level raise generic Exceptions in Goslin currently.
-        result = None
+        return _goslin_convert(lipid_name, level)
+    except TimeoutError:
+        return None
+
+
+@lru_cache(maxsize=CONVERSION_CACHE_SIZE)
+def _goslin_convert(lipid_name: str, level: Any) -> str | None:
+    if (result := _goslin_parse(lipid_name)) is not None:
+        try:
+            if level is not None and level is not LipidLevel.UNDEFINED:
+                result = result.get_lipid_string(level=level)
+            else:
+                result = result.get_lipid_string()
+        except Exception or LipidException or LipidParsingException as _:
+            # Conversions with level raise generic Exceptions in Goslin currently.
+            result = None
 
     if result == "":
         result = None
@@ -201,15 +355,27 @@ def goslin_get_fatty_acids(lipid_name: str) -> list[str]:
 
 
 def goslin_get_lipid(lipid_name: str) -> LipidAdduct:
-    global goslin_converter
-
     if lipid_name is None:
         return None
 
-    if goslin_converter is None:
-        goslin_converter = goslin_init()
-
     try:
-        return func_timeout(TIMEOUT_SECONDS, goslin_converter.parse, args=(lipid_name,))
-    except LipidException or LipidParsingException as _:
+        return _goslin_parse(lipid_name)
+    except TimeoutError:
         return None
+
+
+def conversion_cache_info() -> dict[str, Any]:
+    """
+    Return the hits, misses and sizes of the lipid name conversion caches.
+    """
+    return {
+        'goslin_parse': _goslin_parse.cache_info(),
+        'goslin_convert': _goslin_convert.cache_info(),
+        'lynx_convert': _lynx_convert.cache_info()
+    }
+
+
+def clear_conversion_cache() -> None:
+    _goslin_parse.cache_clear()
+    _goslin_convert.cache_clear()
+    _lynx_convert.cache_clear()
@@ -0,0 +1,196 @@
+import os
+import shutil
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+
+from lipidlibrarian.api.Alex123API import Alex123API
+from lipidlibrarian.api.Alex123API import Alex123DBConnectorHDF
+from lipidlibrarian.api.Alex123API import Alex123DBConnectorIndexed
+from lipidlibrarian.api.Alex123API import Alex123DBConnectorMmap
+from lipidlibrarian.api.Alex123API import Alex123DBConnectorSQL
+from lipidlibrarian.lipid import get_adducts
+
+
+@pytest.fixture(scope="module")
+def alex123_tables():
+    """
+    The tables of a small random ALEX123 database with the table layout of alex123_db.h5.
+    """
+    rng = np.random.default_rng(123)
+    adducts = get_adducts({'+H+', '+Na+', '-H+', '+NH4+'})
+    tables = {
+        'adduct': pd.DataFrame({
+            'adduct_id': np.arange(len(adducts)),
+            'adduct_name': [adduct.name for adduct in adducts],
+            'adduct_mass': [float(adduct.adduct_mass) for adduct in adducts],
+            'adduct_charge': [adduct.charge for adduct in adducts],
+        }),
+        'lipid_category': pd.DataFrame({
+            'lipid_category_id': [0, 1],
+            'lipid_category_name': ['GP', 'SP'],
+        }),
+        'lipid_class': pd.DataFrame({
+            'lipid_class_id': [0, 1, 2],
+            'lipid_class_name': ['PC', 'PE', 'SM'],
+            'lipid_category_id': [0, 0, 1],
+        }),
+        'sum_lipid_species': pd.DataFrame({
+            'sum_lipid_species_id': np.arange(60),
+            'sum_lipid_species_name': [f'PC {i}:1' for i in range(60)],
+            'sum_lipid_species_mass': np.round(rng.uniform(700, 720, 60), 4),
+            'lipid_class_id': rng.integers(0, 3, 60),
+        }),
+        'molecular_lipid_species': pd.DataFrame({
+            'molecular_lipid_species_id': np.arange(200),
+            'molecular_lipid_species_name': [f'PC {i}:0_{i}:1' for i in range(200)],
+            'sum_lipid_species_id': rng.integers(0, 60, 200),
+        }),
+        'fragment': pd.DataFrame({
+            'fragment_id': np.arange(2000),
+            'fragment_name': [f'fragment {i}' for i in range(2000)],
+            'fragment_mass': np.round(rng.uniform(100, 800, 2000), 4),
+            'fragment_sum_formula': [f'C{i}H{i}' if i % 7 else None for i in range(2000)],
+            'fragment_polarity': rng.choice(['+', '-'], 2000),
+            'adduct_id': rng.integers(0, len(adducts), 2000),
+            'molecular_lipid_species_id': rng.integers(0, 200, 2000),
+        }),
+    }
+    return tables
+
+
+@pytest.fixture(scope="module")
+def alex123_hdf_path(alex123_tables, tmp_path_factory):
+    path = tmp_path_factory.mktemp("alex123") / "alex123_db.h5"
+    for table_name, table in alex123_tables.items():
+        table.to_hdf(path, key=table_name, format='table')
+    return path
+
+
+@pytest.fixture(scope="module")
+def alex123_connectors(alex123_hdf_path, tmp_path_factory):
+    mmap_path = tmp_path_factory.mktemp("alex123") / "alex123_mmap"
+    Alex123DBConnectorMmap.build(alex123_hdf_path, mmap_path)
+    return {
+        'hdf': Alex123DBConnectorHDF(alex123_hdf_path),
+        'indexed': Alex123DBConnectorIndexed(alex123_hdf_path),
+        'mmap': Alex123DBConnectorMmap(mmap_path),
+    }
+
+
+def _assert_same_results(expected: pd.DataFrame, actual: pd.DataFrame):
+    pd.testing.assert_frame_equal(expected.reset_index(drop=True), actual.reset_index(drop=True))
+
+
+@pytest.mark.parametrize("mz", [700.5, 705.0, 712.25, 719.9])
+@pytest.mark.parametrize("adduct_names", [{'+H+'}, {'-H+', '+Na+'}])
+@pytest.mark.parametrize("connector_name", ['indexed', 'mmap'])
+def test_connector_matches_hdf_connector(alex123_connectors, connector_name, mz, adduct_names):
+    hdf_connector = alex123_connectors['hdf']
+    indexed_connector = alex123_connectors[connector_name]
+    adducts = get_adducts(adduct_names)
+    tolerance = 0.5
+
+    for method in ['get_molecular_lipid_species_by_mz', 'get_sum_lipid_species_by_mz', 'get_fragment_by_mz']:
+        _assert_same_results(
+            getattr(hdf_connector, method)(mz, tolerance, adducts),
+            getattr(indexed_connector, method)(mz, tolerance, adducts)
+        )
+
+    species = hdf_connector.get_molecular_lipid_species_by_mz(mz, tolerance, adducts)
+    _assert_same_results(
+        hdf_connector.get_fragment_by_molecular_lipid_species(species.molecular_lipid_species_id),
+        indexed_connector.get_fragment_by_molecular_lipid_species(species.molecular_lipid_species_id)
+    )
+    names = set(species.molecular_lipid_species_name) | {'PC 1:0_1:1', 'not in the database'}
+    _assert_same_results(
+        hdf_connector.get_molecular_lipid_species_by_name(names),
+        indexed_connector.get_molecular_lipid_species_by_name(names)
+    )
+    names = set(species.sum_lipid_species_name) | {'PC 1:1'}
+    _assert_same_results(
+        hdf_connector.get_sum_lipid_species_by_name(names),
+        indexed_connector.get_sum_lipid_species_by_name(names)
+    )
+
+
+@pytest.mark.parametrize("connector_name", ['hdf', 'indexed', 'mmap'])
+def test_batch_mz_lookup_matches_single_lookups(alex123_connectors, connector_name):
+    connector = alex123_connectors[connector_name]
+    adducts = get_adducts({'+H+', '-H+'})
+    mzs = np.array([712.25, 700.5, 650.0, 705.0, 700.5])
+    tolerances = np.array([0.5, 0.1, 0.5, 1.0, 0.1])
+
+    results = connector.get_molecular_lipid_species_by_mz_batch(mzs, tolerances, adducts)
+
+    assert list(results.columns) == (
+        ['query_index'] + list(connector.get_molecular_lipid_species_by_mz(700.5, 0.1, adducts).columns)
+    )
+    for query_index, (mz, tolerance) in enumerate(zip(mzs, tolerances)):
+        _assert_same_results(
+            connector.get_molecular_lipid_species_by_mz(mz, tolerance, adducts),
+            results[results.query_index == query_index].drop(columns='query_index')
+        )
+
+
+@pytest.fixture(scope="module")
+def alex123_sql_connector(alex123_tables):
+    """
+    The SQL connector on an in-memory SQLite database with the tables of the HDF database.
+    """
+    connector = Alex123DBConnectorSQL()
+    connector.paramstyle = 'qmark'
+    # all connections have to share the in-memory database
+    connector.engine = create_engine("sqlite://", poolclass=StaticPool)
+    for table_name, table in alex123_tables.items():
+        table.to_sql(table_name, connector.engine, index=False)
+    return connector
+
+
+def test_sql_batch_mz_lookup_matches_single_lookups(alex123_connectors, alex123_sql_connector):
+    # The single m/z query of the SQL connector uses MySQL session variables, so the batch query is
+    # compared with the single lookups of the HDF connector.
+    hdf_connector = alex123_connectors['hdf']
+    adducts = get_adducts({'+H+', '-H+'})
+    mzs = np.array([712.25, 700.5, 650.0, 705.0, 700.5])
+    tolerances = np.array([0.5, 0.1, 0.5, 1.0, 0.1])
+
+    results = alex123_sql_connector.get_molecular_lipid_species_by_mz_batch(mzs, tolerances, adducts)
+
+    for query_index, (mz, tolerance) in enumerate(zip(mzs, tolerances)):
+        expected = hdf_connector.get_molecular_lipid_species_by_mz(mz, tolerance, adducts)
+        actual = results[results.query_index == query_index].drop(columns='query_index')
+        pd.testing.assert_frame_equal(
+            expected.sort_values('molecular_lipid_species_id').reset_index(drop=True),
+            actual[expected.columns].reset_index(drop=True),
+            check_dtype=False
+        )
+
+    # the temporary table is dropped, so the batch query can be repeated on the same connection
+    repeated = alex123_sql_connector.get_molecular_lipid_species_by_mz_batch(mzs, tolerances, adducts)
+    _assert_same_results(results, repeated)
+
+
+def test_api_ignores_stale_mmap_database(alex123_hdf_path, tmp_path):
+    data_path = tmp_path / 'data' / 'alex123'
+    data_path.mkdir(parents=True)
+    hdf_path = data_path / 'alex123_db.h5'
+    mmap_path = data_path / 'alex123_mmap'
+    shutil.copy(alex123_hdf_path, hdf_path)
+    Alex123DBConnectorMmap.build(hdf_path, mmap_path)
+
+    with patch('lipidlibrarian.api.Alex123API.files', return_value=tmp_path):
+        assert Alex123DBConnectorMmap.is_up_to_date(mmap_path, hdf_path)
+        connector = Alex123API().database_connector
+        assert isinstance(connector, Alex123DBConnectorMmap)
+        assert not isinstance(connector, Alex123DBConnectorHDF)
+
+        # a rebuilt HDF database is used instead of the outdated export
+        stat = hdf_path.stat()
+        os.utime(hdf_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        assert not Alex123DBConnectorMmap.is_up_to_date(mmap_path, hdf_path)
+        assert isinstance(Alex123API().database_connector, Alex123DBConnectorIndexed)
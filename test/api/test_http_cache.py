@@ -0,0 +1,58 @@
+import time
+from unittest.mock import patch
+
+import pytest
+
+from lipidlibrarian.api import set_http_cache
+from lipidlibrarian.api.HTTPCache import HTTPCache
+from lipidlibrarian.api.LipidAPI import LipidAPI
+
+
+@pytest.fixture
+def http_cache(tmp_path):
+    cache = HTTPCache(str(tmp_path / "http_cache.sqlite"))
+    yield cache
+    set_http_cache(None)
+
+
+def test_http_cache_round_trip(http_cache, make_response):
+    http_cache.set("SwissLipidsAPI", "https://www.swisslipids.org/api/index.php/search?term=PC&b=1", make_response("[1]"))
+
+    # equivalent urls share one entry, namespaces are separated
+    response = http_cache.get("SwissLipidsAPI", "HTTPS://www.SwissLipids.org/api/index.php/search?b=1&term=PC")
+    assert response.status_code == 200
+    assert response.text == "[1]"
+    assert response.headers["content-type"] == "application/json"
+    assert http_cache.get("LipidMapsAPI", "https://www.swisslipids.org/api/index.php/search?term=PC&b=1") is None
+
+
+def test_http_cache_expires_and_evicts(tmp_path, make_response):
+    http_cache = HTTPCache(str(tmp_path / "http_cache.sqlite"), ttl=60, max_size=10)
+    http_cache.set("api", "https://example.org/a", make_response("aaaaa"))
+    http_cache.set("api", "https://example.org/b", make_response("bbbbb"))
+    # a is now more recently used than b
+    assert http_cache.get("api", "https://example.org/a") is not None
+    http_cache.set("api", "https://example.org/c", make_response("ccccc"))
+
+    assert http_cache.get("api", "https://example.org/b") is None
+    assert http_cache.get("api", "https://example.org/a") is not None
+    assert len(http_cache) == 2
+
+    with patch("lipidlibrarian.api.HTTPCache.time.time", return_value=time.time() + 120):
+        assert http_cache.get("api", "https://example.org/a") is None
+
+
+def test_execute_http_query_uses_cache(http_cache, make_response):
+    set_http_cache(http_cache)
+    api = LipidAPI()
+
+    with patch.object(LipidAPI, "_send_http_query", return_value=make_response("{}")) as send:
+        assert api.execute_http_query("https://example.org/x").text == "{}"
+        assert api.execute_http_query("https://example.org/x").text == "{}"
+        assert send.call_count == 1
+
+    http_cache.offline = True
+    with patch.object(LipidAPI, "_send_http_query") as send:
+        assert api.execute_http_query("https://example.org/x").status_code == 200
+        assert api.execute_http_query("https://example.org/y").status_code == 503
+        send.assert_not_called()
@@ -0,0 +1,322 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+import requests
+
+from lipidlibrarian.api.AsyncHTTPTransport import AsyncHTTPTransport
+from lipidlibrarian.api.LipidAPI import LipidAPI
+from lipidlibrarian.api.LipidMapsAPI import LipidMapsAPI
+from lipidlibrarian.api.RateLimiter import RateLimiter
+from lipidlibrarian.api.RetryPolicy import RetryPolicy
+from lipidlibrarian.api.SingleFlight import SingleFlight
+from lipidlibrarian.api.SwissLipidsAPI import SwissLipidsAPI
+from lipidlibrarian.lipid import get_adducts
+from lipidlibrarian.lipid.Nomenclature import Level
+
+
+def test_map_http_queries_keeps_order_and_limits_hosts(make_response):
+    api = LipidAPI()
+    lock = threading.Lock()
+    active = {'current': 0, 'max': 0}
+
+    def get(url, timeout):
+        with lock:
+            active['current'] += 1
+            active['max'] = max(active['max'], active['current'])
+        time.sleep(0.01)
+        with lock:
+            active['current'] -= 1
+        return make_response(url)
+
+    urls = [f"https://example.org/{i}" for i in range(20)]
+    with patch.object(LipidAPI, "MAX_CONNECTIONS_PER_HOST", 2), patch.dict(LipidAPI._host_semaphores, clear=True), \
+            patch.object(LipidAPI, "rate_limiter", None), patch.object(api.session, "get", side_effect=get):
+        responses = api.map_http_queries(urls)
+
+    assert [response.text for response in responses] == urls
+    assert 1 < active['max'] <= 2
+
+
+def test_get_entry_fetches_entities_concurrently(tmp_path, make_response):
+    api = SwissLipidsAPI(mirror_path=str(tmp_path / "missing.sqlite"))
+    barrier = threading.Barrier(3, timeout=5)
+
+    def execute_http_query(url):
+        # only returns if all three entities are requested at the same time
+        barrier.wait()
+        identifier = url.rsplit('/', 1)[1]
+        return make_response(f'{{"entity_id": "{identifier}", "entity_name": "PC 3{identifier[-1]}:1", "xrefs": []}}')
+
+    identifiers = ['SLM:000000001', 'SLM:000000002', '-', 'SLM:000000003']
+    with patch.object(LipidAPI, "execute_http_query", side_effect=execute_http_query):
+        lipids = api.get_entry(identifiers)
+
+    assert [lipid.get_database_identifiers('swisslipids')[0].identifier for lipid in lipids] == [
+        'SLM:000000001', 'SLM:000000002', 'SLM:000000003'
+    ]
+
+
+SWISSLIPIDS_RESPONSES = {
+    "https://www.swisslipids.org/api/index.php/search?term=PC(18:1/20:0)": (
+        '[{"entity_id": "SLM:000000002", "classification_level": "Structural subspecies"},'
+        ' {"entity_id": "SLM:000000001", "classification_level": "Species"}]'
+    ),
+    "https://www.swisslipids.org/api/index.php/entity/SLM:000000002": (
+        '{"entity_id": "SLM:000000002", "entity_name": "PC(18:1/20:0)", "xrefs": []}'
+    ),
+}
+
+
+def test_async_queries_match_sync_queries(tmp_path, make_response):
+    api = SwissLipidsAPI(mirror_path=str(tmp_path / "missing.sqlite"))
+
+    def response(url):
+        if url in SWISSLIPIDS_RESPONSES:
+            return make_response(SWISSLIPIDS_RESPONSES[url])
+        return make_response('', 404)
+
+    async def execute_http_query_async(url):
+        return response(url)
+
+    with patch.object(LipidAPI, "execute_http_query", side_effect=response):
+        expected = [api.query_name("PC(18:1/20:0)", Level.structural_lipid_species), api.query_id("SLM:000000002")]
+    with patch.object(LipidAPI, "execute_http_query_async", side_effect=execute_http_query_async):
+        results = [
+            api.async_transport.run(api.query_name_async("PC(18:1/20:0)", Level.structural_lipid_species)),
+            api.async_transport.run(api.query_id_async("SLM:000000002")),
+        ]
+
+    assert all(expected)
+    assert [[lipid.nomenclature.get_name() for lipid in lipids] for lipids in results] == \
+        [[lipid.nomenclature.get_name() for lipid in lipids] for lipids in expected]
+
+
+def test_query_all_runs_queries_concurrently(tmp_path, make_response):
+    api = LipidMapsAPI(mirror_path=str(tmp_path / "missing.sqlite"))
+    requested = []
+
+    async def execute_http_query_async(url):
+        requested.append(url)
+        # only returns once all moverz requests of all queries have been sent
+        while len(requested) < 4:
+            await asyncio.sleep(0.001)
+        return make_response('', 404)
+
+    with patch.object(LipidAPI, "execute_http_query_async", side_effect=execute_http_query_async):
+        results = api.query_all([(816.6477, 0.01, get_adducts(['+H+', '+Na+'])), (838.63, 0.01, get_adducts(['+H+', '+Na+']))])
+
+    assert results == [[], []]
+    assert len(requested) == 4
+
+
+def test_async_transport_fetches_responses():
+    httpx = pytest.importorskip("httpx")
+    transport = AsyncHTTPTransport(headers={'User-Agent': 'test'})
+    transport._client = httpx.AsyncClient(transport=httpx.MockTransport(
+        lambda request: httpx.Response(200, json={'agent': request.headers['User-Agent']})
+        if request.url.path == '/ok' else httpx.Response(503)
+    ), headers=transport.headers)
+
+    async def fetch_all():
+        return await asyncio.gather(transport.fetch("https://example.org/ok"), transport.fetch("https://example.org/no"))
+
+    # fetch may also be awaited from other event loops
+    ok, unavailable = asyncio.run(fetch_all())
+    transport.close()
+
+    assert ok.status_code == 200
+    assert ok.json() == {'agent': 'test'}
+    assert unavailable.status_code == 503
+    assert transport.requests == 2
+
+
+def test_rate_limiter_throttles_each_host():
+    rate_limiter = RateLimiter(requests_per_second=10, burst=2)
+
+    with patch("lipidlibrarian.api.RateLimiter.time.monotonic", return_value=100.0):
+        delays = [rate_limiter.reserve("https://www.swisslipids.org/api/index.php/entity/1") for _ in range(4)]
+        assert rate_limiter.reserve("https://www.lipidmaps.org/rest/compound") == 0
+    with patch("lipidlibrarian.api.RateLimiter.time.monotonic", return_value=101.0):
+        assert rate_limiter.reserve("https://www.swisslipids.org/api/index.php/entity/1") == 0
+
+    assert delays == pytest.approx([0, 0, 0.1, 0.2])
+    assert rate_limiter.throttled == 2
+    assert rate_limiter.throttled_seconds == pytest.approx(0.3)
+
+
+def test_retry_policy_retries_throttled_failed_and_timed_out_requests(make_response):
+    api = LipidAPI()
+    retry_policy = RetryPolicy(max_retries=4)
+    throttled = make_response('', 429)
+    throttled.headers['Retry-After'] = '2'
+    responses = [throttled, requests.Timeout(), requests.ConnectionError(), make_response('', 502), make_response('{}')]
+
+    with patch.object(LipidAPI, "retry_policy", retry_policy), patch.object(LipidAPI, "rate_limiter", None), \
+            patch.object(api.session, "get", side_effect=responses), \
+            patch("lipidlibrarian.api.LipidAPI.time.sleep") as sleep:
+        assert api.execute_http_query("https://example.org/x").text == '{}'
+
+    assert retry_policy.retries == 4
+    assert sleep.call_args_list[0].args[0] == pytest.approx(2)
+    assert all(0 <= call.args[0] <= 0.5 * 2 ** attempt for attempt, call in enumerate(sleep.call_args_list) if attempt > 0)
+
+
+def test_retry_policy_gives_up(make_response):
+    api = LipidAPI()
+    retry_policy = RetryPolicy(max_retries=2)
+
+    with patch.object(LipidAPI, "retry_policy", retry_policy), patch.object(LipidAPI, "rate_limiter", None), \
+            patch("lipidlibrarian.api.LipidAPI.time.sleep"):
+        with patch.object(api.session, "get", side_effect=requests.Timeout()) as get:
+            assert api.execute_http_query("https://example.org/x").status_code == 503
+            assert get.call_count == 3
+        with patch.object(api.session, "get", side_effect=requests.ConnectionError()) as get:
+            assert api.execute_http_query("https://example.org/x").status_code == 503
+            assert get.call_count == 3
+        # requests which cannot be sent at all, e.g. because of an invalid url, are not retried
+        with patch.object(api.session, "get", side_effect=requests.exceptions.InvalidURL()) as get:
+            assert api.execute_http_query("https://example.org/x").status_code == 503
+            assert get.call_count == 1
+        # neither are client errors
+        with patch.object(api.session, "get", return_value=make_response('', 404)) as get:
+            assert api.execute_http_query("https://example.org/x").status_code == 404
+            assert get.call_count == 1
+
+    assert retry_policy.retries == 4
+    assert retry_policy.exhausted == 2
+
+
+def test_async_queries_retry_failed_connections():
+    httpx = pytest.importorskip("httpx")
+    api = LipidAPI()
+    retry_policy = RetryPolicy(max_retries=2, backoff=0.001)
+    transport = AsyncHTTPTransport()
+    failures = {'/reset': 1, '/down': 3}
+
+    def handle(request):
+        if failures.get(request.url.path, 0) > 0:
+            failures[request.url.path] -= 1
+            raise httpx.ConnectError("connection reset", request=request)
+        return httpx.Response(200, text=request.url.path)
+
+    transport._client = httpx.AsyncClient(transport=httpx.MockTransport(handle))
+
+    async def query():
+        return await asyncio.gather(api.execute_http_query_async("https://example.org/reset"),
+                                    api.execute_http_query_async("https://example.org/down"))
+
+    with patch.object(LipidAPI, "retry_policy", retry_policy), patch.object(LipidAPI, "rate_limiter", None), \
+            patch.object(LipidAPI, "_async_transport", transport):
+        reset, down = asyncio.run(query())
+    transport.close()
+
+    assert reset.text == '/reset'
+    assert down.status_code == 503
+    assert transport.requests == 5
+    assert retry_policy.retries == 3
+    assert retry_policy.exhausted == 1
+
+
+def test_single_flight_coalesces_identical_requests(make_response):
+    api = LipidAPI()
+    single_flight = SingleFlight()
+    release = threading.Event()
+
+    def send_http_query(url, timeout):
+        release.wait(5)
+        return make_response(url)
+
+    with patch.object(LipidAPI, "single_flight", single_flight), \
+            patch.object(LipidAPI, "_send_http_query", side_effect=send_http_query) as send:
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            futures = [executor.submit(api.execute_http_query, f"https://example.org/{i % 2}") for i in range(4)]
+            while single_flight.coalesced < 2:
+                time.sleep(0.001)
+            release.set()
+            texts = [future.result().text for future in futures]
+
+        # requests which are not in flight anymore are sent again
+        api.execute_http_query("https://example.org/0")
+
+    assert texts == ["https://example.org/0", "https://example.org/1"] * 2
+    assert send.call_count == 3
+    assert len(single_flight) == 0
+
+
+def test_single_flight_coalesces_identical_async_requests(make_response):
+    api = LipidAPI()
+    single_flight = SingleFlight()
+    fetched = []
+
+    async def fetch(url, timeout):
+        fetched.append(url)
+        await asyncio.sleep(0.01)
+        if url.endswith('fail'):
+            raise ValueError(url)
+        return make_response(url)
+
+    async def query():
+        return await asyncio.gather(
+            *(api.execute_http_query_async("https://example.org/x") for _ in range(3)),
+            *(api.execute_http_query_async("https://example.org/fail") for _ in range(2)),
+            return_exceptions=True
+        )
+
+    with patch.object(LipidAPI, "single_flight", single_flight), patch.object(LipidAPI, "rate_limiter", None), \
+            patch.object(api.async_transport, "fetch", side_effect=fetch):
+        responses = asyncio.run(query())
+
+    assert [response.text for response in responses[:3]] == ["https://example.org/x"] * 3
+    assert all(isinstance(response, ValueError) for response in responses[3:])
+    assert fetched == ["https://example.org/x", "https://example.org/fail"]
+    assert single_flight.coalesced == 3
+
+
+def test_moverz_queries_adducts_concurrently(tmp_path, make_response):
+    api = LipidMapsAPI(mirror_path=str(tmp_path / "missing.sqlite"))
+    adducts = get_adducts(['+H+', '+Na+', '+NH4+'])
+    barrier = threading.Barrier(len(adducts), timeout=5)
+    rows = {
+        'M+H': "816.6477\t816.6477\t0.0000\tPC 38:1\tC46H90NO8P\t[M+H]+",
+        'M+Na': "816.6477\t816.6432\t0.0045\tPE 40:4\tC45H78NO8P\t[M+Na]+",
+    }
+
+    def execute_http_query(url):
+        # only returns if all adducts are requested at the same time
+        barrier.wait()
+        adduct_name = url.split('/')[-3]
+        if adduct_name not in rows:
+            return make_response("Internal error: no matches")
+        return make_response(f"<pre>\nInput Mass\tMatched m/z\tDelta\tName\tFormula\tIon\n{rows[adduct_name]}\n</pre>")
+
+    with patch.object(LipidAPI, "execute_http_query", side_effect=execute_http_query):
+        lipids = api.query_mz(816.6477, 0.01, adducts)
+
+    assert [(lipid.nomenclature.get_name(), lipid.adducts[0].name) for lipid in lipids] == [
+        ('PC 38:1', '+H+'), ('PE 40:4', '+Na+')
+    ]
+
+
+@pytest.mark.parametrize("api_class", [SwissLipidsAPI, LipidMapsAPI])
+def test_async_mirror_queries_run_off_the_event_loop(tmp_path, api_class):
+    api = api_class(str(tmp_path / "missing_mirror.sqlite"))
+    api.mirror = object()
+    threads = {}
+
+    def query_id(identifier):
+        threads['query'] = threading.get_ident()
+        return []
+
+    async def query():
+        threads['loop'] = threading.get_ident()
+        return await api.query_id_async('SLM:000000001')
+
+    with patch.object(api, 'query_id', side_effect=query_id):
+        assert api.async_transport.run(query()) == []
+
+    # the shared event loop keeps serving the requests of other queries meanwhile
+    assert threads['query'] != threads['loop']
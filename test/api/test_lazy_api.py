@@ -0,0 +1,49 @@
+import threading
+import time
+
+from lipidlibrarian.api import warm_up_APIs
+from lipidlibrarian.api.LazyAPI import LazyAPI
+from lipidlibrarian.api.LipidAPI import LipidAPI
+
+
+class _SlowAPI(LipidAPI):
+    """
+    Stand-in for an API with an expensive initialization.
+    """
+    instances = 0
+
+    def __init__(self, name: str):
+        super().__init__()
+        with self._timed('load'):
+            time.sleep(0.05)
+        self.name = name
+        _SlowAPI.instances += 1
+
+
+def test_lazy_api_is_constructed_once_on_first_use():
+    _SlowAPI.instances = 0
+    api = LazyAPI(_SlowAPI, 'slow')
+    assert not api.initialized
+    assert _SlowAPI.instances == 0
+
+    threads = [threading.Thread(target=lambda: api.query_id('LMGP01010000')) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert api.initialized
+    assert _SlowAPI.instances == 1
+    assert api.name == 'slow'
+    assert api.init_timings['load'] >= 0.05
+    assert api.init_timings['total'] >= api.init_timings['load']
+
+
+def test_warm_up_constructs_apis_in_the_background():
+    _SlowAPI.instances = 0
+    apis = [LazyAPI(_SlowAPI, 'first'), LazyAPI(_SlowAPI, 'second')]
+
+    warm_up_APIs(apis).join()
+
+    assert all(api.initialized for api in apis)
+    assert _SlowAPI.instances == 2
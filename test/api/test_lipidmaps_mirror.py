@@ -0,0 +1,145 @@
+from unittest.mock import patch
+
+import pytest
+
+from lipidlibrarian.api.LipidAPI import LipidAPI
+from lipidlibrarian.api.LipidMapsAPI import LipidMapsAPI
+from lipidlibrarian.api.LipidMapsAPI import LipidMapsMirror
+from lipidlibrarian.lipid import get_adducts
+from lipidlibrarian.lipid.Nomenclature import Level
+
+
+STRUCTURES_SDF = """LMGP01011234
+  LIPDMAPS
+
+  0  0  0  0  0  0  0  0  0  0999 V2000
+M  END
+> <LM_ID>
+LMGP01011234
+
+> <NAME>
+PC 18:1_20:0
+
+> <SYSTEMATIC_NAME>
+1-octadecenoyl-2-eicosanoyl-glycero-3-phosphocholine
+
+> <CATEGORY>
+Glycerophospholipids [GP]
+
+> <MAIN_CLASS>
+Glycerophosphocholines [GP01]
+
+> <EXACT_MASS>
+815.6404
+
+> <FORMULA>
+C46H90NO8P
+
+> <ABBREVIATION>
+PC 38:1
+
+> <SYNONYMS>
+PC(18:1_20:0); GPCho(38:1)
+
+> <HMDB_ID>
+HMDB0000001
+
+> <PUBCHEM_CID>
+-
+
+$$$$
+LMFA01010001
+  LIPDMAPS
+
+  0  0  0  0  0  0  0  0  0  0999 V2000
+M  END
+> <LM_ID>
+LMFA01010001
+
+> <NAME>
+FA 2:0
+
+> <CATEGORY>
+Fatty Acyls [FA]
+
+> <EXACT_MASS>
+60.0211
+
+> <FORMULA>
+C2H4O2
+
+$$$$
+"""
+
+
+def _content(lipid):
+    return (
+        lipid.nomenclature.to_dict(),
+        [mass.to_dict() for mass in lipid.masses],
+        [database_identifier.to_dict() for database_identifier in lipid.database_identifiers],
+    )
+
+
+@pytest.fixture
+def api(tmp_path):
+    export_path = tmp_path / "structures.sdf"
+    export_path.write_text(STRUCTURES_SDF)
+    mirror_path = tmp_path / "lipidmaps_mirror.sqlite"
+    LipidMapsMirror.build(str(export_path), str(mirror_path), chunksize=1)
+
+    with patch.object(LipidAPI, "execute_http_query", side_effect=AssertionError("REST API used")):
+        yield LipidMapsAPI(str(mirror_path))
+
+
+def test_query_id_matches_compound_rest_api(api):
+    lipids = api.query_id("LMGP01011234")
+    expected = LipidMapsAPI._convert_compound_rest_api_lipids([{
+        'lm_id': 'LMGP01011234',
+        'name': 'PC 18:1_20:0',
+        'sys_name': '1-octadecenoyl-2-eicosanoyl-glycero-3-phosphocholine',
+        'abbrev': 'PC 38:1',
+        'core': 'Glycerophospholipids [GP]',
+        'main_class': 'Glycerophosphocholines [GP01]',
+        'exactmass': '815.6404',
+        'formula': 'C46H90NO8P',
+        'synonyms': 'PC(18:1_20:0); GPCho(38:1)',
+        'hmdb_id': 'HMDB0000001',
+    }])
+
+    assert [_content(lipid) for lipid in lipids] == [_content(lipid) for lipid in expected]
+
+
+def test_query_xref(api):
+    assert [lipid.nomenclature.get_name() for lipid in api.query_id("HMDB0000001")] == ['PC 18:1_20:0']
+
+
+def test_query_name(api):
+    lipids = api.query_name("pc(18:1_20:0)", Level.structural_lipid_species)
+
+    assert [lipid.nomenclature.get_name() for lipid in lipids] == ['PC 18:1_20:0']
+    assert api.query_name("PC 18:1_20:0", Level.sum_lipid_species) == []
+
+
+def test_query_mz(api):
+    lipids = api.query_mz(816.6477, 0.001, get_adducts(['+H+', '-H+']))
+
+    assert [lipid.nomenclature.get_name() for lipid in lipids] == ['PC 18:1_20:0']
+    assert [adduct.name for adduct in lipids[0].adducts] == ['+H+']
+    assert lipids[0].adducts[0].masses[0].value == pytest.approx(816.6477, abs=1e-4)
+    assert api.query_mz(816.6477, 0.00001, get_adducts(['+H+'])) == []
+
+
+def test_mirror_binds_a_bounded_number_of_variables(api):
+    with patch.object(LipidMapsMirror, "MAX_VARIABLES", 1):
+        entries = api.mirror.get_entries(['LMGP01011234', 'not in the mirror', 'LMFA01010001'])
+        assert [entry['lm_id'] for entry in entries] == ['LMGP01011234', 'LMFA01010001']
+
+        # a tolerance which covers every compound of the mirror
+        lipids = api.query_mz(500.0, 1000.0, get_adducts(['+H+']))
+        assert sorted(lipid.nomenclature.get_name() for lipid in lipids) == ['FA 2:0', 'PC 18:1_20:0']
+
+
+@pytest.mark.parametrize("mirror_path", ['', 'missing_mirror.sqlite', '.'])
+def test_missing_mirror_uses_rest_api(mirror_path):
+    # an empty path resolves to the working directory, which must not be opened as the mirror
+    assert LipidMapsAPI(mirror_path).mirror is None
@@ -0,0 +1,81 @@
+from unittest.mock import patch
+
+import pytest
+
+from lipidlibrarian.api.LipidAPI import LipidAPI
+from lipidlibrarian.api.SwissLipidsAPI import SwissLipidsAPI
+from lipidlibrarian.api.SwissLipidsAPI import SwissLipidsMirror
+from lipidlibrarian.lipid import new_adduct
+from lipidlibrarian.lipid.Nomenclature import Level
+
+
+LIPIDS_TSV = (
+    "Lipid ID\tLevel\tName\tAbbreviation*\tSynonyms*\tLipid class*\tParent\tComponents*\t"
+    "SMILES (pH7.3)\tInChI (pH7.3)\tInChI key (pH7.3)\tFormula (pH7.3)\tCharge (pH7.3)\tMass (pH7.3)\t"
+    "Exact Mass (neutral form)\tExact m/z of [M.]+\tExact m/z of [M+H]+\tExact m/z of [M+K]+\t"
+    "Exact m/z of [M+Na]+\tExact m/z of [M+Li]+\tExact m/z of [M+NH4]+\tExact m/z of [M-H]-\t"
+    "Exact m/z of [M+Cl]-\tExact m/z of [M+OAc]-\tCHEBI\tLIPID MAPS\tHMDB\tMetaNetX\tPMID\n"
+    "SLM:000000001\tSpecies\tphosphatidylcholine 38:1\tPC(38:1)\tPC 38:1 | PC(38:1)\tSLM:000000002\t\t\t"
+    "\t\t\tC46H90NO8P\t0\t816.19\t815.6404\t815.6399\t816.6477\t854.6036\t838.6296\t822.6559\t833.6742\t"
+    "\t\t\t\t\tHMDB0000001\t\t\n"
+    "SLM:000487065\tStructural subspecies\tphosphatidylcholine (18:1/20:0)\tPC(18:1/20:0)\t\tSLM:000000002\t"
+    "SLM:000000001\t\t\t\t\tC46H90NO8P\t0\t816.19\t815.6404\t815.6399\t816.6477\t854.6036\t838.6296\t"
+    "822.6559\t833.6742\t\t\t\t\tLMGP01011234\t\t\t\n"
+)
+
+
+@pytest.fixture
+def api(tmp_path):
+    tsv_path = tmp_path / "lipids.tsv"
+    tsv_path.write_text(LIPIDS_TSV)
+    mirror_path = tmp_path / "swisslipids_mirror.sqlite"
+    SwissLipidsMirror.build(str(tsv_path), str(mirror_path), chunksize=1)
+
+    with patch.object(LipidAPI, "execute_http_query", side_effect=AssertionError("REST API used")):
+        yield SwissLipidsAPI(str(mirror_path))
+
+
+def test_mirror_contains_all_entities(api):
+    assert len(api.mirror) == 2
+
+
+def test_query_id(api):
+    lipids = api.query_id("SLM:000487065")
+
+    assert [lipid.nomenclature.get_name() for lipid in lipids] == ['PC 18:1/20:0']
+    assert {(identifier.database, identifier.identifier) for identifier in lipids[0].database_identifiers} == {
+        ('swisslipids', 'SLM:000487065'), ('lipidmaps', 'LMGP01011234')
+    }
+    assert [adduct.name for adduct in lipids[0].adducts if adduct.name == '+H+']
+
+
+def test_query_xref(api):
+    lipids = api.query_id("LMGP01011234")
+
+    assert [lipid.nomenclature.get_name() for lipid in lipids] == ['PC 18:1/20:0']
+
+
+def test_query_name(api):
+    lipids = api.query_name("PC(18:1/20:0)", Level.structural_lipid_species)
+
+    assert [lipid.nomenclature.get_name() for lipid in lipids] == ['PC 18:1/20:0']
+
+
+def test_query_mz(api):
+    lipids = api.query_mz(816.648, 0.001, [new_adduct('+H+')])
+
+    assert sorted(lipid.nomenclature.get_name() for lipid in lipids) == ['PC 18:1/20:0', 'PC 38:1']
+    assert api.query_mz(816.648, 0.0001, [new_adduct('+H+')]) == []
+
+
+def test_mirror_binds_a_bounded_number_of_variables(api):
+    with patch.object(SwissLipidsMirror, "MAX_VARIABLES", 1):
+        entries = api.mirror.get_entries(['SLM:000000001', 'not in the mirror', 'SLM:000487065', 'SLM:000000001'])
+
+    assert sorted(entries) == ['SLM:000000001', 'SLM:000487065']
+
+
+@pytest.mark.parametrize("mirror_path", ['', 'missing_mirror.sqlite', '.'])
+def test_missing_mirror_uses_rest_api(mirror_path):
+    # an empty path resolves to the working directory, which must not be opened as the mirror
+    assert SwissLipidsAPI(mirror_path).mirror is None
@@ -1,4 +1,17 @@
+from unittest.mock import patch
+
 import pytest
+from requests.models import Response
+
+from lipidlibrarian.api import _API_CACHE
+from lipidlibrarian.lipid import new_adduct
+from lipidlibrarian.lipid.DatabaseIdentifier import DatabaseIdentifier
+from lipidlibrarian.lipid.Fragment import Fragment
+from lipidlibrarian.lipid.Lipid import Lipid
+from lipidlibrarian.lipid.Mass import Mass
+from lipidlibrarian.lipid.Reaction import Reaction
+from lipidlibrarian.lipid.Source import intern_source
+from lipidlibrarian.lipid.Synonym import Synonym
 
 
 def pytest_addoption(parser):
@@ -17,3 +30,80 @@ def pytest_addoption(parser):
     group.addoption("--alex123-sql-user", type=str, default="alex123")
     group.addoption("--alex123-sql-password", type=str, default="alex123")
     group.addoption("--alex123-sql-database", type=str, default="alex123")
+
+
+class _LionAPI:
+    """
+    Stand-in for the LION API, which returns a fixed subgraph for the ontology terms.
+    """
+
+    def get_lion_subgraph_edgelist(self, ontology_terms):
+        return [('LION:0000000', ontology_term) for ontology_term in sorted(ontology_terms)]
+
+    def get_lion_node_data(self, ontology_terms):
+        return {ontology_term: {'name': ontology_term} for ontology_term in sorted(ontology_terms)}
+
+
+def _make_lipid(name: str) -> Lipid:
+    lipid = Lipid()
+    lipid.nomenclature.name = name
+    source = intern_source(lipid.nomenclature.get_name(), lipid.nomenclature.level, 'test')
+    lipid.add_log_message((0, 'query', name))
+    lipid.nomenclature.add_synonym(Synonym.from_data(name, 'abbreviation', source))
+    lipid.add_database_identifier(DatabaseIdentifier.from_data('alex123', name, source))
+    lipid.add_mass(Mass.from_data('neutral mass', 787.6, source))
+    lipid.ontology.ontology_terms.update({'LION:0000002', 'LION:0000001'})
+    lipid.ontology.add_source(source)
+
+    reaction = Reaction()
+    reaction.substrates = {'PC'}
+    reaction.products = {'LPC', 'FA'}
+    reaction.gene_names = {('PLA2G4A', frozenset({'P47712'}))}
+    reaction.add_database_identifier(DatabaseIdentifier.from_data('rhea', 'RHEA:15801', source))
+    lipid.add_reaction(reaction)
+
+    for adduct_name, mass in [('+H+', 788.6), ('+Na+', 810.6)]:
+        adduct = new_adduct(adduct_name)
+        adduct.add_mass(Mass.from_data('monoisotopic mass', mass, source))
+        lipid.add_adduct(adduct)
+    fragment = Fragment()
+    fragment.name = 'PC headgroup'
+    fragment.sum_formula = 'C5H15NO4P'
+    fragment.add_mass(Mass.from_data('monoisotopic mass', 184.07, source))
+    lipid.adducts[0].add_fragment(fragment)
+    return lipid
+
+
+def _make_response(text: str, status_code: int = 200) -> Response:
+    response = Response()
+    response.status_code = status_code
+    response._content = text.encode("utf-8")
+    response.encoding = "utf-8"
+    response.headers["Content-Type"] = "application/json"
+    return response
+
+
+@pytest.fixture
+def make_lipid():
+    """
+    Factory for a lipid of the given name with masses, identifiers, adducts, fragments, ontology
+    terms and reactions.
+    """
+    return _make_lipid
+
+
+@pytest.fixture
+def make_response():
+    """
+    Factory for a requests Response with the given body and status code.
+    """
+    return _make_response
+
+
+@pytest.fixture
+def lion_api():
+    """
+    Replace the LION API, so serializing lipids does not load the ontology.
+    """
+    with patch.dict(_API_CACHE, {'lion': _LionAPI()}):
+        yield
@@ -0,0 +1,242 @@
+import copy
+import json
+import os
+import threading
+import time
+from unittest.mock import patch
+
+import jsons
+import numpy as np
+import pytest
+from pygoslin.domain.LipidLevel import LipidLevel
+
+import lipidlibrarian.lipid
+import lipidlibrarian.lipid.Lipid
+
+from lipidlibrarian.lipid import clear_conversion_cache
+from lipidlibrarian.lipid import conversion_cache_info
+from lipidlibrarian.lipid import get_adduct
+from lipidlibrarian.lipid import goslin_convert
+from lipidlibrarian.lipid import goslin_get_lipid
+from lipidlibrarian.lipid import lynx_convert
+from lipidlibrarian.lipid import new_adduct
+from lipidlibrarian.lipid.Lipid import Lipid
+from lipidlibrarian.lipid.Level import Level
+from lipidlibrarian.lipid.Mass import Mass
+from lipidlibrarian.lipid.Source import NO_SOURCES
+from lipidlibrarian.lipid.Source import Source
+from lipidlibrarian.lipid.Source import intern_source
+from lipidlibrarian.lipid.Synonym import Synonym
+
+
+def test_goslin_conversions_share_one_parse():
+    clear_conversion_cache()
+
+    levels = [LipidLevel.CATEGORY, LipidLevel.CLASS, LipidLevel.SPECIES, LipidLevel.MOLECULAR_SPECIES]
+    results = [goslin_convert('PC 18:1(9Z)/20:0', level=level) for level in levels]
+    assert results == ['GP', 'PC', 'PC 38:1', 'PC 18:1_20:0']
+    assert [goslin_convert('PC 18:1(9Z)/20:0', level=level) for level in levels] == results
+
+    cache_info = conversion_cache_info()
+    assert cache_info['goslin_parse'].misses == 1
+    assert cache_info['goslin_convert'].misses == len(levels)
+    assert cache_info['goslin_convert'].hits == len(levels)
+
+
+def test_goslin_convert_invalid_name():
+    assert goslin_convert('not a lipid') is None
+    assert goslin_convert(None) is None
+
+
+class _SlowParser:
+    """
+    Stand-in for the Goslin parser that hangs on one lipid name.
+    """
+    slow_names = {'slow'}
+
+    def __init__(self):
+        self.iterations = 0
+
+    def parse(self, lipid_name: str):
+        while lipid_name in self.slow_names:
+            self.iterations += 1
+        return lipid_name
+
+
+class _SlowConverter:
+    """
+    Stand-in for the LipidLynxX converter that keeps changing the working directory.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.iterations = 0
+
+    def convert(self, lipid_name: str, level: str):
+        while True:
+            os.chdir(self.directory)
+            self.iterations += 1
+
+
+def test_goslin_parse_times_out_and_recovers():
+    clear_conversion_cache()
+    threads = threading.active_count()
+    parsers = []
+
+    def new_parser():
+        parsers.append(_SlowParser())
+        return parsers[-1]
+
+    with patch.object(lipidlibrarian.lipid, 'goslin_converter', None), \
+            patch.object(lipidlibrarian.lipid, 'goslin_worker', None), \
+            patch.object(lipidlibrarian.lipid, 'goslin_init', new_parser), \
+            patch.object(lipidlibrarian.lipid, 'TIMEOUT_SECONDS', 0.1):
+        assert goslin_get_lipid('fast') == 'fast'
+        assert goslin_get_lipid('other') == 'other'
+        assert goslin_get_lipid('slow') is None
+
+        # the timed out parse was stopped
+        iterations = parsers[0].iterations
+        time.sleep(0.1)
+        assert parsers[0].iterations == iterations
+
+        assert goslin_get_lipid('after') == 'after'
+        # the timeout is not cached, so the name is parsed again once the parser is fast enough
+        with patch.object(_SlowParser, 'slow_names', set()):
+            assert goslin_get_lipid('slow') == 'slow'
+
+    # The parser is replaced after the timeout, but one worker thread serves all parses.
+    assert len(parsers) == 2
+    assert threading.active_count() <= threads + 1
+    clear_conversion_cache()
+
+
+def test_lynx_convert_timeout_restores_working_directory(tmp_path):
+    clear_conversion_cache()
+    working_directory = os.getcwd()
+    converter = _SlowConverter(tmp_path)
+
+    with patch.object(lipidlibrarian.lipid, 'lipid_name_conversion_methods', {'lipidlynxx', 'goslin'}), \
+            patch.object(lipidlibrarian.lipid, 'lynx_converter', converter), \
+            patch.object(lipidlibrarian.lipid, 'lynx_worker', None), \
+            patch.object(lipidlibrarian.lipid, 'TIMEOUT_SECONDS', 0.1):
+        assert lynx_convert('slow') is None
+
+        # the timed out conversion was stopped and does not change the working directory anymore
+        iterations = converter.iterations
+        time.sleep(0.1)
+        assert converter.iterations == iterations
+        assert os.getcwd() == working_directory
+
+    clear_conversion_cache()
+
+
+def test_new_adduct_is_an_independent_copy():
+    adduct = new_adduct('[M+H]+')
+    assert adduct == get_adduct('+H+')
+    assert adduct is not get_adduct('+H+')
+    assert adduct.masses is not get_adduct('+H+').masses
+    assert new_adduct('unknown adduct') is None
+
+
+def test_keyed_collections_merge_like_a_scan():
+    lipid = Lipid()
+    for i in range(200):
+        source = Source(f'PC {i}:0', Level.sum_lipid_species, 'test')
+        lipid.add_mass(Mass.from_data('neutral mass', float(i % 50), source))
+        lipid.nomenclature.add_synonym(Synonym.from_data(f'synonym {i}', 'abbreviation', source))
+
+    assert [mass.value for mass in lipid.masses] == [float(i) for i in range(50)]
+    assert len(lipid.masses[0].sources) == 4
+    # synonyms of the same type are merged, as Synonym.merge compares either value or type
+    assert len(lipid.nomenclature.synonyms) == 1
+    assert len(lipid.nomenclature.synonyms[0].sources) == 200
+
+    lipid_copy = copy.deepcopy(lipid)
+    lipid_copy.masses.reverse()
+    lipid_copy.add_mass(Mass.from_data('neutral mass', 0.0, Source('copy', Level.sum_lipid_species, 'test')))
+
+    assert len(lipid_copy.masses) == 50
+    assert len(lipid_copy.masses[-1].sources) == 5
+    assert len(lipid.masses[0].sources) == 4
+
+
+def test_slotted_objects_share_empty_sources():
+    mass = Mass()
+    mass_copy = copy.deepcopy(mass)
+
+    assert not hasattr(mass, '__dict__')
+    assert mass.sources is NO_SOURCES
+    assert mass == mass_copy
+
+    mass_copy.add_source(Source('PC 38:1', Level.sum_lipid_species, 'test'))
+
+    assert mass.sources is NO_SOURCES
+    assert mass != mass_copy
+
+
+def test_interned_sources_are_shared_and_cached_per_lipid():
+    source = intern_source('PC 38:1', Level.sum_lipid_species, 'test')
+    other_source = intern_source('PC 38:1', Level.sum_lipid_species, 'other')
+
+    assert intern_source('PC 38:1', Level.sum_lipid_species, 'test') is source
+    assert copy.deepcopy(source) is source
+
+    lipid = Lipid()
+    lipid.add_mass(Mass.from_data('neutral mass', 1.0, source))
+    assert lipid.sources == {source}
+
+    # merging into an existing mass and appending a new mass both update the cached sources
+    lipid.add_mass(Mass.from_data('neutral mass', 1.0, other_source))
+    assert lipid.sources == {source, other_source}
+    lipid_copy = copy.deepcopy(lipid)
+    lipid_copy.masses.pop()
+    assert lipid_copy.sources == set()
+    assert lipid.sources == {source, other_source}
+
+
+def test_cached_sources_follow_changes_of_nested_objects():
+    source = intern_source('PC 38:1', Level.sum_lipid_species, 'test')
+    other_source = intern_source('PC 38:1', Level.sum_lipid_species, 'other')
+
+    lipid = Lipid()
+    lipid.add_adduct(new_adduct('+H+'))
+    assert lipid.sources == set()
+    assert lipid.sources is lipid.sources
+
+    lipid.adducts[0].add_mass(Mass.from_data('monoisotopic mass', 788.6, source))
+    assert lipid.sources == {source}
+
+    lipid.adducts[0].masses[0].add_source(other_source)
+    assert lipid.sources == {source, other_source}
+
+    lipid_copy = copy.deepcopy(lipid)
+    lipid_copy.adducts[0].masses.clear()
+    assert lipid_copy.sources == set()
+    assert lipid.sources == {source, other_source}
+    assert lipid_copy != lipid
+
+
+@pytest.mark.parametrize("name", ['PC 18:1(9Z)/20:0', 'PE 38:1', 'not a lipid'])
+def test_to_dict_matches_jsons(name, make_lipid, lion_api):
+    lipid = make_lipid(name)
+    # the cached sources are not part of the former jsons layout
+    legacy = jsons.dump(lipid, strip_attr=('_sources',))
+
+    assert json.dumps(lipid.to_dict()) == json.dumps(legacy)
+    assert format(lipid, 'json') == json.dumps(legacy, indent='\t')
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_to_json_matches_to_dict(use_orjson, make_lipid, lion_api):
+    lipid = make_lipid('PC 18:1(9Z)/20:0')
+    source = intern_source(lipid.nomenclature.get_name(), lipid.nomenclature.level, 'test')
+    lipid.add_mass(Mass.from_data('neutral mass', np.float32(787.5), source))
+    lipid.adducts[0].charge = np.int64(1)
+    orjson = lipidlibrarian.lipid.Lipid.orjson if use_orjson else None
+
+    with patch.object(lipidlibrarian.lipid.Lipid, 'orjson', orjson):
+        assert json.loads(lipid.to_json()) == json.loads(json.dumps(lipid.to_dict(), default=lambda obj: obj.item()))
+        assert json.loads(lipid.to_json(indent=True)) == json.loads(lipid.to_json())
+        assert '\n' not in lipid.to_json()
+        assert json.loads(format(lipid, 'json')) == json.loads(lipid.to_json())
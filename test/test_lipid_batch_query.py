@@ -0,0 +1,93 @@
+import gc
+import threading
+import weakref
+from unittest.mock import patch
+
+from lipidlibrarian.LipidBatchQuery import LipidBatchQuery
+from lipidlibrarian.LipidQuery import QueryScheduler
+from lipidlibrarian.lipid import get_adducts
+from lipidlibrarian.lipid.Lipid import Lipid
+
+
+class _CountingAPI:
+    """
+    Stand-in for an API that counts how often it is queried.
+    """
+
+    def __init__(self, names: list[str]):
+        self.names = names
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def query(self, query_parameters, cutoff: int = 0) -> list[Lipid]:
+        with self.lock:
+            self.calls += 1
+        if isinstance(query_parameters, Lipid):
+            return [query_parameters]
+        results = []
+        for name in self.names:
+            lipid = Lipid()
+            lipid.nomenclature.name = name
+            results.append(lipid)
+        return results
+
+
+def test_batch_query_shares_identical_queries():
+    apis = {
+        'swisslipids': _CountingAPI(['PC 38:1']),
+        'lipidmaps': _CountingAPI(['PE 38:1']),
+        'alex123': _CountingAPI([]),
+        'lipidlibrarian': _CountingAPI([]),
+        'linex': _CountingAPI([]),
+        'lion': _CountingAPI([]),
+    }
+    inputs = ["500.0;0.1;+H+", "600.0;0.1;+H+", "500.0;0.1;+H+"]
+
+    with patch("lipidlibrarian.LipidQuery.init_APIs", return_value=apis):
+        batch_query = LipidBatchQuery(inputs, method="mz", max_workers=3)
+        finished = list(batch_query.query())
+
+    assert sorted(lipid_query.input_string for lipid_query in finished) == sorted(inputs)
+    for lipid_query in finished:
+        assert [repr(l) for l in lipid_query.lipids] == ['PC 38:1', 'PE 38:1']
+    # the duplicate input does not query the database APIs again
+    assert apis['swisslipids'].calls == 2
+    assert apis['lipidmaps'].calls == 2
+    # annotation APIs modify their input and are never shared
+    assert apis['lion'].calls == 6
+    # every input receives its own lipid objects
+    assert finished[0].lipids[0] is not finished[1].lipids[0]
+
+
+def test_scheduler_evicts_finished_results():
+    api = _CountingAPI(['PC 38:1'])
+    scheduler = QueryScheduler(max_results=2)
+    adducts = get_adducts({'+H+'})
+
+    for mz in [500.0, 600.0, 700.0, 500.0]:
+        scheduler.query(api, 'swisslipids', (mz, 0.1, adducts))
+
+    # the results of 500.0 were evicted before they were asked for again
+    assert api.calls == 4
+    assert len(scheduler._results) == 2
+
+    scheduler.query(api, 'swisslipids', (500.0, 0.1, adducts))
+    assert api.calls == 4
+    assert scheduler.hits == 1
+
+
+def test_batch_query_releases_finished_queries():
+    apis = {api_name: _CountingAPI(['PC 38:1']) for api_name in
+            ['swisslipids', 'lipidmaps', 'alex123', 'lipidlibrarian', 'linex', 'lion']}
+    inputs = [f"{500.0 + i};0.1;+H+" for i in range(6)]
+
+    with patch("lipidlibrarian.LipidQuery.init_APIs", return_value=apis):
+        batch_query = LipidBatchQuery(inputs, method="mz", max_workers=2)
+        references = []
+        for lipid_query in batch_query.query():
+            references.append(weakref.ref(lipid_query))
+            del lipid_query
+            gc.collect()
+
+    assert len(references) == len(inputs)
+    assert all(reference() is None for reference in references)
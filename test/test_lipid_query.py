@@ -1,3 +1,5 @@
+import time
+
 import pytest
 from unittest.mock import patch
 from lipidlibrarian.LipidQuery import LipidQuery
@@ -151,3 +153,96 @@ def test_merge_deduplicates_within_kept_level():
     assert len(q.lipids) == 1
     assert q.lipids[0].nomenclature.level == Level.molecular_lipid_species
     assert q.lipids[0].nomenclature.get_name() == "PC 18:1_20:0"
+
+
+def test_merge_absorbs_into_first_matching_lipid_only():
+    q = LipidQuery("PC 18:0/20:1", method="name")
+
+    names = [f'PC 18:0/{i}:1' for i in range(12, 24)]
+    lipids = []
+    for name in names + names + [f'PC 18:0_{i}:1' for i in range(12, 24)] + ['PC 38:1', 'PE 38:1']:
+        lipid = Lipid()
+        lipid.nomenclature.name = name
+        lipids.append(lipid)
+    q.lipids = lipids
+
+    with patch.object(Lipid, "hierarchical_merge", autospec=True, side_effect=Lipid.hierarchical_merge) as merge:
+        q.merge_lipids()
+
+    # duplicates and the molecular lipid species are absorbed, the sum lipid species matching
+    # "PC 38:1" and the unrelated "PE 38:1" are dropped, all without comparing every pair
+    assert merge.call_count == 2 * len(names) + 1
+    assert [l.nomenclature.get_name() for l in q.lipids] == names
+
+
+class _DelayedAPI:
+    """
+    Stand-in for a database API that answers with fixed lipid names after a delay.
+    """
+
+    def __init__(self, names: list[str], delay: float):
+        self.names = names
+        self.delay = delay
+
+    def query(self, query_parameters, cutoff: int = 0) -> list[Lipid]:
+        time.sleep(self.delay)
+        if isinstance(query_parameters, Lipid):
+            return [query_parameters]
+        results = []
+        for name in self.names:
+            lipid = Lipid()
+            lipid.nomenclature.name = name
+            results.append(lipid)
+        return results
+
+
+def _delayed_APIs(which_APIs, sql_args=None):
+    return {
+        'swisslipids': _DelayedAPI(['PC 38:1', 'PE 38:1'], 0.3),
+        'lipidmaps': _DelayedAPI(['PS 38:1'], 0.1),
+        'alex123': _DelayedAPI(['PC 38:1', 'PG 38:1'], 0.0),
+        'lipidlibrarian': _DelayedAPI([], 0.0),
+        'linex': _DelayedAPI([], 0.0),
+        'lion': _DelayedAPI([], 0.0),
+    }
+
+
+def test_concurrent_query_is_deterministic():
+    """
+    Querying the APIs concurrently merges the results in the same order as querying them serially.
+    """
+    with patch("lipidlibrarian.LipidQuery.init_APIs", side_effect=_delayed_APIs):
+        serial = LipidQuery("500.0;0.1;+H+", method="mz").query()
+        concurrent = LipidQuery(
+            "500.0;0.1;+H+",
+            method="mz",
+            max_workers=4,
+            max_concurrency={'swisslipids': 1}
+        ).query()
+
+    assert [repr(l) for l in serial] == ['PC 38:1', 'PE 38:1', 'PS 38:1', 'PG 38:1']
+    assert [repr(l) for l in concurrent] == [repr(l) for l in serial]
+    assert all(l._query == "500.0;0.1;+H+" for l in concurrent)
+
+
+def test_invalid_max_workers_raises():
+    with pytest.raises(ValueError):
+        LipidQuery("PC 38:1", method="name", max_workers=0)
+
+
+def test_add_lipid_merges_by_name_index():
+    q = LipidQuery("PC 18:0_20:1", method="name")
+
+    names = [f'PC {i}:0_20:1' for i in range(12, 24)]
+    lipids = []
+    for name in names + names:
+        lipid = Lipid()
+        lipid.nomenclature.name = name
+        lipids.append(lipid)
+
+    with patch.object(Lipid, "merge", autospec=True, side_effect=Lipid.merge) as merge:
+        q.add_lipids(lipids)
+
+    # every lipid of the second half is merged exactly once, without scanning the other results
+    assert merge.call_count == len(names)
+    assert [l.nomenclature.get_name() for l in q.lipids] == names
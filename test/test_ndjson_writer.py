@@ -0,0 +1,35 @@
+import gzip
+import io
+import json
+
+import pytest
+
+from lipidlibrarian.NDJSONWriter import NDJSONWriter
+
+
+# serializing lipids queries the LION API for the ontology subgraph
+pytestmark = pytest.mark.usefixtures('lion_api')
+
+
+def test_writer_streams_one_record_per_lipid(make_lipid):
+    stream = io.StringIO()
+    lipids = [make_lipid('PC 18:1(9Z)/20:0'), make_lipid('PE 38:1')]
+
+    with NDJSONWriter(stream) as writer:
+        writer.write_lipids(lipids[:1])
+        assert stream.getvalue().count('\n') == 1
+        writer.write_lipids(lipids[1:])
+
+    assert writer.count == 2
+    assert [json.loads(line) for line in stream.getvalue().splitlines()] == [lipid.to_dict() for lipid in lipids]
+
+
+def test_writer_compresses_gz_files(tmp_path, make_lipid):
+    path = tmp_path / "lipids.ndjson.gz"
+
+    with NDJSONWriter(str(path)) as writer:
+        writer.write_lipids([make_lipid('PC 18:1(9Z)/20:0')])
+
+    with gzip.open(path, 'rt') as file:
+        records = [json.loads(line) for line in file]
+    assert [record['nomenclature']['name'] for record in records] == ['PC 18:1(9Z)/20:0']
@@ -0,0 +1,34 @@
+import pytest
+
+from lipidlibrarian.ParquetWriter import ParquetWriter
+
+
+def test_to_row_flattens_lipid(make_lipid):
+    row = ParquetWriter.to_row(make_lipid('PC 18:0_20:1'))
+
+    assert row['name'] == 'PC 18:0_20:1'
+    assert row['level'] == 'molecular_lipid_species'
+    assert row['lipid_class_name'] == 'PC'
+    assert row['sum_lipid_species_name'] == 'PC 38:1'
+    assert row['structural_lipid_species_name'] is None
+    assert row['masses'] == [{'mass_type': 'neutral mass', 'value': 787.6}]
+    assert row['database_identifiers'] == [{'database': 'alex123', 'identifier': 'PC 18:0_20:1'}]
+    assert row['adduct_masses'] == [
+        {'adduct': '+H+', 'mass_type': 'monoisotopic mass', 'value': 788.6},
+        {'adduct': '+Na+', 'mass_type': 'monoisotopic mass', 'value': 810.6},
+    ]
+    assert row['ontology_terms'] == ['LION:0000001', 'LION:0000002']
+    assert row['sources'] == ['test']
+
+
+def test_writer_writes_row_groups(tmp_path, make_lipid):
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = tmp_path / "lipids.parquet"
+    names = ['PC 18:0_20:1', 'PE 38:1', 'PC 18:1(9Z)/20:0']
+
+    with ParquetWriter(str(path), row_group_size=2) as writer:
+        writer.write_lipids(make_lipid(name) for name in names)
+
+    parquet_file = pq.ParquetFile(path)
+    assert parquet_file.metadata.num_row_groups == 2
+    assert parquet_file.read().column('name').to_pylist() == names